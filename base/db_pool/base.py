@@ -0,0 +1,109 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base as postgresql
+from .creation import DatabaseCreation
+
+# The PostgreSQL backend with connections borrowed from a psycopg_pool
+# ConnectionPool, configured like Django 5.1's built-in pooling so the engine
+# can be switched back once we upgrade:
+#
+#     'ENGINE': 'base.db_pool',
+#     'OPTIONS': {'pool': {'min_size': 2, 'max_size': 10}},
+#
+# Each worker process has its own pool per database. Connections are thread
+# local in Django and go back to the pool when the request finishes
+# (CONN_MAX_AGE must be 0), so a connection is never shared between the
+# threads sync_to_async runs the ORM in. With CONN_HEALTH_CHECKS on, each
+# checkout checks the connection first.
+
+class DatabaseWrapper(postgresql.DatabaseWrapper):
+    creation_class = DatabaseCreation
+    # Keyed by alias and database name, tests switch the name to the test
+    # database and must not borrow connections to the real one
+    _connection_pools = {}
+
+    @property
+    def pool_key(self):
+        return (self.alias, self.settings_dict['NAME'])
+
+    @property
+    def pool(self):
+        pool_options = self.settings_dict['OPTIONS'].get('pool')
+        if self.alias == NO_DB_ALIAS or not pool_options:
+            return None
+        if self.pool_key not in self._connection_pools:
+            if self.settings_dict.get('CONN_MAX_AGE', 0) != 0:
+                raise ImproperlyConfigured("Pooled connections can't also be persistent, set CONN_MAX_AGE to 0.")
+            if pool_options is True:
+                pool_options = {}
+            try:
+                from psycopg_pool import ConnectionPool
+            except ImportError as e:
+                raise ImproperlyConfigured('Error loading psycopg_pool, install psycopg-pool.') from e
+
+            connect_kwargs = self.get_connection_params()
+            # Django switches autocommit as needed after checkout
+            connect_kwargs['autocommit'] = True
+            pool = ConnectionPool(
+                kwargs=connect_kwargs,
+                open=False,
+                name=self.alias,
+                check=ConnectionPool.check_connection if self.settings_dict['CONN_HEALTH_CHECKS'] else None,
+                **pool_options,
+            )
+            # Threads racing here each build a pool, the first one stored wins
+            # and the others were never opened
+            self._connection_pools.setdefault(self.pool_key, pool)
+        return self._connection_pools[self.pool_key]
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = postgresql.IsolationLevel(
+                options.get('isolation_level', postgresql.IsolationLevel.READ_COMMITTED)
+            )
+        except ValueError:
+            raise ImproperlyConfigured(
+                f"Invalid transaction isolation level {options['isolation_level']} "
+                f"specified. Use one of the psycopg.IsolationLevel values."
+            )
+        # Opens the pool in this process on first use
+        pool.open()
+        connection = pool.getconn()
+        if 'isolation_level' in options:
+            connection.isolation_level = self.isolation_level
+        return connection
+
+    def _close(self):
+        if self.connection is None or self.pool is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            # putconn rolls back an unfinished transaction and drops broken
+            # connections instead of handing them to the next request
+            self.connection._pool.putconn(self.connection)
+            self.connection = None
+
+    def close_pool(self):
+        self.close()
+        pool = self._connection_pools.pop(self.pool_key, None)
+        if pool is not None:
+            pool.close()
+
+def pool_stats():
+    # Counters of this worker's pools since they were opened, times in ms
+    stats = {}
+    for pool in DatabaseWrapper._connection_pools.values():
+        values = pool.get_stats()
+        requests = values.get('requests_num', 0)
+        values['requests_wait_ms_avg'] = values.get('requests_wait_ms', 0) / requests if requests else 0
+        values['utilization'] = (values['pool_size'] - values['pool_available']) / values['pool_max']
+        stats[pool.name] = values
+    return stats
@@ -0,0 +1,13 @@
+from django.db.backends.postgresql.creation import DatabaseCreation as PostgreSQLDatabaseCreation
+
+class DatabaseCreation(PostgreSQLDatabaseCreation):
+    # Idle pooled connections keep the test database in use, which blocks
+    # both copying it for parallel runs and dropping it
+
+    def _clone_test_db(self, suffix, verbosity, keepdb=False):
+        self.connection.close_pool()
+        super()._clone_test_db(suffix, verbosity, keepdb)
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        self.connection.close_pool()
+        super()._destroy_test_db(test_database_name, verbosity)
@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth.forms import AuthenticationForm
 from .helpers import check_turnstile
+from .throttling import check_throttle
 
 class EmailUpdateForm(forms.Form):
     email = forms.EmailField(required=False)
@@ -8,6 +9,8 @@ class EmailUpdateForm(forms.Form):
 class AuthAdminForm(AuthenticationForm):
     def clean(self):
         request = self.request
+        if not check_throttle(request, 'login'):
+            raise forms.ValidationError("Too many login attempts. Please try again later.")
         if not check_turnstile(request):
             raise forms.ValidationError("Invalid captcha.")
         return super().clean()
\ No newline at end of file
@@ -1,20 +1,12 @@
-import requests
-from django.conf import settings
 from django.contrib import messages
 import os
+from .throttling import client_ip
+from .turnstile import get_verifier
 
 def check_turnstile(request):
     turnstile_token = request.POST.get('cf-turnstile-response')
     if turnstile_token:
-        siteverify_url = 'https://challenges.cloudflare.com/turnstile/v0/siteverify'
-        data = {
-            'secret': settings.TURNSTILE_SECRET_KEY,
-            'response': turnstile_token,
-        }
-        response = requests.post(siteverify_url, data=data)
-        result = response.json()
-
-        if result['success']:
+        if get_verifier().verify(turnstile_token, client_ip(request)):
             return True
         else:
             messages.error(request, 'Invalid captcha')
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:24
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    # auth_user belongs to django.contrib.auth, so the index ProfileView's
+    # email uniqueness check needs is added with plain SQL
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX base_auth_user_email_idx ON auth_user (email);',
+            'DROP INDEX base_auth_user_email_idx;',
+        ),
+    ]
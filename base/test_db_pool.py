@@ -0,0 +1,68 @@
+from unittest import skipUnless
+from django.test import TestCase, SimpleTestCase
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.urls import reverse
+from .db_pool.base import DatabaseWrapper, pool_stats
+
+def pooled_settings(**overrides):
+    return {**connection.settings_dict, 'ENGINE': 'base.db_pool', 'OPTIONS': {'pool': {'min_size': 1, 'max_size': 2}}, **overrides}
+
+class PoolConfigurationTest(SimpleTestCase):
+    def test_pool_options_are_not_connection_params(self):
+        wrapper = DatabaseWrapper(pooled_settings(NAME='shareaichat'), alias='pool_test')
+        self.assertNotIn('pool', wrapper.get_connection_params())
+
+    def test_persistent_connections_are_rejected(self):
+        wrapper = DatabaseWrapper(pooled_settings(CONN_MAX_AGE=60), alias='pool_test')
+        with self.assertRaises(ImproperlyConfigured):
+            wrapper.pool
+
+    def test_no_pool_without_options_or_for_maintenance_connections(self):
+        self.assertIsNone(DatabaseWrapper(pooled_settings(OPTIONS={}), alias='pool_test').pool)
+        self.assertIsNone(DatabaseWrapper(pooled_settings(), alias=NO_DB_ALIAS).pool)
+
+@skipUnless(connection.vendor == 'postgresql', 'Needs PostgreSQL')
+class PoolTest(SimpleTestCase):
+    databases = {'default'}
+
+    def setUp(self):
+        self.wrapper = DatabaseWrapper(pooled_settings(CONN_HEALTH_CHECKS=True), alias='pool_test')
+        self.addCleanup(self.wrapper.close_pool)
+
+    def backend_pid(self):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            return cursor.fetchone()[0]
+
+    def test_connection_is_reused_after_close(self):
+        first = self.backend_pid()
+        self.wrapper.close()
+        self.assertEqual(self.backend_pid(), first)
+        self.wrapper.close()
+        self.assertEqual(pool_stats()['pool_test']['requests_num'], 2)
+
+    def test_unfinished_transaction_is_rolled_back_on_return(self):
+        self.wrapper.set_autocommit(False)
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('CREATE TEMPORARY TABLE pool_probe (id integer)')
+        self.wrapper.close()
+        with self.wrapper.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('pool_probe')")
+            self.assertIsNone(cursor.fetchone()[0])
+
+class DatabasePoolStatsViewTest(TestCase):
+    def test_staff_only(self):
+        response = self.client.get(reverse('db_pool_stats'))
+        self.assertEqual(response.status_code, 302)
+        self.client.force_login(User.objects.create_user(username='user', password='testpass'))
+        self.assertEqual(self.client.get(reverse('db_pool_stats')).status_code, 302)
+
+    def test_stats(self):
+        self.client.force_login(User.objects.create_user(username='admin', password='testpass', is_staff=True))
+        response = self.client.get(reverse('db_pool_stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('pid', response.json())
+        self.assertIn('pools', response.json())
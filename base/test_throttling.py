@@ -0,0 +1,111 @@
+from django.test import TestCase, RequestFactory, override_settings
+from django.conf import settings
+from django.contrib.auth.models import User, AnonymousUser
+from django.core.cache import caches
+from django.urls import reverse
+from .throttling import SlidingWindowThrottle, check_throttle, client_ip, parse_rate
+
+class ParseRateTest(TestCase):
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('11/10m'), (11, 600))
+        self.assertEqual(parse_rate('5/h'), (5, 3600))
+        self.assertEqual(parse_rate('100/d'), (100, 86400))
+        self.assertEqual(parse_rate('3/30s'), (3, 30))
+
+class SlidingWindowThrottleTest(TestCase):
+    def setUp(self):
+        caches[settings.THROTTLE_CACHE].clear()
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+
+    def make_request(self, user=None, ip='10.0.0.1'):
+        request = self.factory.post('/', REMOTE_ADDR=ip)
+        request.user = user or AnonymousUser()
+        return request
+
+    def test_allows_up_to_limit_within_window(self):
+        throttle = SlidingWindowThrottle('test', '3/m')
+        request = self.make_request(self.user)
+        start = 6000.0
+        self.assertEqual([throttle.allow(request, now=start + i) for i in range(4)], [True, True, True, False])
+
+    def test_previous_window_is_weighted_by_overlap(self):
+        throttle = SlidingWindowThrottle('test', '4/m')
+        request = self.make_request(self.user)
+        for i in range(4):
+            self.assertTrue(throttle.allow(request, now=6000.0 + i))
+        # A quarter into the next window 3/4 of the previous window still counts
+        self.assertTrue(throttle.allow(request, now=6075.0))
+        self.assertFalse(throttle.allow(request, now=6075.0))
+        # Halfway through only 4 * 0.5 = 2 remain, plus the one above
+        self.assertTrue(throttle.allow(request, now=6090.0))
+        self.assertFalse(throttle.allow(request, now=6090.0))
+        # Two windows later everything has expired
+        self.assertTrue(throttle.allow(request, now=6125.0))
+
+    def test_users_are_counted_separately(self):
+        throttle = SlidingWindowThrottle('test', '1/m')
+        other_user = User.objects.create_user(username='otheruser', password='12345')
+        self.assertTrue(throttle.allow(self.make_request(self.user), now=6000.0))
+        self.assertFalse(throttle.allow(self.make_request(self.user), now=6001.0))
+        self.assertTrue(throttle.allow(self.make_request(other_user), now=6001.0))
+
+    def test_ip_key(self):
+        throttle = SlidingWindowThrottle('test', '1/m', key='ip')
+        other_user = User.objects.create_user(username='otheruser', password='12345')
+        self.assertTrue(throttle.allow(self.make_request(self.user), now=6000.0))
+        self.assertFalse(throttle.allow(self.make_request(other_user), now=6001.0))
+        self.assertTrue(throttle.allow(self.make_request(other_user, ip='10.0.0.2'), now=6001.0))
+
+    def test_anonymous_users_fall_back_to_ip(self):
+        throttle = SlidingWindowThrottle('test', '1/m')
+        self.assertTrue(throttle.allow(self.make_request(ip='10.0.0.1'), now=6000.0))
+        self.assertFalse(throttle.allow(self.make_request(ip='10.0.0.1'), now=6001.0))
+        self.assertTrue(throttle.allow(self.make_request(ip='10.0.0.2'), now=6001.0))
+
+    @override_settings(THROTTLE_TRUST_X_FORWARDED_FOR=True)
+    def test_client_ip_from_forwarded_for(self):
+        request = self.factory.get('/', REMOTE_ADDR='172.18.0.2', HTTP_X_FORWARDED_FOR='203.0.113.7')
+        self.assertEqual(client_ip(request), '203.0.113.7')
+
+    @override_settings(THROTTLE_TRUST_X_FORWARDED_FOR=True)
+    def test_client_ip_ignores_forged_forwarded_for_entries(self):
+        # The client sent the first entry itself, Caddy appended the second
+        request = self.factory.get('/', REMOTE_ADDR='172.18.0.2', HTTP_X_FORWARDED_FOR='198.51.100.1, 203.0.113.7')
+        self.assertEqual(client_ip(request), '203.0.113.7')
+
+    @override_settings(THROTTLE_TRUST_X_FORWARDED_FOR=True, THROTTLE_PROXY_COUNT=2)
+    def test_client_ip_behind_several_proxies(self):
+        request = self.factory.get('/', REMOTE_ADDR='172.18.0.2', HTTP_X_FORWARDED_FOR='198.51.100.1, 203.0.113.7, 10.0.0.5')
+        self.assertEqual(client_ip(request), '203.0.113.7')
+        request = self.factory.get('/', REMOTE_ADDR='172.18.0.2', HTTP_X_FORWARDED_FOR='203.0.113.7')
+        self.assertEqual(client_ip(request), '172.18.0.2')
+
+    def test_client_ip_ignores_forwarded_for_by_default(self):
+        request = self.factory.get('/', REMOTE_ADDR='172.18.0.2', HTTP_X_FORWARDED_FOR='203.0.113.7')
+        self.assertEqual(client_ip(request), '172.18.0.2')
+
+    @override_settings(THROTTLE_RATES={'vote': {'rate': None}})
+    def test_disabled_scope_always_allows(self):
+        request = self.make_request(self.user)
+        self.assertTrue(all(check_throttle(request, 'vote') for _ in range(50)))
+
+    def test_unknown_scope_always_allows(self):
+        self.assertTrue(check_throttle(self.make_request(self.user), 'unknown'))
+
+class AuthThrottleTest(TestCase):
+    def setUp(self):
+        caches[settings.THROTTLE_CACHE].clear()
+
+    @override_settings(THROTTLE_RATES={'login': {'rate': '2/m', 'key': 'ip'}})
+    def test_login_is_throttled_before_captcha(self):
+        for _ in range(2):
+            self.client.post(reverse('login'), {'username': 'x', 'password': 'y'})
+        response = self.client.post(reverse('login'), {'username': 'x', 'password': 'y'}, follow=True)
+        self.assertContains(response, 'Too many login attempts')
+
+    @override_settings(THROTTLE_RATES={'signup': {'rate': '1/h', 'key': 'ip'}})
+    def test_signup_is_throttled_before_captcha(self):
+        self.client.post(reverse('signup'), {})
+        response = self.client.post(reverse('signup'), {}, follow=True)
+        self.assertContains(response, 'Too many signup attempts')
@@ -0,0 +1,110 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+from django.test import TestCase, RequestFactory, override_settings
+from django.conf import settings
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.core.cache import caches
+from .helpers import check_turnstile
+from .turnstile import TurnstileVerifier, get_verifier
+
+class StubSiteverifyHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode())
+        self.server.calls.append(form)
+        token = form['response'][0]
+        if token == 'slow':
+            time.sleep(1)
+        body = json.dumps({'success': token.startswith('good')}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class TurnstileVerifierTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubSiteverifyHandler)
+        cls.server.calls = []
+        cls.url = f'http://127.0.0.1:{cls.server.server_port}/siteverify'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        caches[settings.TURNSTILE_CACHE].clear()
+        self.server.calls.clear()
+        self.verifier = TurnstileVerifier(url=self.url, secret='test-secret', timeout=(0.5, 0.5))
+
+    def make_request(self, token=None):
+        request = RequestFactory().post('/', {'cf-turnstile-response': token} if token else {}, REMOTE_ADDR='203.0.113.7')
+        request.session = {}
+        request._messages = FallbackStorage(request)
+        return request
+
+    def test_valid_token(self):
+        self.assertTrue(self.verifier.verify('good-token', '203.0.113.7'))
+        self.assertEqual(self.server.calls[0]['secret'], ['test-secret'])
+        self.assertEqual(self.server.calls[0]['remoteip'], ['203.0.113.7'])
+
+    def test_invalid_token(self):
+        self.assertFalse(self.verifier.verify('bad-token'))
+
+    def test_tokens_are_single_use(self):
+        self.assertTrue(self.verifier.verify('good-token', '203.0.113.7'))
+        self.assertFalse(self.verifier.verify('good-token', '203.0.113.7'))
+        self.assertFalse(self.verifier.verify('good-token', '198.51.100.1'))
+        self.assertEqual(len(self.server.calls), 1)
+
+    def test_rejected_tokens_are_not_checked_again(self):
+        self.assertFalse(self.verifier.verify('bad-token'))
+        self.assertFalse(self.verifier.verify('bad-token'))
+        self.assertEqual(len(self.server.calls), 1)
+
+    def test_concurrent_submissions_pass_once(self):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.verifier.verify('good-twice'))) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(results), [False, True])
+        self.assertEqual(len(self.server.calls), 1)
+
+    def test_slow_response_times_out(self):
+        start = time.monotonic()
+        self.assertFalse(self.verifier.verify('slow'))
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_unreachable_server(self):
+        verifier = TurnstileVerifier(url='http://127.0.0.1:9/siteverify', secret='x', timeout=(0.5, 0.5))
+        self.assertFalse(verifier.verify('good-token'))
+        # The token was never checked, so it still works once the server answers
+        self.assertTrue(self.verifier.verify('good-token'))
+
+    def test_check_turnstile_uses_configured_verifier(self):
+        with override_settings(TURNSTILE_VERIFY_URL=self.url):
+            self.assertTrue(check_turnstile(self.make_request('good-token')))
+            self.assertFalse(check_turnstile(self.make_request('bad-token')))
+            self.assertFalse(check_turnstile(self.make_request()))
+
+    def test_verifier_is_shared_and_pluggable(self):
+        self.assertIs(get_verifier(), get_verifier())
+        with override_settings(TURNSTILE_VERIFIER='base.test_turnstile.AlwaysPassVerifier'):
+            self.assertIsInstance(get_verifier(), AlwaysPassVerifier)
+            self.assertTrue(check_turnstile(self.make_request('anything')))
+
+class AlwaysPassVerifier:
+    def verify(self, token, remote_ip=None):
+        return True
@@ -0,0 +1,71 @@
+import time
+from django.conf import settings
+from django.core.cache import caches
+from shareaichat import metrics
+
+RATE_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+def parse_rate(rate):
+    # '11/10m' means 11 requests per 10 minutes, the multiplier is optional: '5/h'
+    count, period = rate.split('/')
+    multiplier = period[:-1] or '1'
+    return int(count), int(multiplier) * RATE_UNITS[period[-1]]
+
+def client_ip(request):
+    # Each proxy appends the address it got the request from, anything to the
+    # left of what our own proxies added was sent by the client and can be forged
+    if settings.THROTTLE_TRUST_X_FORWARDED_FOR:
+        forwarded_for = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')]
+        if len(forwarded_for) >= settings.THROTTLE_PROXY_COUNT and forwarded_for[-settings.THROTTLE_PROXY_COUNT]:
+            return forwarded_for[-settings.THROTTLE_PROXY_COUNT]
+    return request.META.get('REMOTE_ADDR', '')
+
+class SlidingWindowThrottle:
+    # Sliding window counter: the previous fixed window's count is weighted by
+    # how much of it still overlaps the sliding window. Needs two counters per
+    # client, one get_many and one incr per allowed request, all in the cache.
+
+    def __init__(self, scope, rate, key='user', cache_alias=None):
+        self.scope = scope
+        self.limit, self.period = parse_rate(rate)
+        self.key = key
+        self.cache = caches[cache_alias or settings.THROTTLE_CACHE]
+
+    @classmethod
+    def for_scope(cls, scope):
+        config = settings.THROTTLE_RATES.get(scope)
+        if not config or not config.get('rate'):
+            return None
+        return cls(scope, config['rate'], key=config.get('key', 'user'))
+
+    def get_ident(self, request):
+        if self.key == 'user' and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{client_ip(request)}'
+
+    def allow(self, request, now=None):
+        now = time.time() if now is None else now
+        window, offset = divmod(now, self.period)
+        window = int(window)
+        prefix = f'throttle:{self.scope}:{self.get_ident(request)}:'
+        current_key, previous_key = f'{prefix}{window}', f'{prefix}{window - 1}'
+
+        counts = self.cache.get_many([current_key, previous_key])
+        overlap = 1 - offset / self.period
+        if counts.get(previous_key, 0) * overlap + counts.get(current_key, 0) >= self.limit:
+            return False
+
+        # A counter has to outlive its own window and the next one
+        if not self.cache.add(current_key, 1, timeout=self.period * 2):
+            try:
+                self.cache.incr(current_key)
+            except ValueError:
+                self.cache.set(current_key, 1, timeout=self.period * 2)
+        return True
+
+def check_throttle(request, scope):
+    throttle = SlidingWindowThrottle.for_scope(scope)
+    if throttle is None or throttle.allow(request):
+        return True
+    metrics.inc('throttle_rejections_total', {'scope': scope})
+    return False
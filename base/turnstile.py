@@ -0,0 +1,69 @@
+import hashlib
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+class TurnstileVerifier:
+    # One per process: the session keeps a pool of warm keep-alive connections
+    # to siteverify and every call is bounded by connect/read timeouts.
+
+    def __init__(self, url=None, secret=None, timeout=None, pool_size=None, cache_alias=None, cache_timeout=None):
+        self.url = url or settings.TURNSTILE_VERIFY_URL
+        self.secret = secret if secret is not None else settings.TURNSTILE_SECRET_KEY
+        self.timeout = timeout or settings.TURNSTILE_TIMEOUT
+        self.cache = caches[cache_alias or settings.TURNSTILE_CACHE]
+        self.cache_timeout = cache_timeout or settings.TURNSTILE_CACHE_TIMEOUT
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size or settings.TURNSTILE_POOL_SIZE, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def cache_key(self, token):
+        return 'turnstile:' + hashlib.sha256(token.encode()).hexdigest()
+
+    def verify(self, token, remote_ip=None):
+        # Tokens are single use. Claiming one before asking siteverify means a
+        # replayed token, or the same token submitted twice at once, is turned
+        # down without another round trip whatever the first answer was.
+        key = self.cache_key(token)
+        if not self.cache.add(key, True, self.cache_timeout):
+            return False
+
+        data = {'secret': self.secret, 'response': token}
+        if remote_ip:
+            data['remoteip'] = remote_ip
+        try:
+            response = self.session.post(self.url, data=data, timeout=self.timeout)
+            result = response.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.warning('Turnstile verification failed: %s', e)
+            # Never checked, so the token may still be used
+            self.cache.delete(key)
+            return False
+        return bool(result.get('success'))
+
+_verifier = None
+_verifier_lock = threading.Lock()
+
+def get_verifier():
+    global _verifier
+    if _verifier is None:
+        with _verifier_lock:
+            if _verifier is None:
+                _verifier = import_string(settings.TURNSTILE_VERIFIER)()
+    return _verifier
+
+@receiver(setting_changed)
+def reset_verifier(setting, **kwargs):
+    global _verifier
+    if setting.startswith('TURNSTILE_'):
+        _verifier = None
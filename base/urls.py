@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import AboutPage, SignupView, ProfileView, CustomPasswordResetView, CustomLoginView
+from .views import AboutPage, SignupView, ProfileView, CustomPasswordResetView, CustomLoginView, DatabasePoolStatsView, MetricsView
 from django.contrib.auth import views as auth_views
 
 urlpatterns = [
@@ -14,4 +14,6 @@ urlpatterns = [
     path("password_change/", auth_views.PasswordChangeView.as_view(), name="password_change"),
     path("password_change_done/", auth_views.PasswordChangeDoneView.as_view(), name="password_change_done"),
     path('profile/', ProfileView.as_view(), name='profile'),
+    path('db-pool/', DatabasePoolStatsView.as_view(), name='db_pool_stats'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
\ No newline at end of file
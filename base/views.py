@@ -9,7 +9,18 @@ from django.urls import reverse_lazy
 from .forms import EmailUpdateForm
 from django.contrib.auth.views import LoginView, PasswordResetView
 from .helpers import check_turnstile
+from .throttling import check_throttle
 from django import forms
+from django.contrib.admin.views.decorators import staff_member_required
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+from django.utils.decorators import method_decorator
+from shareaichat import metrics
+from .db_pool.base import pool_stats
+import os
 
 def handler400(request, exception, template_name="base/error.html"):
     return render(request, template_name, status=400)
@@ -41,6 +52,10 @@ class SignupView(View):
             messages.info(request, 'You are already logged in, so you can\'t signup. If you want to create a new account, logout first.')
             return redirect('homepage')
         
+        if not check_throttle(request, 'signup'):
+            messages.error(request, 'Too many signup attempts. Please try again later.')
+            return redirect('signup')
+
         if not check_turnstile(request):
             return redirect('signup')
         
@@ -81,6 +96,10 @@ class CustomLoginView(LoginView):
     template_name = 'registration/login.html'
     
     def post(self, request, *args, **kwargs):
+        if not check_throttle(request, 'login'):
+            messages.error(request, 'Too many login attempts. Please try again later.')
+            return redirect('login')
+
         if check_turnstile(request):
             return super().post(request, *args, **kwargs)
         else:
@@ -90,4 +109,22 @@ class CustomPasswordResetView(PasswordResetView):
     def post(self, request, *args, **kwargs):
         if not check_turnstile(request):
             return redirect('password_reset')
-        return super().post(request, *args, **kwargs)
\ No newline at end of file
+        return super().post(request, *args, **kwargs)
+
+@method_decorator(staff_member_required, name='dispatch')
+class DatabasePoolStatsView(View):
+    # Stats of the worker that happens to serve the request, the pid tells
+    # them apart
+    def get(self, request):
+        return JsonResponse({'pid': os.getpid(), 'pools': pool_stats()})
+
+def has_metrics_token(request):
+    token = settings.METRICS_TOKEN
+    return bool(token) and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+class MetricsView(View):
+    # Totals of all workers, for staff users and for the Prometheus scraper
+    def get(self, request):
+        if not has_metrics_token(request) and not (request.user.is_active and request.user.is_staff):
+            return redirect_to_login(request.get_full_path(), reverse('admin:login'))
+        return HttpResponse(metrics.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
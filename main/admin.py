@@ -2,6 +2,7 @@ from django.contrib import admin
 from .models import Post, PostVote, Comment, CommentVote, VoteTimestamp
 from django import forms
 from django.core.exceptions import ValidationError
+from . import search
 
 class PostAdminForm(forms.ModelForm):
     content = forms.CharField(widget=forms.Textarea)
@@ -9,15 +10,22 @@ class PostAdminForm(forms.ModelForm):
 
     class Meta:
         model = Post
-        fields = '__all__'
+        exclude = ('content_html', 'content_html_version')
 
 class PostAdmin(admin.ModelAdmin):
     form = PostAdminForm
     list_display = ('title', 'user', 'created_at', 'updated_at')
-    search_fields = ('title', 'content',)
+    search_fields = ('title',)
     list_filter = ('created_at',)
     date_hierarchy = 'created_at'
 
+    def get_search_results(self, request, queryset, search_term):
+        # The full-text index covers the title and content, icontains over
+        # 40k character rows can't use any index
+        if not search_term:
+            return queryset, False
+        return queryset.filter(id__in=search.search(Post, search_term).values('id')), False
+
 admin.site.register(Post, PostAdmin)
 
 class PostVoteAdmin(admin.ModelAdmin):
@@ -39,7 +47,7 @@ class CommentAdminForm(forms.ModelForm):
     content = forms.CharField(widget=forms.Textarea)
     class Meta:
         model = Comment
-        fields = '__all__'
+        exclude = ('content_html', 'content_html_version')
     
     def clean(self):
         cleaned_data = super().clean()
@@ -49,15 +57,28 @@ class CommentAdminForm(forms.ModelForm):
         if parent and parent.post != post:
             raise ValidationError("Parent comment's post and selected post must be the same.")
 
+        # The path is derived from the parent when the comment is created
+        if self.instance.pk and parent != self.instance.parent:
+            raise ValidationError("The parent of an existing comment can't be changed.")
+        if parent and not self.instance.pk and not parent.can_have_replies():
+            raise ValidationError("The parent comment's thread is too deep to reply to.")
+
         return cleaned_data
 
 class CommentAdmin(admin.ModelAdmin):
     form = CommentAdminForm
     list_display = ('user', 'post', 'parent', 'created_at', 'updated_at', 'votes')
-    search_fields = ('user__username', 'post__title', 'content',)
+    search_fields = ('user__username', 'post__title')
     list_filter = ('created_at',)
     date_hierarchy = 'created_at'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Usernames and titles as before, content through the full-text index
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if not search_term:
+            return results, may_have_duplicates
+        return results | queryset.filter(id__in=search.search(Comment, search_term).values('id')), may_have_duplicates
+
 admin.site.register(Comment, CommentAdmin)
 
 
@@ -79,5 +100,9 @@ admin.site.register(CommentVote, CommentVoteAdmin)
 class VoteTimestampAdmin(admin.ModelAdmin):
     list_display = ('user', 'timestamp')
     search_fields = ('user__username',)
+    list_select_related = ('user',)
+    # Filtering by date lets Postgres skip every other monthly partition
+    date_hierarchy = 'timestamp'
+    ordering = ('-timestamp',)
 
 admin.site.register(VoteTimestamp, VoteTimestampAdmin)
\ No newline at end of file
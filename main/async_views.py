@@ -0,0 +1,73 @@
+from asgiref.sync import sync_to_async
+from django.http import Http404, JsonResponse
+from django.shortcuts import render
+from django.views import View
+from base.throttling import check_throttle
+from .models import Post, Comment
+from .views import HomePage, PostDetailView, get_replies, attach_replies
+from .votes import toggle_post_vote, toggle_comment_vote
+
+# Native async versions of the hot read paths and the vote endpoints, routed
+# instead of the sync views when settings.ASYNC_VIEWS is on. Django 4.2 has no
+# async auth, transactions or templates, so those parts still hop to a thread.
+
+async def authenticated_user(request):
+    # request.user is lazy and resolving it reads the session and auth tables
+    return await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+
+class AsyncHomePage(HomePage):
+    async def get(self, request):
+        sort_by, time, paginator = self.get_paginator(request)
+        posts = await paginator.aget_page(request.GET.get('cursor'))
+
+        context = {'posts': posts, 'sort_by': sort_by, 'time' : time}
+        return await sync_to_async(render)(request, 'main/homepage.html', context)
+
+class AsyncPostDetailView(PostDetailView):
+    async def get(self, request, post_id):
+        try:
+            post = await Post.objects.select_related('user').defer('content').aget(id=post_id)
+        except Post.DoesNotExist:
+            raise Http404('No Post matches the given query.')
+        cursor = request.GET.get('cursor')
+        if cursor:
+            root_comments = await self.get_comment_paginator(post.id).aget_page(cursor)
+            replies = get_replies(root_comments, self.inline_replies + 1)
+            attach_replies(root_comments, [reply async for reply in replies], self.inline_replies)
+        else:
+            root_comments = await sync_to_async(self.get_first_page)(post.id)
+
+        context = await sync_to_async(self.get_context)(request, post, root_comments)
+        return await sync_to_async(render)(request, 'main/post_detail.html', context)
+
+class AsyncVotePostView(View):
+    async def post(self, request, post_id):
+        user = await authenticated_user(request)
+        if user is None:
+            return JsonResponse({'error': 'You must be logged in to upvote.'}, status=401)
+
+        if not await sync_to_async(check_throttle)(request, 'vote'):
+            return JsonResponse({'error': 'You have exceeded the vote limit.'}, status=429)
+
+        try:
+            status = await sync_to_async(toggle_post_vote)(user, post_id)
+        except Post.DoesNotExist:
+            return JsonResponse({'error': 'Invalid post id'}, status=400)
+
+        return JsonResponse({'status': status, 'post_id': post_id})
+
+class AsyncVoteCommentView(View):
+    async def post(self, request, comment_id):
+        user = await authenticated_user(request)
+        if user is None:
+            return JsonResponse({'error': 'You must be logged in to upvote.'}, status=401)
+
+        if not await sync_to_async(check_throttle)(request, 'vote'):
+            return JsonResponse({'error': 'You have exceeded the vote limit.'}, status=429)
+
+        try:
+            status = await sync_to_async(toggle_comment_vote)(user, comment_id)
+        except Comment.DoesNotExist:
+            return JsonResponse({'error': 'Invalid comment id'}, status=400)
+
+        return JsonResponse({'status': status, 'comment_id': comment_id})
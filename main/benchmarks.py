@@ -0,0 +1,220 @@
+import gc
+import json
+import platform
+import statistics
+import time
+from contextlib import contextmanager
+import django
+from django.contrib.auth.forms import AuthenticationForm
+from django.contrib.auth.models import AnonymousUser, User
+from django.db import connection
+from django.db.models import Count
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from base.templatetags import custom_filters
+from .models import Post, Comment
+from .rendering import render_content
+from .seeding import Seeder
+from .threads import build_thread_data, get_thread
+from .views import HomePage, MyCommentsView, MyPostsView, PostDetailView, SearchView, get_replies, attach_replies
+
+# Microbenchmarks of the read paths every page view goes through, timed on
+# the same seeded data each run so results can be compared with a stored
+# baseline. Each benchmark is a setup function that gets the Dataset and
+# returns the zero-argument function to time.
+
+DATASET = {
+    'users': 50, 'posts': 300, 'comments': 3000, 'post_votes': 3000, 'comment_votes': 6000,
+    'max_depth': 12, 'content_size': 40000, 'days': 60, 'seed': 1, 'prefix': 'bench',
+}
+
+BENCHMARKS = {}
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+@contextmanager
+def benchmark_database(verbosity=0):
+    # A throwaway test database, seeded once, so runs never touch real data
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True)
+    try:
+        Seeder(**DATASET).run()
+        yield Dataset()
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+
+class Dataset:
+    def __init__(self):
+        factory = RequestFactory()
+        self.request = factory.get('/')
+        self.request.user = AnonymousUser()
+        # The busiest thread and the most active author, like the pages that matter
+        self.post = Post.objects.annotate(comments=Count('comment')).order_by('-comments', 'id').first()
+        self.user = User.objects.annotate(comments=Count('comment')).order_by('-comments', 'id').first()
+        self.query = Post.objects.order_by('id').first().title.split()[0]
+
+@benchmark('template.homepage')
+def template_homepage(data):
+    _, _, paginator = HomePage().get_paginator(data.request)
+    context = {'posts': paginator.get_page(None), 'sort_by': 'trending', 'time': 'all_time'}
+    return lambda: render_to_string('main/homepage.html', context, request=data.request)
+
+@benchmark('template.post_detail')
+def template_post_detail(data):
+    view = PostDetailView()
+    post = Post.objects.select_related('user').defer('content').get(id=data.post.id)
+    context = view.get_context(data.request, post, view.get_root_comments(post.id, None))
+    return lambda: render_to_string('main/post_detail.html', context, request=data.request)
+
+@benchmark('thread.build')
+def thread_build(data):
+    return lambda: build_thread_data(data.post.id)
+
+@benchmark('thread.first_page')
+def thread_first_page(data):
+    get_thread(data.post.id)
+    return lambda: PostDetailView().get_first_page(data.post.id)
+
+@benchmark('thread.later_page')
+def thread_later_page(data):
+    view = PostDetailView()
+    view.comments_per_page = 10
+    cursor = view.get_comment_paginator(data.post.id).get_page(None).next_cursor
+    return lambda: view.get_root_comments(data.post.id, cursor)
+
+@benchmark('thread.replies')
+def thread_replies(data):
+    roots = list(Comment.objects.filter(post_id=data.post.id, parent__isnull=True).only('id', 'post_id', 'path')[:50])
+    return lambda: attach_replies(roots, get_replies(roots))
+
+@benchmark('filters.base_path')
+def filters_base_path(data):
+    return lambda: custom_filters.base_path('/posts/12/?cursor=abc')
+
+@benchmark('filters.form_field')
+def filters_form_field(data):
+    def run():
+        field = AuthenticationForm()['username']
+        custom_filters.addclass_to_label(field, 'form-label')
+        custom_filters.add_autofocus(custom_filters.addclass_to_input(field, 'form-control'))
+        return str(field)
+    return run
+
+@benchmark('rendering.post_content')
+def rendering_post_content(data):
+    content = Post.objects.only('content').get(id=data.post.id).content
+    return lambda: render_content(content)
+
+def homepage_queryset(params):
+    def setup(data):
+        request = RequestFactory().get('/', params)
+        return lambda: HomePage().get_paginator(request)[2].get_page(None)
+    return setup
+
+for sort_by, window in [('new', 'all_time'), ('trending', 'all_time'), ('trending', '7_days')]:
+    benchmark(f'queryset.homepage.{sort_by}.{window}')(homepage_queryset({'sort_by': sort_by, 'time': window}))
+
+@benchmark('queryset.post_detail')
+def queryset_post_detail(data):
+    return lambda: Post.objects.select_related('user').defer('content').get(id=data.post.id)
+
+@benchmark('queryset.search.posts')
+def queryset_search_posts(data):
+    return lambda: SearchView().get_results(data.query, 'posts', None)
+
+@benchmark('queryset.search.comments')
+def queryset_search_comments(data):
+    return lambda: SearchView().get_results(data.query, 'comments', None)
+
+@benchmark('queryset.myposts')
+def queryset_myposts(data):
+    return lambda: MyPostsView().get_paginator(data.user).get_page(None)
+
+@benchmark('queryset.mycomments')
+def queryset_mycomments(data):
+    return lambda: MyCommentsView().get_paginator(data.user).get_page(None)
+
+def measure(func, rounds=7, min_time=0.05):
+    # Like timeit: enough calls per round to take min_time, then the best
+    # and the median round. The best round is what the baseline compares.
+    func()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _measure(func, rounds, min_time)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+def _measure(func, rounds, min_time):
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2
+    timings = [elapsed / number]
+    for _ in range(rounds - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return {
+        'min_ms': round(min(timings) * 1000, 6),
+        'median_ms': round(statistics.median(timings) * 1000, 6),
+        'calls': number * rounds,
+    }
+
+def run(data, names=None, rounds=7, min_time=0.05):
+    return {
+        name: measure(setup(data), rounds, min_time)
+        for name, setup in BENCHMARKS.items()
+        if not names or any(name.startswith(prefix) for prefix in names)
+    }
+
+def confirm(data, results, baseline, threshold, retries=2, rounds=7, min_time=0.05):
+    # A noisy neighbour can slow down any single run, so a benchmark only
+    # counts as regressed if measuring it again doesn't get it back under
+    for _ in range(retries):
+        _, regressions = compare(results, baseline, threshold)
+        if not regressions:
+            break
+        for name, _, _, _ in regressions:
+            again = measure(BENCHMARKS[name](data), rounds, min_time)
+            if again['min_ms'] < results[name]['min_ms']:
+                results[name] = again
+    return compare(results, baseline, threshold)
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'dataset': DATASET,
+    }
+
+def compare(results, baseline, threshold):
+    # (name, baseline ms, current ms, change) for benchmarks in both, change
+    # is relative: 0.25 is 25% slower
+    rows = []
+    for name, result in results.items():
+        if name in baseline:
+            before = baseline[name]['min_ms']
+            rows.append((name, before, result['min_ms'], result['min_ms'] / before - 1 if before else 0))
+    return rows, [row for row in rows if row[3] > threshold]
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f)
+
+def save_baseline(path, results):
+    with open(path, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2, sort_keys=True)
+        f.write('\n')
@@ -0,0 +1,147 @@
+import json
+import os
+import time
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from .forms import PostForm
+from .models import Post, PostVote, ImportCheckpoint
+from .pagecache import LISTINGS, bump
+from .ranking import hot_score
+from . import search
+
+# Imports chats exported from other platforms, one JSON object per line:
+# {"title": ..., "content": ..., "extra_info": ..., "author": "<username>"}.
+# The file is read a batch of lines at a time, so memory stays flat however
+# large it is. Rows are validated like CreatePostView does (PostForm), then
+# each batch is inserted with bulk_create together with the authors' own
+# votes, the search index entries and the checkpoint. A rerun with the same
+# name carries on after the last committed batch.
+
+POST_FIELDS = PostForm._meta.fields
+
+class ChatImporter:
+    def __init__(self, path, name=None, batch_size=1000, create_authors=False, rejects=None, progress=None):
+        self.path = path
+        self.name = name or os.path.abspath(path)
+        self.batch_size = batch_size
+        self.create_authors = create_authors
+        # A file-like object, rejected rows are written to it as JSON lines
+        self.rejects = rejects
+        self.progress = progress
+        self.username_field = User._meta.get_field('username')
+
+    def run(self):
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(name=self.name)
+        size = os.path.getsize(self.path)
+        if checkpoint.offset > size:
+            raise ValueError(f'{self.path} is shorter than the checkpoint of {self.name}, was it replaced?')
+        report = {
+            'resumed_at_line': checkpoint.line,
+            'imported': 0,
+            'rejected': 0,
+            'lines': 0,
+            'bytes': 0,
+        }
+        start = time.perf_counter()
+        with open(self.path, 'rb') as f:
+            f.seek(checkpoint.offset)
+            offset, line = checkpoint.offset, checkpoint.line
+            batch = []
+            for raw in f:
+                offset += len(raw)
+                line += 1
+                batch.append((line, raw))
+                if len(batch) == self.batch_size:
+                    self.import_batch(checkpoint, batch, offset, report)
+                    batch = []
+            if batch:
+                self.import_batch(checkpoint, batch, offset, report)
+        elapsed = time.perf_counter() - start
+        report['elapsed_s'] = round(elapsed, 3)
+        report['rows_per_s'] = round(report['lines'] / elapsed, 1) if elapsed else None
+        report['mb_per_s'] = round(report['bytes'] / elapsed / 2**20, 2) if elapsed else None
+        report['total_imported'] = checkpoint.imported
+        report['total_rejected'] = checkpoint.rejected
+        return report
+
+    def parse(self, raw):
+        # A Post ready to insert apart from its author, or the errors
+        try:
+            data = json.loads(raw)
+        except ValueError as e:
+            return None, None, {'__all__': [f'Invalid JSON: {e}']}
+        if not isinstance(data, dict):
+            return None, None, {'__all__': ['Each line must be a JSON object.']}
+        form = PostForm({name: data.get(name) for name in POST_FIELDS})
+        errors = {} if form.is_valid() else {name: list(messages) for name, messages in form.errors.items()}
+        author = data.get('author')
+        try:
+            self.username_field.clean(author, None)
+        except ValidationError as e:
+            errors['author'] = e.messages
+        if errors:
+            return None, None, errors
+        return form.save(commit=False), author, None
+
+    def resolve_authors(self, usernames):
+        if self.create_authors:
+            # Imported authors can't log in until they reset their password
+            User.objects.bulk_create(
+                [User(username=username, password=make_password(None)) for username in usernames],
+                ignore_conflicts=True,
+            )
+        return dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+
+    def import_batch(self, checkpoint, batch, offset, report):
+        posts = []
+        authors = []
+        rejected = []
+        for line, raw in batch:
+            if not raw.strip():
+                continue
+            post, author, errors = self.parse(raw)
+            if errors:
+                rejected.append({'line': line, 'errors': errors})
+            else:
+                posts.append((line, post))
+                authors.append(author)
+
+        user_ids = self.resolve_authors(set(authors))
+        now = timezone.now()
+        valid = []
+        for (line, post), author in zip(posts, authors):
+            if author not in user_ids:
+                rejected.append({'line': line, 'errors': {'author': [f'There is no user named {author}.']}})
+                continue
+            # What Post.save and the signals would do for each row
+            post.user_id = user_ids[author]
+            post.render_html()
+            post.hot_score = hot_score(post.votes, now)
+            valid.append(post)
+
+        read = offset - checkpoint.offset
+        with transaction.atomic():
+            Post.objects.bulk_create(valid)
+            PostVote.objects.bulk_create([PostVote(user_id=post.user_id, post_id=post.id) for post in valid])
+            search.get_backend().index_many(Post, valid)
+            checkpoint.offset = offset
+            checkpoint.line = batch[-1][0]
+            checkpoint.imported += len(valid)
+            checkpoint.rejected += len(rejected)
+            checkpoint.save()
+            if valid:
+                bump(LISTINGS)
+
+        # Only once committed, a batch that is rolled back is read again
+        report['lines'] += len(batch)
+        report['bytes'] += read
+        report['imported'] += len(valid)
+        report['rejected'] += len(rejected)
+        if self.rejects is not None:
+            for reject in sorted(rejected, key=lambda reject: reject['line']):
+                self.rejects.write(json.dumps(reject) + '\n')
+        if self.progress is not None:
+            self.progress(checkpoint)
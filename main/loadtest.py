@@ -0,0 +1,168 @@
+import html
+import math
+import re
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# A small HTTP load driver built on the standard library so it runs anywhere
+# manage.py does. Every worker thread keeps its own opener and the run reports
+# throughput and latency percentiles per endpoint.
+
+def parse_endpoint(spec):
+    # 'POST:/votes/posts/1' or just '/posts/1/' for a GET
+    method, separator, path = spec.partition(':')
+    if not separator or not method.isalpha():
+        return 'GET', spec
+    return method.upper(), path
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    # Nearest-rank percentile
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+def summarize(latencies, statuses, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'elapsed_s': round(elapsed, 3),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+        'max_ms': latencies[-1] if latencies else None,
+        'statuses': dict(Counter(statuses)),
+    }
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    # A redirect is measured and reported as its own response, following it
+    # would add the time of the next page
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+opener = urllib.request.build_opener(NoRedirect)
+
+def request_once(base_url, method, path, cookies, timeout, data=None):
+    headers = {}
+    if cookies:
+        headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in cookies.items())
+        if 'csrftoken' in cookies:
+            headers['X-CSRFToken'] = cookies['csrftoken']
+            headers['Referer'] = base_url
+    if data is not None:
+        data = urllib.parse.urlencode(data).encode()
+        headers['Content-Type'] = 'application/x-www-form-urlencoded'
+    request = urllib.request.Request(base_url.rstrip('/') + path, data=data, method=method, headers=headers)
+    start = time.perf_counter()
+    try:
+        with opener.open(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = 'error'
+    return round((time.perf_counter() - start) * 1000, 2), status
+
+def run_endpoint(base_url, method, path, concurrency, total, cookies=None, timeout=30):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(lambda _: request_once(base_url, method, path, cookies, timeout), range(total)))
+        elapsed = time.perf_counter() - start
+    return summarize([latency for latency, _ in results], [status for _, status in results], elapsed)
+
+def run_load(base_url, endpoints, concurrency, total, cookies=None, timeout=30):
+    report = {}
+    for spec in endpoints:
+        method, path = parse_endpoint(spec)
+        report[f'{method} {path}'] = run_endpoint(base_url, method, path, concurrency, total, cookies, timeout)
+    return report
+
+# Mixed runs: a weighted plan of reads and writes against seeded data (see
+# the seed_data command), run at once so writes invalidate cached pages the
+# way they do in production.
+
+DEFAULT_MIX = {'homepage': 50, 'post_detail': 30, 'vote_post': 8, 'vote_comment': 8, 'add_comment': 4}
+HOMEPAGE_VARIANTS = [('new', None)] + [('trending', window) for window in ('1_day', '7_days', '30_days', 'all_time')]
+NEXT_LINK_RE = re.compile(r'<a href="(\?cursor=[^"]+)">Next</a>')
+
+def fetch(base_url, path, timeout=30):
+    try:
+        with opener.open(base_url.rstrip('/') + path, timeout=timeout) as response:
+            return response.read().decode()
+    except (urllib.error.URLError, OSError):
+        return None
+
+def homepage_paths(base_url, pages, timeout=30):
+    # Every sort and time window, each followed through its Next links for
+    # up to pages pages. Returns (variant, path) pairs.
+    paths = []
+    for sort_by, window in HOMEPAGE_VARIANTS:
+        variant = f'{sort_by}/{window}' if window else sort_by
+        path = f'/?sort_by={sort_by}' + (f'&time={window}' if window else '')
+        for page in range(pages):
+            paths.append((f'{variant} page {page + 1}', path))
+            body = fetch(base_url, path, timeout)
+            match = NEXT_LINK_RE.search(body or '')
+            if not match:
+                break
+            path = '/' + html.unescape(match.group(1))
+    return paths
+
+def build_plan(rng, total, mix, homepage, post_ids, comment_ids, sessions):
+    # (endpoint, variant, method, path, data, cookies) for each request.
+    # Endpoints without anything to request are left out of the mix.
+    available = {
+        'homepage': bool(homepage),
+        'post_detail': bool(post_ids),
+        'vote_post': bool(post_ids and sessions),
+        'vote_comment': bool(comment_ids and sessions),
+        'add_comment': bool(post_ids and sessions),
+    }
+    endpoints = [name for name, weight in mix.items() if weight > 0 and available.get(name)]
+    if not endpoints:
+        return []
+    plan = []
+    for endpoint in rng.choices(endpoints, weights=[mix[name] for name in endpoints], k=total):
+        if endpoint == 'homepage':
+            variant, path = rng.choice(homepage)
+            plan.append((endpoint, variant, 'GET', path, None, None))
+        elif endpoint == 'post_detail':
+            plan.append((endpoint, None, 'GET', f'/posts/{rng.choice(post_ids)}/', None, None))
+        elif endpoint == 'vote_post':
+            plan.append((endpoint, None, 'POST', f'/votes/posts/{rng.choice(post_ids)}', None, rng.choice(sessions)))
+        elif endpoint == 'vote_comment':
+            plan.append((endpoint, None, 'POST', f'/votes/comments/{rng.choice(comment_ids)}', None, rng.choice(sessions)))
+        else:
+            data = {'content': f'Load test comment {rng.randrange(10**9)}'}
+            plan.append((endpoint, None, 'POST', f'/comments/add/{rng.choice(post_ids)}', data, rng.choice(sessions)))
+    return plan
+
+def run_plan(base_url, plan, concurrency, timeout=30):
+    def run(task):
+        endpoint, variant, method, path, data, cookies = task
+        return endpoint, variant, request_once(base_url, method, path, cookies, timeout, data)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(run, plan))
+        elapsed = time.perf_counter() - start
+
+    groups = {'endpoints': defaultdict(list), 'homepage_variants': defaultdict(list)}
+    for endpoint, variant, result in results:
+        groups['endpoints'][endpoint].append(result)
+        if variant is not None:
+            groups['homepage_variants'][variant].append(result)
+
+    def summary(group):
+        return summarize([latency for latency, _ in group], [status for _, status in group], elapsed)
+
+    report = {'total': summary([result for _, _, result in results])}
+    for name, group in groups.items():
+        report[name] = {key: summary(values) for key, values in sorted(group.items())}
+    return report
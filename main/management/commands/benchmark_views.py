@@ -0,0 +1,44 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from main.loadtest import run_load
+
+DEFAULT_ENDPOINTS = ['GET:/', 'GET:/?sort_by=new']
+
+class Command(BaseCommand):
+    help = ('Drive concurrent requests at a running server and report requests/sec and latency '
+            'percentiles per endpoint. Pass --compare-url to run the same load against a second '
+            'server, e.g. one started with SHAREAICHAT_ASYNC_VIEWS=True.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', required=True)
+        parser.add_argument('--compare-url')
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help="METHOD:/path, repeatable. Defaults to the homepage sorts.")
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint.')
+        parser.add_argument('--cookie', action='append', default=[],
+                            help='name=value, repeatable. Use sessionid and csrftoken to benchmark votes.')
+        parser.add_argument('--output', help='Also write the JSON report to this file.')
+
+    def handle(self, *args, **options):
+        try:
+            cookies = dict(cookie.split('=', 1) for cookie in options['cookie'])
+        except ValueError:
+            raise CommandError('Cookies must be given as name=value.')
+        endpoints = options['endpoints'] or DEFAULT_ENDPOINTS
+
+        report = {'base': run_load(options['base_url'], endpoints, options['concurrency'], options['requests'], cookies)}
+        if options['compare_url']:
+            report['compare'] = run_load(options['compare_url'], endpoints, options['concurrency'], options['requests'], cookies)
+
+        for label, results in report.items():
+            self.stdout.write(f'{label}: {options[f"{label}_url"]}')
+            for endpoint, result in results.items():
+                self.stdout.write(
+                    f"  {endpoint:40} {result['rps']:>8} req/s  p50 {result['p50_ms']} ms  "
+                    f"p99 {result['p99_ms']} ms  {result['statuses']}"
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
@@ -0,0 +1,46 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from main.importing import ChatImporter
+from main.models import ImportCheckpoint
+
+class Command(BaseCommand):
+    help = ('Import shared chats from a JSON lines file, one {"title", "content", "extra_info", "author"} '
+            'object per line, validated like the create post form. Progress is checkpointed after every '
+            'batch: run the same command again to carry on where an interrupted import stopped.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--name', help='Checkpoint name, defaults to the absolute path of the file.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--create-authors', action='store_true',
+                            help='Create missing authors (without a usable password) instead of rejecting their chats.')
+        parser.add_argument('--rejects', help='Append rejected lines and their errors to this file as JSON lines.')
+        parser.add_argument('--restart', action='store_true', help='Forget the checkpoint and start from the first line.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        importer_options = {
+            'name': options['name'],
+            'batch_size': options['batch_size'],
+            'create_authors': options['create_authors'],
+            'progress': self.progress if options['verbosity'] > 1 else None,
+        }
+        rejects = open(options['rejects'], 'a') if options['rejects'] else None
+        try:
+            importer = ChatImporter(options['path'], rejects=rejects, **importer_options)
+            if options['restart']:
+                ImportCheckpoint.objects.filter(name=importer.name).delete()
+            report = importer.run()
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        finally:
+            if rejects is not None:
+                rejects.close()
+
+        self.stdout.write(json.dumps(report, indent=2))
+        message = f"Imported {report['imported']} chat(s), rejected {report['rejected']}, {report['rows_per_s']} lines/s."
+        self.stdout.write(self.style.WARNING(message) if report['rejected'] else self.style.SUCCESS(message))
+
+    def progress(self, checkpoint):
+        self.stdout.write(f'  line {checkpoint.line}: {checkpoint.imported} imported, {checkpoint.rejected} rejected')
@@ -0,0 +1,72 @@
+import json
+import random
+from importlib import import_module
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.crypto import get_random_string
+from main.loadtest import DEFAULT_MIX, build_plan, homepage_paths, run_plan
+from main.models import Comment, Post
+
+def session_cookies(users):
+    # Logged in sessions made directly in the session store, the server has
+    # to share it (same database or cache)
+    store = import_module(settings.SESSION_ENGINE).SessionStore
+    cookies = []
+    for user in users:
+        session = store()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        cookies.append({settings.SESSION_COOKIE_NAME: session.session_key, 'csrftoken': get_random_string(32)})
+    return cookies
+
+class Command(BaseCommand):
+    help = ('Run a mixed load of homepage (every sort, time window and page), post page, vote and comment '
+            'requests against a running server that shares this database, and report throughput and '
+            'latency percentiles per endpoint as JSON. Writes are made as users created by seed_data; '
+            'raise THROTTLE_RATES on the server or the vote and comment limits answer most of them.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', required=True)
+        parser.add_argument('--requests', type=int, default=2000, help='Requests in total.')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--pages', type=int, default=3, help='Homepage pages per sort and time window.')
+        parser.add_argument('--posts', type=int, default=200, help='Post pages to spread reads and writes over, hottest first.')
+        parser.add_argument('--users', type=int, default=50, help='Seed users to vote and comment as.')
+        parser.add_argument('--prefix', default='seed', help='Username prefix of the seed users.')
+        parser.add_argument('--mix', action='append', default=[],
+                            help=f'endpoint=weight, repeatable. Defaults to {DEFAULT_MIX}.')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--output', help='Also write the JSON report to this file.')
+
+    def handle(self, *args, **options):
+        mix = dict(DEFAULT_MIX)
+        try:
+            for spec in options['mix']:
+                name, weight = spec.split('=', 1)
+                if name not in DEFAULT_MIX:
+                    raise CommandError(f'Unknown endpoint {name}, pick from {", ".join(DEFAULT_MIX)}.')
+                mix[name] = float(weight)
+        except ValueError:
+            raise CommandError('Mix entries must be given as endpoint=weight.')
+
+        post_ids = list(Post.objects.order_by('-hot_score', '-id').values_list('id', flat=True)[:options['posts']])
+        comment_ids = list(Comment.objects.filter(post_id__in=post_ids).values_list('id', flat=True)[:options['posts'] * 20])
+        users = User.objects.filter(username__startswith=f"{options['prefix']}_").order_by('id')[:options['users']]
+        sessions = session_cookies(users)
+        homepage = homepage_paths(options['base_url'], options['pages'], options['timeout'])
+
+        plan = build_plan(random.Random(options['seed']), options['requests'], mix, homepage, post_ids, comment_ids, sessions)
+        if not plan:
+            raise CommandError('Nothing to request, is the server up and the database seeded (see seed_data)?')
+        report = run_plan(options['base_url'], plan, options['concurrency'], options['timeout'])
+
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
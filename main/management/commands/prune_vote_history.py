@@ -0,0 +1,27 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from main.partitions import create_upcoming_partitions, is_partitioned, prune_vote_history
+
+class Command(BaseCommand):
+    help = ('Expire VoteTimestamp history older than --days and, on Postgres, create the monthly '
+            'partitions for the coming months. Run it daily, e.g. from cron.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90)
+        parser.add_argument('--months-ahead', type=int, default=2)
+
+    def handle(self, *args, **options):
+        if is_partitioned():
+            created = create_upcoming_partitions(options['months_ahead'])
+            for name in created:
+                self.stdout.write(f'Created partition {name}')
+
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        dropped, deleted = prune_vote_history(cutoff)
+        for name in dropped:
+            self.stdout.write(f'Dropped partition {name}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Pruned vote history before {cutoff:%Y-%m-%d %H:%M}: '
+            f'{len(dropped)} partition(s) dropped, {deleted} row(s) deleted.'
+        ))
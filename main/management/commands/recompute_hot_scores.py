@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from main.models import Post
+from main.ranking import hot_score_expression
+
+class Command(BaseCommand):
+    help = ('Recompute Post.hot_score for every post in a single UPDATE. Votes keep scores current, '
+            'run this periodically (e.g. from cron) to correct rounding drift and manual edits.')
+
+    def handle(self, *args, **options):
+        updated = Post.objects.update(hot_score=hot_score_expression())
+        self.stdout.write(self.style.SUCCESS(f'Recomputed hot scores for {updated} post(s).'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from main.models import Post, Comment
+
+class Command(BaseCommand):
+    help = 'Recompute Post.comment_count from the comment table and fix any drifted rows.'
+
+    def handle(self, *args, **options):
+        actual = Coalesce(Subquery(
+            Comment.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(n=Count('pk')).values('n')
+        ), 0)
+        stale = Post.objects.annotate(actual=actual).exclude(comment_count=F('actual'))
+        fixed = Post.objects.filter(pk__in=stale.values('pk')).update(comment_count=actual)
+        self.stdout.write(self.style.SUCCESS(f'Reconciled comment counts, {fixed} post(s) updated.'))
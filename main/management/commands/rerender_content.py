@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from main.models import Post, Comment
+from main.rendering import RENDER_VERSION, render_content
+
+class Command(BaseCommand):
+    help = ('Render stored HTML for posts and comments saved before it existed or with an older '
+            'RENDER_VERSION. Pages fall back to rendering on read until this has run.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--all', action='store_true', help='Re-render rows that are already current as well.')
+
+    def rerender(self, model, batch_size, everything):
+        queryset = model.objects.all()
+        if not everything:
+            queryset = queryset.exclude(content_html_version=RENDER_VERSION)
+        last_id = 0
+        updated = 0
+        while True:
+            rows = list(queryset.filter(id__gt=last_id).order_by('id').values_list('id', 'content')[:batch_size])
+            if not rows:
+                break
+            model.objects.bulk_update(
+                [model(id=pk, content_html=render_content(content), content_html_version=RENDER_VERSION) for pk, content in rows],
+                ['content_html', 'content_html_version'],
+            )
+            updated += len(rows)
+            last_id = rows[-1][0]
+        return updated
+
+    def handle(self, *args, **options):
+        posts = self.rerender(Post, options['batch_size'], options['all'])
+        comments = self.rerender(Comment, options['batch_size'], options['all'])
+        self.stdout.write(self.style.SUCCESS(f'Rendered {posts} post(s) and {comments} comment(s).'))
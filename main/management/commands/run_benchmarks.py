@@ -0,0 +1,67 @@
+import json
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from main import benchmarks
+
+class Command(BaseCommand):
+    help = ('Time template renders, comment tree assembly, template filters and view querysets on a '
+            'seeded throwaway database and compare them with a stored baseline. Fails when a benchmark '
+            'got slower than the baseline by more than --threshold. The first run on a machine, or one '
+            'with --save, records the baseline instead.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--baseline', default=os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json'))
+        parser.add_argument('--save', action='store_true', help='Store this run as the baseline.')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Allowed slowdown as a fraction of the baseline, 0.25 is 25%%.')
+        parser.add_argument('--only', action='append', dest='names', help='Benchmark name prefix, repeatable.')
+        parser.add_argument('--retries', type=int, default=2,
+                            help='Times a benchmark slower than the threshold is measured again before failing.')
+        parser.add_argument('--rounds', type=int, default=7)
+        parser.add_argument('--min-time', type=float, default=0.05, help='Seconds per round at least.')
+        parser.add_argument('--output', help='Also write this run as JSON to this file.')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if not options['save']:
+            try:
+                baseline = benchmarks.load_baseline(options['baseline'])
+            except FileNotFoundError:
+                self.stdout.write(f"No baseline at {options['baseline']} yet, this run is saved as the baseline.")
+                options['save'] = True
+            else:
+                if baseline['environment'] != benchmarks.environment():
+                    raise CommandError(
+                        f"The baseline was recorded with {baseline['environment']}, "
+                        f"record a new one with --save for {benchmarks.environment()}."
+                    )
+
+        with benchmarks.benchmark_database(verbosity=max(options['verbosity'] - 1, 0)) as data:
+            results = benchmarks.run(data, options['names'], options['rounds'], options['min_time'])
+            if baseline is not None:
+                rows, regressions = benchmarks.confirm(
+                    data, results, baseline['results'], options['threshold'], options['retries'],
+                    options['rounds'], options['min_time'],
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+        if options['save']:
+            os.makedirs(os.path.dirname(options['baseline']) or '.', exist_ok=True)
+            benchmarks.save_baseline(options['baseline'], results)
+            for name, result in results.items():
+                self.stdout.write(f"  {name:40} {result['min_ms']:>10.3f} ms")
+            self.stdout.write(self.style.SUCCESS(f"Saved {len(results)} benchmark(s) to {options['baseline']}."))
+            return
+
+        for name, before, after, change in rows:
+            line = f'  {name:40} {before:>10.3f} ms -> {after:>10.3f} ms  {change:+.1%}'
+            self.stdout.write(self.style.ERROR(line) if change > options['threshold'] else line)
+        for name in sorted(set(results) - set(baseline['results'])):
+            self.stdout.write(f"  {name:40} {'new':>10}    -> {results[name]['min_ms']:>10.3f} ms")
+        if regressions:
+            raise CommandError(f'{len(regressions)} benchmark(s) slower than the baseline by more than {options["threshold"]:.0%}.')
+        self.stdout.write(self.style.SUCCESS(f'{len(rows)} benchmark(s) within {options["threshold"]:.0%} of the baseline.'))
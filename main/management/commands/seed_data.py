@@ -0,0 +1,40 @@
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from main.seeding import SEED_PASSWORD, Seeder
+
+class Command(BaseCommand):
+    help = ('Generate a large, deterministic dataset for load tests: users, posts with long contents, '
+            'deep comment threads and their votes, written with COPY on Postgres. Seed users are named '
+            f'<prefix>_000000 and up and log in with the password "{SEED_PASSWORD}".')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--post-votes', type=int, default=200000)
+        parser.add_argument('--comment-votes', type=int, default=200000)
+        parser.add_argument('--max-depth', type=int, default=12, help='Deepest reply chain.')
+        parser.add_argument('--content-size', type=int, default=40000, help='Characters per post.')
+        parser.add_argument('--days', type=int, default=90, help='Spread creation times over this many days.')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--prefix', default='seed', help='Username prefix, must not be in use yet.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('At least one user is needed.')
+        if User.objects.filter(username__startswith=f"{options['prefix']}_").exists():
+            raise CommandError(f"Users named {options['prefix']}_* exist already, pass another --prefix.")
+
+        start = time.perf_counter()
+        counts = Seeder(
+            users=options['users'], posts=options['posts'], comments=options['comments'],
+            post_votes=options['post_votes'], comment_votes=options['comment_votes'],
+            max_depth=options['max_depth'], content_size=options['content_size'], days=options['days'],
+            seed=options['seed'], prefix=options['prefix'], batch_size=options['batch_size'],
+        ).run()
+        elapsed = time.perf_counter() - start
+        for name, count in counts.items():
+            self.stdout.write(f'  {name:15} {count:>10}')
+        self.stdout.write(self.style.SUCCESS(f'Seeded {sum(counts.values())} rows in {elapsed:.1f}s.'))
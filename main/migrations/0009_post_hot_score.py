@@ -0,0 +1,29 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:21
+
+from django.db import migrations, models
+from main.ranking import hot_score_expression
+
+
+def backfill_hot_score(apps, schema_editor):
+    Post = apps.get_model('main', 'Post')
+    Post.objects.update(hot_score=hot_score_expression())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_post_comment_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='hot_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(backfill_hot_score, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-hot_score', '-id'], name='main_post_hot_score_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_post_hot_score'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-votes', 'created_at'], name='main_comment_thread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['user', '-created_at'], name='main_comment_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-created_at', '-id'], name='main_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['user', '-created_at'], name='main_post_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='votetimestamp',
+            index=models.Index(fields=['user', 'timestamp'], name='main_votetimestamp_user_ts_idx'),
+        ),
+    ]
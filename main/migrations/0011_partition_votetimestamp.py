@@ -0,0 +1,67 @@
+# Generated by Django 4.2.2 on 2026-10-18 11:02
+
+import datetime
+from django.db import migrations
+
+
+def month_bound(year, month):
+    return datetime.datetime(year + (month - 1) // 12, (month - 1) % 12 + 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def partition_vote_timestamp(apps, schema_editor):
+    # Postgres only: rebuild main_votetimestamp as a table partitioned by month
+    # so expired history can be dropped a partition at a time. The primary key
+    # has to include the partition column, ids stay unique via the sequence.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('ALTER TABLE main_votetimestamp RENAME TO main_votetimestamp_unpartitioned')
+        cursor.execute('ALTER TABLE main_votetimestamp_unpartitioned RENAME CONSTRAINT main_votetimestamp_pkey TO main_votetimestamp_unpartitioned_pkey')
+        cursor.execute('ALTER INDEX main_votetimestamp_user_ts_idx RENAME TO main_votetimestamp_unpartitioned_user_ts_idx')
+        cursor.execute(
+            '''
+            CREATE TABLE main_votetimestamp (
+                id bigint NOT NULL,
+                "timestamp" timestamp with time zone NOT NULL,
+                user_id integer NOT NULL REFERENCES auth_user (id) DEFERRABLE INITIALLY DEFERRED,
+                PRIMARY KEY (id, "timestamp")
+            ) PARTITION BY RANGE ("timestamp")
+            '''
+        )
+        cursor.execute('CREATE TABLE main_votetimestamp_default PARTITION OF main_votetimestamp DEFAULT')
+
+        cursor.execute('SELECT MIN("timestamp") FROM main_votetimestamp_unpartitioned')
+        oldest = cursor.fetchone()[0]
+        now = datetime.datetime.now(datetime.timezone.utc)
+        first = oldest or now
+        months = (now.year - first.year) * 12 + now.month - first.month + 2
+        for offset in range(months + 1):
+            start = month_bound(first.year, first.month + offset)
+            end = month_bound(first.year, first.month + offset + 1)
+            cursor.execute(
+                f'CREATE TABLE main_votetimestamp_p{start.year:04d}_{start.month:02d} '
+                'PARTITION OF main_votetimestamp FOR VALUES FROM (%s) TO (%s)',
+                [start, end],
+            )
+
+        cursor.execute(
+            'INSERT INTO main_votetimestamp (id, "timestamp", user_id) '
+            'SELECT id, "timestamp", user_id FROM main_votetimestamp_unpartitioned'
+        )
+        cursor.execute('DROP TABLE main_votetimestamp_unpartitioned')
+
+        cursor.execute('CREATE SEQUENCE main_votetimestamp_id_seq OWNED BY main_votetimestamp.id')
+        cursor.execute("ALTER TABLE main_votetimestamp ALTER COLUMN id SET DEFAULT nextval('main_votetimestamp_id_seq')")
+        cursor.execute("SELECT setval('main_votetimestamp_id_seq', COALESCE(MAX(id), 0) + 1, false) FROM main_votetimestamp")
+        cursor.execute('CREATE INDEX main_votetimestamp_user_ts_idx ON main_votetimestamp (user_id, "timestamp")')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_vote_timestamp, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_partition_votetimestamp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='content_html',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='content_html_version',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='content_html',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='content_html_version',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_comment_thread_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommentThread',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='main.post')),
+                ('data', models.JSONField(blank=True, null=True)),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:37
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def segment(comment_id):
+    return f'{comment_id:010d}'
+
+
+def backfill_comment_path(apps, schema_editor):
+    # Only comments whose parent already has its path are ready, so the
+    # tree fills in a level at a time and every reply builds on its
+    # parent's stored path however deep it is
+    Comment = apps.get_model('main', 'Comment')
+    CommentThread = apps.get_model('main', 'CommentThread')
+    ready = Comment.objects.filter(Q(parent__isnull=True) | Q(parent__path__gt=''), path='')
+    while True:
+        rows = list(ready.order_by('id').values_list('id', 'parent__path')[:2000])
+        if not rows:
+            break
+        Comment.objects.bulk_update(
+            [Comment(id=pk, path=(parent_path or '') + segment(pk)) for pk, parent_path in rows],
+            ['path'],
+        )
+    # Snapshots now carry paths, rebuild them on the next read
+    CommentThread.objects.update(data=None, version=models.F('version') + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0014_commentthread'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='main_comment_reply_idx',
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, default='', editable=False, max_length=500),
+        ),
+        migrations.RunPython(backfill_comment_path, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='main_comment_path_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:58
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    # Postgres keeps a weighted tsvector per row in a generated column, so every
+    # write updates it, with a GIN index on top. SQLite (local development and
+    # tests) gets FTS5 tables that the save signals keep in sync, see
+    # main/search.py.
+    vendor = schema_editor.connection.vendor
+    with schema_editor.connection.cursor() as cursor:
+        if vendor == 'postgresql':
+            cursor.execute(
+                "ALTER TABLE main_post ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+                "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+                "setweight(to_tsvector('english', coalesce(content, '')), 'B')) STORED"
+            )
+            cursor.execute('CREATE INDEX main_post_search_idx ON main_post USING gin (search_vector)')
+            cursor.execute(
+                "ALTER TABLE main_comment ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+                "to_tsvector('english', coalesce(content, ''))) STORED"
+            )
+            cursor.execute('CREATE INDEX main_comment_search_idx ON main_comment USING gin (search_vector)')
+        elif vendor == 'sqlite':
+            cursor.execute("CREATE VIRTUAL TABLE main_post_fts USING fts5(title, content, tokenize='porter unicode61')")
+            cursor.execute('INSERT INTO main_post_fts (rowid, title, content) SELECT id, title, content FROM main_post')
+            cursor.execute("CREATE VIRTUAL TABLE main_comment_fts USING fts5(content, tokenize='porter unicode61')")
+            cursor.execute('INSERT INTO main_comment_fts (rowid, content) SELECT id, content FROM main_comment')
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    with schema_editor.connection.cursor() as cursor:
+        if vendor == 'postgresql':
+            cursor.execute('ALTER TABLE main_post DROP COLUMN search_vector')
+            cursor.execute('ALTER TABLE main_comment DROP COLUMN search_vector')
+        elif vendor == 'sqlite':
+            cursor.execute('DROP TABLE main_post_fts')
+            cursor.execute('DROP TABLE main_comment_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_comment_path'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
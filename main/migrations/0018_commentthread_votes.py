@@ -0,0 +1,26 @@
+# Generated by Django 4.2.2 on 2026-10-18 11:42
+
+from django.db import migrations, models
+
+
+def drop_whole_thread_snapshots(apps, schema_editor):
+    # Snapshots used to hold every comment of the thread, the next read of
+    # each post builds its first page instead
+    CommentThread = apps.get_model('main', 'CommentThread')
+    CommentThread.objects.update(data=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0017_importcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commentthread',
+            name='votes',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.RunPython(drop_whole_thread_snapshots, migrations.RunPython.noop),
+    ]
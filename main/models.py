@@ -1,14 +1,33 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+from .ranking import hot_score
+from .rendering import RenderedContentMixin
 
-class Post(models.Model):
+class Post(RenderedContentMixin, models.Model):
     title = models.CharField(max_length=200)
     content = models.CharField(max_length=40000)
+    content_html = models.TextField(blank=True, default='')
+    content_html_version = models.PositiveSmallIntegerField(default=0)
     extra_info = models.CharField(max_length=1000, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     votes = models.IntegerField(default=1)
+    comment_count = models.IntegerField(default=0)
+    hot_score = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-hot_score', '-id'], name='main_post_hot_score_idx'),
+            models.Index(fields=['-created_at', '-id'], name='main_post_created_idx'),
+            models.Index(fields=['user', '-created_at'], name='main_post_user_created_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.hot_score = hot_score(self.votes, self.created_at or timezone.now())
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title
@@ -24,22 +43,81 @@ class PostVote(models.Model):
     def __str__(self):
         return f'{self.user.username} upvoted {self.post.title}'
 
-class Comment(models.Model):
+# Each comment's path is its ancestors' ids followed by its own, every id
+# zero-padded to COMMENT_PATH_STEP digits. Sorting by path lists a thread
+# depth first with siblings in creation order, and a subtree is one range.
+COMMENT_PATH_STEP = 10
+MAX_COMMENT_DEPTH = 50
+
+def comment_path_segment(comment_id):
+    return f'{comment_id:0{COMMENT_PATH_STEP}d}'
+
+def comment_path_end(path):
+    # The first path after every descendant of path. A comment without a
+    # path yet gets an empty range.
+    if not path:
+        return path
+    return path[:-COMMENT_PATH_STEP] + comment_path_segment(int(path[-COMMENT_PATH_STEP:]) + 1)
+
+class Comment(RenderedContentMixin, models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True)
+    # Set right after the insert, see main/signals.py
+    path = models.CharField(max_length=COMMENT_PATH_STEP * MAX_COMMENT_DEPTH, blank=True, default='', editable=False)
     content = models.CharField(max_length=4000)
+    content_html = models.TextField(blank=True, default='')
+    content_html_version = models.PositiveSmallIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     votes = models.IntegerField(default=1)
 
+    class Meta:
+        indexes = [
+            # Root comments page through (-votes, created_at, id) and replies
+            # are fetched as path ranges
+            models.Index(fields=['post', '-votes', 'created_at', 'id'], name='main_comment_root_idx',
+                         condition=models.Q(parent__isnull=True)),
+            models.Index(fields=['post', 'path'], name='main_comment_path_idx'),
+            models.Index(fields=['user', '-created_at'], name='main_comment_user_created_idx'),
+        ]
+
     def is_root_comment(self):
-        return self.parent is None
+        return self.parent_id is None
+
+    @property
+    def depth(self):
+        return max(len(self.path) // COMMENT_PATH_STEP - 1, 0)
+
+    def can_have_replies(self):
+        return self.depth + 1 < MAX_COMMENT_DEPTH
+
+    def build_path(self, parent_path=''):
+        return parent_path + comment_path_segment(self.id)
+
+    def descendants(self):
+        # The whole subtree in display order, one range scan on the path index
+        return Comment.objects.filter(
+            post_id=self.post_id, path__gt=self.path, path__lt=comment_path_end(self.path),
+        ).order_by('path')
 
     def __str__(self):
         return f'{self.user.username} commented on {self.post.title}'
 
 
+# The serialized first page of a post's comments, see main/threads.py. data
+# and votes are None until the first read builds them, version counts writes
+# so a build that raced with a write is never stored.
+class CommentThread(models.Model):
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True)
+    data = models.JSONField(null=True, blank=True)
+    votes = models.JSONField(null=True, blank=True)
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Comment thread of post {self.post_id}'
+
 class CommentVote(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     comment = models.ForeignKey(Comment, on_delete=models.CASCADE)
@@ -55,5 +133,24 @@ class VoteTimestamp(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'timestamp'], name='main_votetimestamp_user_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user.username} voted at {self.timestamp}'
+
+# How far a bulk import got, see main/importing.py. Saved in the same
+# transaction as each batch, so a resumed import neither skips nor repeats
+# a line.
+class ImportCheckpoint(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+    offset = models.BigIntegerField(default=0)
+    line = models.BigIntegerField(default=0)
+    imported = models.BigIntegerField(default=0)
+    rejected = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
-        return f'{self.user.username} voted at {self.timestamp}'
\ No newline at end of file
+        return f'Import {self.name} at line {self.line}'
@@ -0,0 +1,263 @@
+import hashlib
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+# Full-page cache for anonymous readers. Every cached page records the
+# versions of the data it shows ('listings' for the homepage, 'post:<id>'
+# for a post page). Writes bump those versions, which turns the cached pages
+# stale. A stale page is still served while one request, the one that wins
+# the regeneration lock, renders the new version, so an invalidated trending
+# page never sends every worker to the database at once.
+#
+# The same versions give the pages their ETag and Last-Modified, for logged
+# in readers too, so a revalidation is answered with a 304 from the cache.
+
+LISTINGS = 'listings'
+
+def post_version(post_id):
+    return f'post:{post_id}'
+
+def get_cache():
+    return caches[settings.PAGE_CACHE]
+
+def _version_key(name):
+    return f'pagecache:version:{name}'
+
+def _bump(names):
+    get_cache().set_many({_version_key(name): time.time_ns() for name in names}, None)
+
+def bump(*names):
+    # Once now so other processes stop serving the page, and again after
+    # commit in case a page was regenerated from the not yet committed state
+    if settings.PAGE_CACHE is None:
+        return
+    _bump(names)
+    transaction.on_commit(lambda: _bump(names))
+
+def post_changed(post_id, listings=True):
+    if listings:
+        bump(LISTINGS, post_version(post_id))
+    else:
+        bump(post_version(post_id))
+
+def is_cacheable(request):
+    # Readers without a session or pending messages are anonymous and see the
+    # same page, checking the cookies avoids loading request.user
+    return (
+        settings.PAGE_CACHE is not None
+        and request.method in ('GET', 'HEAD')
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and 'messages' not in request.COOKIES
+    )
+
+def page_key(request, params):
+    query = '&'.join(f'{name}={request.GET.get(name, "")}' for name in params)
+    digest = hashlib.md5(f'{request.path}?{query}'.encode()).hexdigest()
+    return f'pagecache:page:{digest}'
+
+def read_versions(keys, cached):
+    # Versions never expire, but an evicted one must not match old pages, so
+    # missing versions are created rather than read as zero
+    missing = {key: time.time_ns() for key in keys if key not in cached}
+    return [cached.get(key, missing.get(key)) for key in keys], missing
+
+def validators(viewer, versions, now):
+    # Validators come from the versions the page shows, never from rendering
+    # it. They also roll over every PAGE_CACHE_TIMEOUT seconds, for pages that
+    # change with time alone (the trending windows, a deployed template).
+    period_start = int(now - now % settings.PAGE_CACHE_TIMEOUT)
+    etag = hashlib.md5(f'{viewer}|{versions}|{period_start}'.encode()).hexdigest()
+    last_modified = max([period_start] + [version // 10**9 for version in versions])
+    return f'"{etag}"', last_modified
+
+def set_validators(response, etag, last_modified, private=False):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Browsers and Caddy keep the page but check back before each use
+    if private:
+        patch_cache_control(response, no_cache=True, private=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
+
+def not_modified(request, etag, last_modified, private=False):
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        set_validators(response, etag, last_modified, private)
+    return response
+
+class CachedPage:
+    FRESH = 'HIT'
+    STALE = 'STALE'
+    MISS = 'MISS'
+    viewer = 'anonymous'
+
+    def __init__(self, request, key, version_names):
+        self.request = request
+        self.key = key
+        self.version_keys = [_version_key(name) for name in version_names]
+        self.lock_key = f'{key}:lock'
+
+    def keys(self):
+        return [self.key] + self.version_keys
+
+    def state(self, cached, now):
+        versions, missing = read_versions(self.version_keys, cached)
+        entry = cached.get(self.key)
+        if entry is None or now - entry['time'] > settings.PAGE_CACHE_STALE_TIMEOUT:
+            return self.MISS, versions, missing
+        if entry['versions'] == versions and now - entry['time'] <= settings.PAGE_CACHE_TIMEOUT:
+            return self.FRESH, versions, missing
+        return self.STALE, versions, missing
+
+    def entry(self, response, versions, now):
+        return {'versions': versions, 'time': now, 'content': response.content, 'content_type': response['Content-Type']}
+
+    def cached_response(self, entry, state):
+        # A stale copy keeps the validators it was served with the first time
+        etag, last_modified = validators(self.viewer, entry['versions'], entry['time'])
+        response = not_modified(self.request, etag, last_modified)
+        if response is None:
+            response = set_validators(HttpResponse(entry['content'], content_type=entry['content_type']), etag, last_modified)
+        response['X-Page-Cache'] = state
+        return response
+
+    def rendered_response(self, response, versions, now):
+        set_validators(response, *validators(self.viewer, versions, now))
+        response['X-Page-Cache'] = self.MISS
+        return response
+
+    def get(self, render):
+        cache = get_cache()
+        now = time.time()
+        cached = cache.get_many(self.keys())
+        state, versions, missing = self.state(cached, now)
+        if missing:
+            cache.set_many(missing, None)
+        if state == self.FRESH:
+            return self.cached_response(cached[self.key], state)
+        if state == self.STALE and not cache.add(self.lock_key, 1, settings.PAGE_CACHE_LOCK_TIMEOUT):
+            return self.cached_response(cached[self.key], state)
+
+        try:
+            # The reader may already hold this version from another process
+            response = not_modified(self.request, *validators(self.viewer, versions, now))
+            if response is not None:
+                return response
+            response = render()
+            if response.status_code != 200 or response.streaming:
+                return response
+            cache.set(self.key, self.entry(response, versions, now), settings.PAGE_CACHE_STALE_TIMEOUT)
+        finally:
+            if state == self.STALE:
+                cache.delete(self.lock_key)
+        return self.rendered_response(response, versions, now)
+
+    async def aget(self, render):
+        cache = get_cache()
+        now = time.time()
+        cached = await cache.aget_many(self.keys())
+        state, versions, missing = self.state(cached, now)
+        if missing:
+            await cache.aset_many(missing, None)
+        if state == self.FRESH:
+            return self.cached_response(cached[self.key], state)
+        if state == self.STALE and not await cache.aadd(self.lock_key, 1, settings.PAGE_CACHE_LOCK_TIMEOUT):
+            return self.cached_response(cached[self.key], state)
+
+        try:
+            response = not_modified(self.request, *validators(self.viewer, versions, now))
+            if response is not None:
+                return response
+            response = await render()
+            if response.status_code != 200 or response.streaming:
+                return response
+            await cache.aset(self.key, self.entry(response, versions, now), settings.PAGE_CACHE_STALE_TIMEOUT)
+        finally:
+            if state == self.STALE:
+                await cache.adelete(self.lock_key)
+        return self.rendered_response(response, versions, now)
+
+def viewer_of(request):
+    # Who the page is rendered for. Pages that show flash messages get no
+    # validators at all, or a later 304 would show the message again.
+    if len(get_messages(request)):
+        return None
+    return f'{request.user.pk}|{request.META.get("CSRF_COOKIE", "")}'
+
+def reader_versions(request, version_names):
+    # Logged in readers are not page cached but can still revalidate
+    if settings.PAGE_CACHE is None or request.method not in ('GET', 'HEAD'):
+        return None
+    cache = get_cache()
+    keys = [_version_key(name) for name in version_names]
+    versions, missing = read_versions(keys, cache.get_many(keys))
+    if missing:
+        cache.set_many(missing, None)
+    return versions
+
+def reader_validators(request, versions, now):
+    if versions is None:
+        return None
+    viewer = viewer_of(request)
+    return None if viewer is None else validators(viewer, versions, now)
+
+def reader_not_modified(request, versions, now):
+    page_validators = reader_validators(request, versions, now)
+    return page_validators and not_modified(request, *page_validators, private=True)
+
+def with_reader_validators(request, response, versions, now):
+    # Computed again after rendering, which may have set the CSRF cookie or
+    # shown messages
+    page_validators = reader_validators(request, versions, now) if response.status_code == 200 else None
+    if page_validators is not None:
+        set_validators(response, *page_validators, private=True)
+    return response
+
+class PageCacheMixin:
+    # Views set cache_params, the query parameters that select a page, and
+    # get_cache_versions(**kwargs), the versions the page depends on
+    cache_params = ()
+
+    def get_cache_versions(self, **kwargs):
+        raise NotImplementedError
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return self.adispatch(request, *args, **kwargs)
+        render = lambda: super(PageCacheMixin, self).dispatch(request, *args, **kwargs)
+        if is_cacheable(request):
+            page = CachedPage(request, page_key(request, self.cache_params), self.get_cache_versions(**kwargs))
+            return vary_on_cookie(page.get(render))
+
+        now = time.time()
+        versions = reader_versions(request, self.get_cache_versions(**kwargs))
+        response = reader_not_modified(request, versions, now)
+        if not response:
+            response = with_reader_validators(request, render(), versions, now)
+        return vary_on_cookie(response)
+
+    async def adispatch(self, request, *args, **kwargs):
+        render = lambda: super(PageCacheMixin, self).dispatch(request, *args, **kwargs)
+        if is_cacheable(request):
+            page = CachedPage(request, page_key(request, self.cache_params), self.get_cache_versions(**kwargs))
+            return vary_on_cookie(await page.aget(render))
+
+        now = time.time()
+        versions = await sync_to_async(reader_versions)(request, self.get_cache_versions(**kwargs))
+        response = await sync_to_async(reader_not_modified)(request, versions, now)
+        if not response:
+            response = await sync_to_async(with_reader_validators)(request, await render(), versions, now)
+        return vary_on_cookie(response)
+
+def vary_on_cookie(response):
+    # Cached pages never touch the session, which would otherwise add this
+    patch_vary_headers(response, ['Cookie'])
+    return response
@@ -0,0 +1,167 @@
+import base64
+import datetime
+import decimal
+import json
+import math
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+# Page numbers only label pages, but a forged cursor shouldn't claim more
+# pages than any listing will ever have
+MAX_PAGE_NUMBER = 100000
+
+def _encode_value(value):
+    # Keys must round-trip exactly, DjangoJSONEncoder would drop microseconds
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    raise TypeError(f'Cannot encode {type(value).__name__} in a cursor')
+
+def estimate_count(queryset):
+    # Postgres can answer from planner statistics without touching the rows,
+    # other databases (SQLite in development) just count
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+class CursorPage:
+    def __init__(self, paginator, object_list, number, has_next, has_previous):
+        self.paginator = paginator
+        self.object_list = object_list
+        self.number = number
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<CursorPage {self.number}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @cached_property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1], self.number + 1, backwards=False)
+
+    @cached_property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self.paginator.encode_cursor(self.object_list[0], self.number - 1, backwards=True)
+
+    @cached_property
+    def num_pages(self):
+        # Only evaluated when a template shows "Page X of Y", and the estimate
+        # can lag behind reality so never report fewer pages than we have seen
+        estimated = math.ceil(self.paginator.estimated_count / self.paginator.per_page)
+        return max(estimated, self.number + (1 if self._has_next else 0), 1)
+
+# Keyset pagination over a fixed ordering such as ('-hot_score', '-id'). The
+# last field must be unique so every row has a distinct position. Cursors are
+# opaque tokens holding the boundary row's key and the page number, so every
+# page is one indexed range scan however deep it is.
+class CursorPaginator:
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.fields = [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    @cached_property
+    def estimated_count(self):
+        return estimate_count(self.queryset)
+
+    def _key(self, row):
+        if isinstance(row, dict):
+            return [row[name] for name, _ in self.fields]
+        return [getattr(row, name) for name, _ in self.fields]
+
+    def _output_field(self, name):
+        # Orderings may use annotations, such as a search rank
+        try:
+            return self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return self.queryset.query.annotations[name].output_field
+
+    def encode_cursor(self, row, number, backwards):
+        payload = json.dumps({'n': number, 'b': backwards, 'k': self._key(row)}, default=_encode_value)
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            number, backwards, key = int(payload['n']), bool(payload['b']), payload['k']
+            if not isinstance(key, list) or len(key) != len(self.fields) or number > MAX_PAGE_NUMBER:
+                return None
+            key = [self._output_field(name).to_python(value) for (name, _), value in zip(self.fields, key)]
+        except (ValueError, TypeError, KeyError, OverflowError, ValidationError):
+            return None
+        # NULL never compares equal, a forged null key would match no rows
+        if any(value is None for value in key):
+            return None
+        return max(number, 1), backwards, key
+
+    def _beyond(self, key, backwards):
+        # (a, b) after (x, y) is a > x OR (a = x AND b > y), with each comparison
+        # flipped for descending fields and again when paging backwards
+        condition = Q()
+        equal = {}
+        for (name, descending), value in zip(self.fields, key):
+            lookup = 'lt' if descending != backwards else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def _page_query(self, cursor):
+        position = self.decode_cursor(cursor) if cursor else None
+        queryset = self.queryset.order_by(*self.ordering)
+        if position:
+            _, backwards, key = position
+            queryset = queryset.filter(self._beyond(key, backwards))
+            if backwards:
+                queryset = queryset.reverse()
+        return queryset[:self.per_page + 1], position
+
+    def _make_page(self, rows, position):
+        number, backwards = (position[0], position[1]) if position else (1, False)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if backwards:
+            rows.reverse()
+            if not has_more:
+                number = 1
+            return CursorPage(self, rows, number, has_next=True, has_previous=has_more)
+        return CursorPage(self, rows, number, has_next=has_more, has_previous=position is not None)
+
+    def get_page(self, cursor=None):
+        queryset, position = self._page_query(cursor)
+        return self._make_page(list(queryset), position)
+
+    async def aget_page(self, cursor=None):
+        queryset, position = self._page_query(cursor)
+        return self._make_page([row async for row in queryset], position)
@@ -0,0 +1,90 @@
+import datetime
+from django.db import connection
+from django.utils import timezone
+from .models import VoteTimestamp
+
+# On Postgres main_votetimestamp is partitioned by month on "timestamp", so
+# expiring history drops whole partitions instead of deleting rows. Other
+# databases (SQLite in development and tests) keep a plain table and fall
+# back to batched deletes.
+
+TABLE = VoteTimestamp._meta.db_table
+
+def month_start(value):
+    return datetime.date(value.year, value.month, 1)
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+def month_bound(month):
+    return datetime.datetime.combine(month, datetime.time(), datetime.timezone.utc)
+
+def partition_name(month):
+    return f'{TABLE}_p{month.year:04d}_{month.month:02d}'
+
+def is_partitioned():
+    return connection.vendor == 'postgresql'
+
+def _month_partitions(cursor):
+    # Partitions we create are named by month, anything else (the default
+    # partition) is never dropped wholesale
+    cursor.execute(
+        """
+        SELECT child.relname FROM pg_inherits
+        JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+        JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+        WHERE parent.relname = %s
+        """,
+        [TABLE],
+    )
+    partitions = {}
+    for (name,) in cursor.fetchall():
+        suffix = name[len(TABLE) + 2:]
+        try:
+            year, month = suffix.split('_')
+            partitions[datetime.date(int(year), int(month), 1)] = name
+        except ValueError:
+            continue
+    return partitions
+
+def ensure_partitions(first_month, last_month, cursor):
+    existing = _month_partitions(cursor)
+    created = []
+    month = first_month
+    while month <= last_month:
+        if month not in existing:
+            name = partition_name(month)
+            cursor.execute(
+                f'CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)',
+                [month_bound(month), month_bound(add_months(month, 1))],
+            )
+            created.append(name)
+        month = add_months(month, 1)
+    return created
+
+def create_upcoming_partitions(months_ahead):
+    this_month = month_start(timezone.now())
+    with connection.cursor() as cursor:
+        return ensure_partitions(this_month, add_months(this_month, months_ahead), cursor)
+
+def prune_vote_history(cutoff, batch_size=5000):
+    # Returns (dropped partition names, number of rows deleted one by one)
+    if not is_partitioned():
+        deleted = 0
+        while True:
+            ids = list(VoteTimestamp.objects.filter(timestamp__lt=cutoff).values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return [], deleted
+            deleted += VoteTimestamp.objects.filter(id__in=ids).delete()[0]
+
+    dropped = []
+    with connection.cursor() as cursor:
+        for month, name in sorted(_month_partitions(cursor).items()):
+            if month_bound(add_months(month, 1)) <= cutoff:
+                cursor.execute(f'DROP TABLE {name}')
+                dropped.append(name)
+        # Only stray rows outside every monthly partition are left for a DELETE
+        cursor.execute(f'DELETE FROM {TABLE}_default WHERE "timestamp" < %s', [cutoff])
+        deleted = cursor.rowcount
+    return dropped, deleted
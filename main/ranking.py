@@ -0,0 +1,33 @@
+import math
+from django.db.models import F, FloatField, Func, Value
+from django.db.models.functions import Cast, Greatest, Log
+
+# Scores are relative to this instant, so they stay small enough for a float
+HOT_SCORE_EPOCH = 1672531200  # 2023-01-01 00:00 UTC
+# Every HOT_SCORE_DECAY seconds a post needs ten times the votes to keep its rank
+HOT_SCORE_DECAY = 45000
+
+def hot_score(votes, created_at):
+    # Newer posts get a larger time term instead of older posts decaying, so a
+    # score only has to change when the votes do and stays valid in an index
+    return math.log10(max(votes, 1)) + (created_at.timestamp() - HOT_SCORE_EPOCH) / HOT_SCORE_DECAY
+
+class EpochSeconds(Func):
+    # Seconds since 1970 of a datetime, fraction included
+    template = 'EXTRACT(EPOCH FROM %(expressions)s)'
+    output_field = FloatField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='((julianday(%(expressions)s) - 2440587.5) * 86400.0)', **extra_context)
+
+def _log_votes(votes):
+    return Cast(Log(Value(10), Greatest(votes, Value(1))), FloatField())
+
+def hot_score_expression():
+    # hot_score() in SQL, so every score can be recomputed in one UPDATE
+    age = Cast(EpochSeconds(F('created_at')), FloatField()) - Value(float(HOT_SCORE_EPOCH))
+    return _log_votes(F('votes')) + age / Value(float(HOT_SCORE_DECAY))
+
+def hot_score_after_vote(delta):
+    # Swap the old vote term for the new one in the same UPDATE that changes votes
+    return F('hot_score') - _log_votes(F('votes')) + _log_votes(F('votes') + delta)
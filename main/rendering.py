@@ -0,0 +1,71 @@
+import hashlib
+import re
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.html import escape, linebreaks
+from django.utils.safestring import mark_safe
+from shareaichat import metrics
+
+# Bump whenever render_content's output changes, stored HTML from older
+# versions is then re-rendered on read until rerender_content catches up
+RENDER_VERSION = 1
+
+FENCED_CODE_RE = re.compile(r'^```[ \t]*([\w+#.-]*)[ \t]*\n(.*?)^```[ \t]*$', re.MULTILINE | re.DOTALL)
+INLINE_CODE_RE = re.compile(r'`([^`\n]+)`')
+
+def _render_text(text):
+    html = linebreaks(text.strip('\n'), autoescape=True)
+    if settings.CONTENT_FORMATTING:
+        # The text is escaped by now and backticks are never escaped
+        html = INLINE_CODE_RE.sub(r'<code>\1</code>', html)
+    return html
+
+def render_content(text):
+    # Everything the user wrote is escaped, the only markup we add is our own
+    if not settings.CONTENT_FORMATTING:
+        return linebreaks(text, autoescape=True)
+
+    parts = []
+    position = 0
+    for match in FENCED_CODE_RE.finditer(text):
+        before = text[position:match.start()]
+        if before.strip():
+            parts.append(_render_text(before))
+        language = match.group(1)
+        css_class = f' class="language-{escape(language)}"' if language else ''
+        parts.append(f'<pre><code{css_class}>{escape(match.group(2))}</code></pre>')
+        position = match.end()
+    rest = text[position:]
+    if rest.strip() or not parts:
+        parts.append(_render_text(rest))
+    return '\n\n'.join(parts)
+
+def render_content_cached(text):
+    key = f'rendered:{RENDER_VERSION}:{int(settings.CONTENT_FORMATTING)}:{hashlib.sha256(text.encode()).hexdigest()}'
+    html = cache.get(key)
+    metrics.inc('cache_requests_total', {'cache': 'rendered_content', 'result': 'miss' if html is None else 'hit'})
+    if html is None:
+        html = render_content(text)
+        cache.set(key, html, 60 * 60 * 24)
+    return mark_safe(html)
+
+class RenderedContentMixin:
+    # For models with content, content_html and content_html_version fields.
+    # Rendering on save means pages only ever emit the stored fragment.
+
+    def render_html(self):
+        self.content_html = render_content(self.content)
+        self.content_html_version = RENDER_VERSION
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            self.render_html()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'content_html', 'content_html_version'}
+        super().save(*args, **kwargs)
+
+    def rendered_content(self):
+        if self.content_html_version == RENDER_VERSION:
+            return mark_safe(self.content_html)
+        return render_content_cached(self.content)
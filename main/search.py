@@ -0,0 +1,179 @@
+import re
+from django.contrib.postgres.search import SearchConfig, SearchQuery, SearchRank, SearchVectorField
+from django.db import connections
+from django.db.models import F, FloatField, Func, Q, TextField, Value
+from django.db.models.expressions import Expression, RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from .models import Post, Comment
+
+# Full-text search over posts and comments, see migration 0016 for the
+# indexes. Each backend turns a user query into a filtered queryset with a
+# `rank` annotation, higher is better, and produces highlighted snippets for
+# the rows of one result page.
+
+# Private use characters mark matches in snippets until the text is escaped
+MATCH_START = '\ue000'
+MATCH_STOP = '\ue001'
+MAX_QUERY_LENGTH = 200
+
+# model: (table, full-text columns, snippet column)
+SEARCH_TABLES = {
+    Post: ('main_post', ('title', 'content'), 'content'),
+    Comment: ('main_comment', ('content',), 'content'),
+}
+
+def highlight(snippet):
+    return mark_safe(escape(snippet).replace(MATCH_START, '<mark>').replace(MATCH_STOP, '</mark>'))
+
+class SearchVectorColumn(Expression):
+    # The generated search_vector column of migration 0016, which isn't a
+    # model field. It keeps the alias of the table it was resolved against
+    # and is relabelled like any column, so it still points at its own row
+    # once the queryset is nested in a subquery.
+    def __init__(self, alias=None):
+        super().__init__(output_field=SearchVectorField())
+        self.alias = alias
+
+    def resolve_expression(self, query=None, allow_joins=True, reuse=None, summarize=False, for_save=False):
+        clone = self.copy()
+        clone.alias = query.get_initial_alias()
+        return clone
+
+    def relabeled_clone(self, change_map):
+        clone = self.copy()
+        clone.alias = change_map.get(self.alias, self.alias)
+        return clone
+
+    def get_group_by_cols(self):
+        return [self]
+
+    def as_sql(self, compiler, connection):
+        return f'{compiler.quote_name_unless_alias(self.alias)}.search_vector', []
+
+class PostgresSearch:
+    def tsquery(self, query):
+        return SearchQuery(query, search_type='websearch', config='english')
+
+    def search(self, model, query):
+        # vector=tsquery compiles to the indexed search_vector @@ tsquery
+        return model.objects.alias(vector=SearchVectorColumn()).filter(vector=self.tsquery(query)).annotate(
+            rank=SearchRank(SearchVectorColumn(), self.tsquery(query), cover_density=True)
+        )
+
+    def snippets(self, model, ids, query):
+        column = SEARCH_TABLES[model][2]
+        options = f'StartSel={MATCH_START}, StopSel={MATCH_STOP}, MaxWords=35, MinWords=15, MaxFragments=2'
+        snippet = Func(
+            SearchConfig('english'), F(column), self.tsquery(query), Value(options),
+            function='ts_headline', output_field=TextField(),
+        )
+        return dict(model.objects.filter(id__in=ids).annotate(snippet=snippet).values_list('id', 'snippet'))
+
+    def index(self, instance):
+        # The generated search_vector column follows every write
+        pass
+
+    def index_many(self, model, instances, using='default'):
+        pass
+
+    def remove(self, instance):
+        pass
+
+class SqliteSearch:
+    def match_query(self, query):
+        # FTS5 has its own query syntax, search for every word instead
+        words = re.findall(r'\w+', query)
+        return ' '.join('"{}"'.format(word) for word in words)
+
+    def search(self, model, query):
+        table = SEARCH_TABLES[model][0]
+        match = self.match_query(query)
+        if not match:
+            return model.objects.none().annotate(rank=Value(0.0, output_field=FloatField()))
+        # bm25() is lower for better matches, posts weigh their title 10x
+        weights = ', '.join(['10.0', '1.0'][:len(SEARCH_TABLES[model][1])])
+        return model.objects.filter(
+            id__in=RawSQL(f'SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH %s', [match])
+        ).annotate(
+            rank=RawSQL(
+                f'SELECT -bm25({table}_fts, {weights}) FROM {table}_fts WHERE {table}_fts MATCH %s AND rowid = {table}.id',
+                [match], output_field=FloatField(),
+            )
+        )
+
+    def snippets(self, model, ids, query):
+        table, columns, column = SEARCH_TABLES[model]
+        match = self.match_query(query)
+        if not match:
+            return {}
+        snippet = RawSQL(
+            f"SELECT snippet({table}_fts, %s, %s, %s, '…', 32) FROM {table}_fts WHERE {table}_fts MATCH %s AND rowid = {table}.id",
+            [columns.index(column), MATCH_START, MATCH_STOP, match], output_field=TextField(),
+        )
+        return dict(model.objects.filter(id__in=ids).annotate(snippet=snippet).values_list('id', 'snippet'))
+
+    def index(self, instance):
+        table, columns, _ = SEARCH_TABLES[type(instance)]
+        with connections[instance._state.db or 'default'].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table}_fts WHERE rowid = %s', [instance.pk])
+            cursor.execute(
+                f'INSERT INTO {table}_fts (rowid, {", ".join(columns)}) VALUES (%s, {", ".join(["%s"] * len(columns))})',
+                [instance.pk] + [getattr(instance, name) for name in columns],
+            )
+
+    def index_many(self, model, instances, using='default'):
+        # New rows written in bulk, which sends no post_save
+        table, columns, _ = SEARCH_TABLES[model]
+        with connections[using].cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {table}_fts (rowid, {", ".join(columns)}) VALUES (%s, {", ".join(["%s"] * len(columns))})',
+                [[instance.pk] + [getattr(instance, name) for name in columns] for instance in instances],
+            )
+
+    def remove(self, instance):
+        table = SEARCH_TABLES[type(instance)][0]
+        with connections[instance._state.db or 'default'].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table}_fts WHERE rowid = %s', [instance.pk])
+
+class ContainsSearch:
+    # Other databases have no index, fall back to a substring scan
+    def search(self, model, query):
+        condition = Q()
+        for name in SEARCH_TABLES[model][1]:
+            condition |= Q(**{f'{name}__icontains': query})
+        return model.objects.filter(condition).annotate(rank=Value(0.0, output_field=FloatField()))
+
+    def snippets(self, model, ids, query):
+        column = SEARCH_TABLES[model][2]
+        return {pk: text[:200] for pk, text in model.objects.filter(id__in=ids).values_list('id', column)}
+
+    def index(self, instance):
+        pass
+
+    def index_many(self, model, instances, using='default'):
+        pass
+
+    def remove(self, instance):
+        pass
+
+BACKENDS = {
+    'postgresql': PostgresSearch,
+    'sqlite': SqliteSearch,
+}
+
+def get_backend(using='default'):
+    return BACKENDS.get(connections[using].vendor, ContainsSearch)()
+
+def clean_query(query):
+    return (query or '').strip()[:MAX_QUERY_LENGTH]
+
+def search(model, query):
+    # Matching rows annotated with rank, unordered
+    return get_backend().search(model, clean_query(query))
+
+def attach_snippets(model, rows, query):
+    snippets = get_backend().snippets(model, [row.id for row in rows], clean_query(query)) if rows else {}
+    for row in rows:
+        row.snippet = highlight(snippets.get(row.id) or '')
+    return rows
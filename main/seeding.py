@@ -0,0 +1,236 @@
+import random
+from datetime import timedelta
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connections
+from django.db.models import Max
+from django.utils import timezone
+from .models import Post, PostVote, Comment, CommentVote, VoteTimestamp, COMMENT_PATH_STEP, MAX_COMMENT_DEPTH, comment_path_segment
+from .pagecache import LISTINGS, bump
+from .partitions import ensure_partitions, is_partitioned, month_start
+from .ranking import hot_score
+from .rendering import RENDER_VERSION, render_content
+from . import search
+
+# Generates a production sized dataset for load tests. Rows go in with COPY
+# on Postgres and multi-row INSERTs elsewhere, neither runs save() or the
+# signals, so everything those maintain is written directly: rendered HTML,
+# hot scores, vote and comment counters, comment paths and the search index.
+# The same seed always produces the same data.
+
+SEED_PASSWORD = 'seed-password'
+
+WORDS = (
+    'model prompt token context window quantized llama mistral weights layer attention sampling temperature '
+    'inference gpu memory batch latency throughput local server chat assistant reply question answer '
+    'code python function error output result benchmark run test compare faster slower better worse '
+    'the a an of to in and or but with without for on at from by this that these those it is was '
+    'will would could should can may might we you they i my our your their when where why how what'
+).split()
+
+def chunked(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def insert_rows(model, fields, rows, batch_size=5000, using='default'):
+    # rows are tuples in the order of fields (names or attnames), returns the
+    # number of rows written
+    connection = connections[using]
+    model_fields = [model._meta.get_field(name) for name in fields]
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in model_fields)
+    written = 0
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            with cursor.copy(f'COPY {table} ({columns}) FROM STDIN') as copy:
+                for row in rows:
+                    copy.write_row(row)
+                    written += 1
+            return written
+        sql = f'INSERT INTO {table} ({columns}) VALUES ({", ".join(["%s"] * len(model_fields))})'
+        for batch in chunked(rows, batch_size):
+            cursor.executemany(sql, [
+                [field.get_db_prep_save(value, connection) for field, value in zip(model_fields, row)]
+                for row in batch
+            ])
+            written += len(batch)
+    return written
+
+def next_id(model, using='default'):
+    return (model.objects.using(using).aggregate(last=Max('id'))['last'] or 0) + 1
+
+def skewed_counts(rng, total, slots, cap):
+    # A few slots get most of the total, like votes on a real front page
+    weights = [rng.paretovariate(1.2) for _ in range(slots)]
+    scale = total / sum(weights) if weights else 0
+    return [min(int(weight * scale), cap) for weight in weights]
+
+class Seeder:
+    def __init__(self, users=500, posts=1000, comments=20000, post_votes=200000, comment_votes=200000,
+                 max_depth=12, content_size=40000, days=90, seed=1, prefix='seed', batch_size=5000, using='default'):
+        self.users = users
+        self.posts = posts
+        self.comments = comments
+        self.post_votes = post_votes
+        self.comment_votes = comment_votes
+        self.max_depth = min(max_depth, MAX_COMMENT_DEPTH)
+        self.content_size = content_size
+        self.days = days
+        self.rng = random.Random(seed)
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.using = using
+        self.now = timezone.now()
+        self.counts = {}
+
+    def words(self, count):
+        return ' '.join(self.rng.choice(WORDS) for _ in range(count))
+
+    def paragraphs(self, size):
+        parts = []
+        length = 0
+        while length < size:
+            if self.rng.random() < 0.15:
+                part = f'```python\ndef {self.rng.choice(WORDS)}():\n    return "{self.words(6)}"\n```'
+            else:
+                part = self.words(self.rng.randint(40, 120)).capitalize() + '.'
+            parts.append(part)
+            length += len(part) + 2
+        return '\n\n'.join(parts)[:size]
+
+    def random_time(self, after):
+        return after + (self.now - after) * self.rng.random()
+
+    def run(self):
+        self.create_users()
+        posts = self.create_posts()
+        comments = self.create_comments(posts)
+        self.create_votes(posts, comments)
+        connection = connections[self.using]
+        with connection.cursor() as cursor:
+            # Posts and comments were written with explicit ids
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Post, Comment]):
+                cursor.execute(sql)
+        bump(LISTINGS)
+        return self.counts
+
+    def create_users(self):
+        password = make_password(SEED_PASSWORD)
+        User.objects.using(self.using).bulk_create(
+            [User(username=f'{self.prefix}_{i:06d}', password=password) for i in range(self.users)],
+            batch_size=self.batch_size,
+        )
+        self.user_ids = list(
+            User.objects.using(self.using).filter(username__startswith=f'{self.prefix}_').order_by('id').values_list('id', flat=True)
+        )
+        self.counts['users'] = len(self.user_ids)
+
+    def create_posts(self):
+        # (id, author, created_at, votes) for every post, comments and votes
+        # are planned from it
+        bodies = [self.paragraphs(self.content_size) for _ in range(16)]
+        rendered = [render_content(body) for body in bodies]
+        voters = skewed_counts(self.rng, self.post_votes, self.posts, len(self.user_ids) - 1)
+        self.comments_per_post = skewed_counts(self.rng, self.comments, self.posts, self.comments)
+        start = next_id(Post, self.using)
+        posts = []
+        rows = []
+        for i in range(self.posts):
+            post_id = start + i
+            author = self.rng.choice(self.user_ids)
+            created_at = self.now - timedelta(days=self.days) * self.rng.random()
+            votes = voters[i] + 1  # the author's own vote
+            body = self.rng.randrange(len(bodies))
+            posts.append((post_id, author, created_at, votes))
+            rows.append((
+                post_id, self.words(self.rng.randint(4, 12)).capitalize(), bodies[body], rendered[body], RENDER_VERSION,
+                created_at, created_at, author, votes, self.comments_per_post[i], hot_score(votes, created_at),
+            ))
+        fields = ['id', 'title', 'content', 'content_html', 'content_html_version', 'created_at', 'updated_at',
+                  'user_id', 'votes', 'comment_count', 'hot_score']
+        self.counts['posts'] = insert_rows(Post, fields, rows, self.batch_size, self.using)
+        backend = search.get_backend(self.using)
+        for batch in chunked(rows, self.batch_size):
+            backend.index_many(Post, [Post(id=row[0], title=row[1], content=row[2]) for row in batch], self.using)
+        return posts
+
+    def plan_thread(self, post, count, next_comment_id):
+        # Replies mostly go to one of the latest comments, which builds the
+        # long chains real threads have
+        post_id, _, created_at, _ = post
+        comments = []
+        for _ in range(count):
+            comment_id = next_comment_id + len(comments)
+            parent = None
+            if comments and self.rng.random() < 0.7:
+                candidates = [comment for comment in comments[-5:] if len(comment['path']) // COMMENT_PATH_STEP < self.max_depth]
+                parent = self.rng.choice(candidates) if candidates else None
+            parent_path = parent['path'] if parent else ''
+            comments.append({
+                'id': comment_id,
+                'post_id': post_id,
+                'parent_id': parent['id'] if parent else None,
+                'path': parent_path + comment_path_segment(comment_id),
+                'user_id': self.rng.choice(self.user_ids),
+                'created_at': self.random_time(parent['created_at'] if parent else created_at),
+                'content': self.words(self.rng.randint(10, 80)).capitalize() + '.',
+            })
+        return comments
+
+    def create_comments(self, posts):
+        comment_ids = []
+        next_comment_id = next_id(Comment, self.using)
+        voters = skewed_counts(self.rng, self.comment_votes, sum(self.comments_per_post), len(self.user_ids) - 1)
+
+        def rows():
+            nonlocal next_comment_id
+            for post, count in zip(posts, self.comments_per_post):
+                for comment in self.plan_thread(post, count, next_comment_id):
+                    votes = voters[len(comment_ids)] + 1
+                    comment_ids.append((comment['id'], comment['user_id'], comment['created_at'], votes))
+                    yield (
+                        comment['id'], comment['user_id'], comment['post_id'], comment['parent_id'], comment['path'],
+                        comment['content'], render_content(comment['content']), RENDER_VERSION,
+                        comment['created_at'], comment['created_at'], votes,
+                    )
+                next_comment_id += count
+
+        fields = ['id', 'user_id', 'post_id', 'parent_id', 'path', 'content', 'content_html', 'content_html_version',
+                  'created_at', 'updated_at', 'votes']
+        backend = search.get_backend(self.using)
+        written = 0
+        for batch in chunked(rows(), self.batch_size):
+            written += insert_rows(Comment, fields, batch, self.batch_size, self.using)
+            backend.index_many(Comment, [Comment(id=row[0], content=row[5]) for row in batch], self.using)
+        self.counts['comments'] = written
+        return comment_ids
+
+    def votes_for(self, targets):
+        # (user, target, timestamp) for each vote, the author's first
+        for target_id, author, created_at, votes in targets:
+            yield author, target_id, created_at
+            others = self.rng.sample(self.user_ids, min(votes, len(self.user_ids)))
+            for user_id in [user_id for user_id in others if user_id != author][:votes - 1]:
+                yield user_id, target_id, self.random_time(created_at)
+
+    def create_votes(self, posts, comments):
+        if is_partitioned():
+            with connections[self.using].cursor() as cursor:
+                ensure_partitions(month_start(self.now - timedelta(days=self.days)), month_start(self.now), cursor)
+
+        self.counts.update(post_votes=0, comment_votes=0, vote_history=0)
+        for name, model, field, targets in (('post_votes', PostVote, 'post_id', posts),
+                                            ('comment_votes', CommentVote, 'comment_id', comments)):
+            for batch in chunked(self.votes_for(targets), self.batch_size):
+                self.counts[name] += insert_rows(model, ['user_id', field, 'timestamp'], batch, self.batch_size, self.using)
+                self.counts['vote_history'] += insert_rows(
+                    VoteTimestamp, ['user_id', 'timestamp'], [(user_id, timestamp) for user_id, _, timestamp in batch],
+                    self.batch_size, self.using,
+                )
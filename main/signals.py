@@ -0,0 +1,67 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Post, Comment
+from . import pagecache, search, threads
+
+def assign_comment_path(instance):
+    # The path holds the comment's own id, so it is only known after the insert
+    if instance.path:
+        return
+    parent_path = ''
+    if instance.parent_id is not None:
+        parent_path = instance.parent.path
+    instance.path = instance.build_path(parent_path)
+    Comment.objects.filter(pk=instance.pk).update(path=instance.path)
+
+@receiver(post_save, sender=Comment)
+def increment_comment_count(sender, instance, created, **kwargs):
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(comment_count=F('comment_count') + 1)
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_count(sender, instance, origin=None, **kwargs):
+    # When the post itself is being deleted there is no counter left to maintain
+    if isinstance(origin, Post) or getattr(origin, 'model', None) is Post:
+        return
+    Post.objects.filter(pk=instance.post_id).update(comment_count=F('comment_count') - 1)
+
+# Sets the path first as the thread snapshot needs it, whatever order the
+# receivers are connected in
+@receiver(post_save, sender=Comment)
+def update_thread_on_save(sender, instance, created, raw=False, **kwargs):
+    if created:
+        assign_comment_path(instance)
+    if raw:
+        return
+    if created:
+        threads.comment_added(instance)
+    else:
+        threads.comment_changed(instance)
+
+@receiver(post_delete, sender=Comment)
+def update_thread_on_delete(sender, instance, origin=None, **kwargs):
+    # The snapshot is deleted along with the post
+    if isinstance(origin, Post) or getattr(origin, 'model', None) is Post:
+        return
+    threads.comment_removed(instance)
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.get_backend().index(instance)
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.get_backend().remove(instance)
+
+# Comment counts show on the listings, so comments change those too
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+def invalidate_pages(sender, instance, **kwargs):
+    post_id = instance.id if sender is Post else instance.post_id
+    pagecache.post_changed(post_id)
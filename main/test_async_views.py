@@ -0,0 +1,88 @@
+from django.test import TestCase, AsyncRequestFactory
+from django.contrib.auth.models import User, AnonymousUser
+from django.core.cache import caches
+from django.conf import settings
+from django.http import Http404
+from .models import Post, PostVote, Comment, CommentVote
+from .async_views import AsyncHomePage, AsyncPostDetailView, AsyncVotePostView, AsyncVoteCommentView
+from .loadtest import parse_endpoint, percentile, summarize
+
+class AsyncViewsTest(TestCase):
+    def setUp(self):
+        caches[settings.THROTTLE_CACHE].clear()
+        self.factory = AsyncRequestFactory()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.post = Post.objects.create(title='Test Post', content='Test Content', user=self.user)
+        PostVote.objects.create(user=self.user, post=self.post)
+        self.root = Comment.objects.create(user=self.user, post=self.post, content='Root comment')
+        self.reply = Comment.objects.create(user=self.user, post=self.post, parent=self.root, content='Reply')
+        CommentVote.objects.create(user=self.user, comment=self.root)
+
+    def get(self, path, user=None):
+        request = self.factory.get(path)
+        request.user = user or AnonymousUser()
+        return request
+
+    def post_request(self, path, user=None):
+        request = self.factory.post(path)
+        request.user = user or AnonymousUser()
+        request._dont_enforce_csrf_checks = True
+        return request
+
+    async def test_homepage(self):
+        response = await AsyncHomePage.as_view()(self.get('/', self.user))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Test Post')
+        self.assertContains(response, 'Page 1 of 1')
+
+    async def test_post_detail(self):
+        response = await AsyncPostDetailView.as_view()(self.get('/posts/', self.user), post_id=self.post.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Root comment')
+        self.assertContains(response, 'Reply')
+
+    async def test_post_detail_missing_post(self):
+        with self.assertRaises(Http404):
+            await AsyncPostDetailView.as_view()(self.get('/posts/'), post_id=99999)
+
+    async def test_vote_post_requires_login(self):
+        response = await AsyncVotePostView.as_view()(self.post_request('/votes/'), post_id=self.post.id)
+        self.assertEqual(response.status_code, 401)
+
+    async def test_vote_post_toggles(self):
+        view = AsyncVotePostView.as_view()
+        response = await view(self.post_request('/votes/', self.user), post_id=self.post.id)
+        self.assertJSONEqual(response.content, {'status': 'unvoted', 'post_id': self.post.id})
+        response = await view(self.post_request('/votes/', self.user), post_id=self.post.id)
+        self.assertJSONEqual(response.content, {'status': 'upvoted', 'post_id': self.post.id})
+        post = await Post.objects.aget(pk=self.post.pk)
+        self.assertEqual(post.votes, 1)
+
+    async def test_vote_invalid_post(self):
+        response = await AsyncVotePostView.as_view()(self.post_request('/votes/', self.user), post_id=99999)
+        self.assertEqual(response.status_code, 400)
+
+    async def test_vote_comment(self):
+        response = await AsyncVoteCommentView.as_view()(self.post_request('/votes/', self.user), comment_id=self.reply.id)
+        self.assertJSONEqual(response.content, {'status': 'upvoted', 'comment_id': self.reply.id})
+        reply = await Comment.objects.aget(pk=self.reply.pk)
+        self.assertEqual(reply.votes, 2)
+
+class LoadTestHelpersTest(TestCase):
+    def test_parse_endpoint(self):
+        self.assertEqual(parse_endpoint('/posts/1/'), ('GET', '/posts/1/'))
+        self.assertEqual(parse_endpoint('post:/votes/posts/1'), ('POST', '/votes/posts/1'))
+        self.assertEqual(parse_endpoint('GET:/?sort_by=new'), ('GET', '/?sort_by=new'))
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([7], 0.99), 7)
+        self.assertIsNone(percentile([], 0.5))
+
+    def test_summarize(self):
+        summary = summarize([3.0, 1.0, 2.0], [200, 200, 429], 0.5)
+        self.assertEqual(summary['rps'], 6.0)
+        self.assertEqual(summary['p50_ms'], 2.0)
+        self.assertEqual(summary['statuses'], {200: 2, 429: 1})
@@ -0,0 +1,75 @@
+import contextlib
+import io
+import os
+import tempfile
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase
+from . import benchmarks
+from .seeding import Seeder
+
+class BenchmarksTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Seeder(users=5, posts=12, comments=80, post_votes=20, comment_votes=40, content_size=3000, prefix='bench').run()
+
+    def test_every_benchmark_runs(self):
+        data = benchmarks.Dataset()
+        results = benchmarks.run(data, rounds=2, min_time=0)
+        self.assertEqual(set(results), set(benchmarks.BENCHMARKS))
+        for result in results.values():
+            self.assertGreater(result['min_ms'], 0)
+            self.assertLessEqual(result['min_ms'], result['median_ms'])
+
+    def test_run_only_selected(self):
+        results = benchmarks.run(benchmarks.Dataset(), ['filters.'], rounds=1, min_time=0)
+        self.assertEqual(set(results), {'filters.base_path', 'filters.form_field'})
+
+    def test_compare(self):
+        baseline = {'a': {'min_ms': 1.0}, 'b': {'min_ms': 2.0}, 'gone': {'min_ms': 1.0}}
+        results = {'a': {'min_ms': 1.2}, 'b': {'min_ms': 3.0}, 'new': {'min_ms': 5.0}}
+        rows, regressions = benchmarks.compare(results, baseline, 0.25)
+        self.assertEqual([row[0] for row in rows], ['a', 'b'])
+        self.assertAlmostEqual(rows[0][3], 0.2)
+        self.assertEqual([row[0] for row in regressions], ['b'])
+
+    def test_confirm_measures_regressions_again(self):
+        data = benchmarks.Dataset()
+        baseline = {'filters.base_path': {'min_ms': 1.0}, 'filters.form_field': {'min_ms': 1000.0}}
+        results = {'filters.base_path': {'min_ms': 2.0}, 'filters.form_field': {'min_ms': 1.0}}
+        with mock.patch.object(benchmarks, 'measure', return_value={'min_ms': 1.1, 'median_ms': 1.1, 'calls': 1}) as measure:
+            _, regressions = benchmarks.confirm(data, results, baseline, 0.25)
+        self.assertEqual(regressions, [])
+        self.assertEqual(measure.call_count, 1)
+        self.assertEqual(results['filters.base_path']['min_ms'], 1.1)
+
+    def test_confirm_keeps_real_regressions(self):
+        baseline = {'filters.base_path': {'min_ms': 1.0}}
+        results = {'filters.base_path': {'min_ms': 2.0}}
+        with mock.patch.object(benchmarks, 'measure', return_value={'min_ms': 3.0, 'median_ms': 3.0, 'calls': 1}) as measure:
+            _, regressions = benchmarks.confirm(benchmarks.Dataset(), results, baseline, 0.25, retries=3)
+        self.assertEqual(len(regressions), 1)
+        self.assertEqual(measure.call_count, 3)
+        self.assertEqual(results['filters.base_path']['min_ms'], 2.0)
+
+    def test_save_and_load_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            benchmarks.save_baseline(path, {'a': {'min_ms': 1.0}})
+            baseline = benchmarks.load_baseline(path)
+        self.assertEqual(baseline['results'], {'a': {'min_ms': 1.0}})
+        self.assertEqual(baseline['environment'], benchmarks.environment())
+
+    def test_first_run_records_the_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            options = {'baseline': path, 'names': ['filters.'], 'rounds': 1, 'min_time': 0}
+            with mock.patch.object(benchmarks, 'benchmark_database', lambda **kwargs: contextlib.nullcontext(benchmarks.Dataset())):
+                out = io.StringIO()
+                call_command('run_benchmarks', stdout=out, **options)
+                self.assertIn('this run is saved as the baseline', out.getvalue())
+                self.assertEqual(set(benchmarks.load_baseline(path)['results']), {'filters.base_path', 'filters.form_field'})
+
+                out = io.StringIO()
+                call_command('run_benchmarks', stdout=out, threshold=1000, **options)
+                self.assertIn('2 benchmark(s) within', out.getvalue())
@@ -0,0 +1,220 @@
+import json
+import os
+import random
+import tempfile
+from io import StringIO
+from unittest import mock
+from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.contrib.auth.models import User
+from .loadtest import DEFAULT_MIX, build_plan
+from .models import Post, PostVote, Comment, CommentVote, VoteTimestamp, ImportCheckpoint, comment_path_segment
+from .ranking import hot_score
+from .rendering import render_content
+from . import search
+
+class ReconcileCommentCountsCommandTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.post = Post.objects.create(title='Test Post', content='Test post content', user=self.user)
+        self.other_post = Post.objects.create(title='Other Post', content='Other content', user=self.user)
+        Comment.objects.create(user=self.user, post=self.post, content='First')
+        Comment.objects.create(user=self.user, post=self.post, content='Second')
+
+    def test_fixes_drifted_counts(self):
+        Post.objects.filter(pk=self.post.pk).update(comment_count=7)
+        Post.objects.filter(pk=self.other_post.pk).update(comment_count=3)
+        out = StringIO()
+        call_command('reconcile_comment_counts', stdout=out)
+        self.post.refresh_from_db()
+        self.other_post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+        self.assertEqual(self.other_post.comment_count, 0)
+        self.assertIn('2 post(s) updated', out.getvalue())
+
+    def test_leaves_exact_counts_alone(self):
+        out = StringIO()
+        call_command('reconcile_comment_counts', stdout=out)
+        self.assertIn('0 post(s) updated', out.getvalue())
+
+class SeedDataCommandTest(TestCase):
+    def seed(self, **options):
+        out = StringIO()
+        defaults = {'users': 5, 'posts': 6, 'comments': 40, 'post_votes': 15, 'comment_votes': 30,
+                    'max_depth': 4, 'content_size': 2000, 'stdout': out}
+        call_command('seed_data', **{**defaults, **options})
+        return out.getvalue()
+
+    def test_seeds_consistent_data(self):
+        self.seed()
+        self.assertEqual(User.objects.filter(username__startswith='seed_').count(), 5)
+        self.assertEqual(Post.objects.count(), 6)
+        for post in Post.objects.all():
+            self.assertEqual(post.votes, PostVote.objects.filter(post=post).count())
+            self.assertTrue(PostVote.objects.filter(post=post, user=post.user).exists())
+            self.assertEqual(post.comment_count, Comment.objects.filter(post=post).count())
+            self.assertEqual(post.hot_score, hot_score(post.votes, post.created_at))
+            self.assertEqual(len(post.content), 2000)
+            self.assertTrue(post.content_html)
+        for comment in Comment.objects.select_related('parent'):
+            self.assertEqual(comment.votes, CommentVote.objects.filter(comment=comment).count())
+            expected = (comment.parent.path if comment.parent else '') + comment_path_segment(comment.id)
+            self.assertEqual(comment.path, expected)
+            self.assertLess(comment.depth, 4)
+        self.assertEqual(
+            VoteTimestamp.objects.count(), PostVote.objects.count() + CommentVote.objects.count())
+
+    def test_new_rows_after_seeding_get_fresh_ids(self):
+        self.seed()
+        post = Post.objects.create(title='After', content='After', user=User.objects.first())
+        self.assertGreater(post.id, Post.objects.exclude(pk=post.pk).order_by('-id').first().id)
+
+    def test_is_deterministic(self):
+        def snapshot():
+            ids = list(Comment.objects.order_by('id').values_list('id', flat=True))
+            rows = Comment.objects.order_by('id').values_list('parent_id', 'content', 'votes')
+            return [(parent_id and ids.index(parent_id), content, votes) for parent_id, content, votes in rows]
+
+        self.seed()
+        first = snapshot()
+        User.objects.all().delete()
+        self.seed()
+        self.assertEqual(snapshot(), first)
+
+    def test_refuses_existing_prefix(self):
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+        self.seed(prefix='more')
+        self.assertEqual(Post.objects.count(), 12)
+
+    def test_seeded_posts_are_searchable(self):
+        self.seed()
+        word = Post.objects.first().title.split()[0]
+        self.assertTrue(search.search(Post, word).exists())
+
+class LoadTestPlanTest(TestCase):
+    def test_build_plan(self):
+        homepage = [('new page 1', '/?sort_by=new'), ('trending/1_day page 1', '/?sort_by=trending&time=1_day')]
+        sessions = [{'sessionid': 'abc', 'csrftoken': 'x' * 32}]
+        plan = build_plan(random.Random(1), 500, DEFAULT_MIX, homepage, [1, 2], [3], sessions)
+        self.assertEqual(len(plan), 500)
+        self.assertEqual({task[0] for task in plan}, set(DEFAULT_MIX))
+        for endpoint, variant, method, path, data, cookies in plan:
+            if endpoint == 'homepage':
+                self.assertIn((variant, path), homepage)
+            if method == 'POST':
+                self.assertEqual(cookies, sessions[0])
+            if endpoint == 'add_comment':
+                self.assertIn(path, ['/comments/add/1', '/comments/add/2'])
+                self.assertIn('content', data)
+
+    def test_build_plan_skips_endpoints_without_data(self):
+        plan = build_plan(random.Random(1), 50, DEFAULT_MIX, [], [1], [], [])
+        self.assertEqual({task[0] for task in plan}, {'post_detail'})
+        self.assertEqual(build_plan(random.Random(1), 50, DEFAULT_MIX, [], [], [], []), [])
+
+class ImportChatsCommandTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='author', password='12345')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'chats.jsonl')
+        self.rejects = os.path.join(directory.name, 'rejects.jsonl')
+
+    def write(self, rows, mode='w'):
+        with open(self.path, mode) as f:
+            for row in rows:
+                f.write((row if isinstance(row, str) else json.dumps(row)) + '\n')
+
+    def chat(self, i, **fields):
+        return {'title': f'Chat {i}', 'content': f'Content of chat {i}', 'extra_info': 'gpt', 'author': 'author', **fields}
+
+    def run_import(self, *args, **options):
+        out = StringIO()
+        call_command('import_chats', self.path, *args, stdout=out, **options)
+        return out.getvalue()
+
+    def test_imports_chats_like_created_posts(self):
+        self.write([self.chat(i) for i in range(5)])
+        output = self.run_import('--batch-size', '2')
+        self.assertIn('Imported 5 chat(s), rejected 0', output)
+        self.assertEqual(Post.objects.count(), 5)
+        post = Post.objects.get(title='Chat 3')
+        self.assertEqual(post.user, self.user)
+        self.assertEqual(post.extra_info, 'gpt')
+        self.assertEqual(post.content_html, render_content('Content of chat 3'))
+        self.assertAlmostEqual(post.hot_score, hot_score(1, post.created_at), places=3)
+        self.assertTrue(PostVote.objects.filter(user=self.user, post=post).exists())
+        self.assertEqual(list(search.search(Post, 'chat').order_by('id')), list(Post.objects.order_by('id')))
+
+    def test_rejects_invalid_rows(self):
+        self.write([
+            self.chat(1),
+            'not json',
+            '[1, 2]',
+            self.chat(2, title=''),
+            self.chat(3, content='x' * 40001),
+            self.chat(4, author='nobody'),
+            self.chat(5, author=None),
+            '',
+            self.chat(6),
+        ])
+        output = self.run_import('--rejects', self.rejects)
+        self.assertIn('Imported 2 chat(s), rejected 6', output)
+        self.assertEqual(set(Post.objects.values_list('title', flat=True)), {'Chat 1', 'Chat 6'})
+        with open(self.rejects) as f:
+            rejects = [json.loads(line) for line in f]
+        self.assertEqual([reject['line'] for reject in rejects], [2, 3, 4, 5, 6, 7])
+        self.assertIn('title', rejects[2]['errors'])
+        self.assertIn('content', rejects[3]['errors'])
+        self.assertEqual(rejects[4]['errors'], {'author': ['There is no user named nobody.']})
+
+    def test_create_authors(self):
+        self.write([self.chat(1, author='newcomer'), self.chat(2, author='newcomer'), self.chat(3, author='bad name!')])
+        self.run_import('--create-authors')
+        newcomer = User.objects.get(username='newcomer')
+        self.assertFalse(newcomer.has_usable_password())
+        self.assertEqual(Post.objects.filter(user=newcomer).count(), 2)
+        self.assertFalse(User.objects.filter(username='bad name!').exists())
+
+    def test_resumes_after_the_last_committed_batch(self):
+        self.write([self.chat(i) for i in range(5)])
+        original = Post.objects.bulk_create
+        calls = []
+
+        def fail_on_third_batch(objs, *args, **kwargs):
+            calls.append(len(objs))
+            if len(calls) == 3:
+                raise RuntimeError('connection lost')
+            return original(objs, *args, **kwargs)
+
+        with mock.patch.object(Post.objects, 'bulk_create', side_effect=fail_on_third_batch):
+            with self.assertRaises(RuntimeError):
+                self.run_import('--batch-size', '2')
+        self.assertEqual(Post.objects.count(), 4)
+
+        output = self.run_import('--batch-size', '2')
+        self.assertIn('"resumed_at_line": 4', output)
+        self.assertEqual(sorted(Post.objects.values_list('title', flat=True)), [f'Chat {i}' for i in range(5)])
+        self.assertEqual(PostVote.objects.count(), 5)
+
+    def test_rerun_only_imports_new_lines(self):
+        self.write([self.chat(1)])
+        self.run_import()
+        self.write([self.chat(2)], mode='a')
+        self.run_import()
+        self.assertEqual(Post.objects.count(), 2)
+        checkpoint = ImportCheckpoint.objects.get()
+        self.assertEqual((checkpoint.line, checkpoint.imported), (2, 2))
+
+        self.run_import('--restart')
+        self.assertEqual(Post.objects.count(), 4)
+
+    def test_replaced_file(self):
+        self.write([self.chat(1), self.chat(2)])
+        self.run_import()
+        self.write([self.chat(3)])
+        with self.assertRaises(CommandError):
+            self.run_import()
@@ -0,0 +1,74 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+from .models import Post, Comment, VoteTimestamp
+
+class QueryIndexTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = User.objects.bulk_create([
+            User(username=f'user{i}', email=f'user{i}@example.com') for i in range(50)
+        ])
+        now = timezone.now()
+        cls.posts = Post.objects.bulk_create([
+            Post(title=f'Post {i}', content='Content', user=cls.users[i % 50], votes=i % 17,
+                 hot_score=i / 7, created_at=now - timedelta(hours=i))
+            for i in range(500)
+        ])
+        comments = Comment.objects.bulk_create([
+            Comment(content=f'Comment {i}', post=cls.posts[i % 20], user=cls.users[i % 50], votes=i % 11)
+            for i in range(1000)
+        ])
+        for comment in comments:
+            comment.path = comment.build_path()
+        Comment.objects.bulk_update(comments, ['path'])
+        VoteTimestamp.objects.bulk_create([VoteTimestamp(user=cls.users[i % 50]) for i in range(1000)])
+
+    def assertUsesIndex(self, queryset, index_name):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('ANALYZE')
+                # The seeded tables are small enough that a sequential scan would
+                # always win, so make the planner show whether the index applies
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            elif connection.vendor == 'sqlite':
+                cursor.execute('ANALYZE')
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_new_posts_use_created_index(self):
+        self.assertUsesIndex(Post.objects.order_by('-created_at', '-id')[:10], 'main_post_created_idx')
+
+    def test_trending_posts_use_hot_score_index(self):
+        self.assertUsesIndex(Post.objects.order_by('-hot_score', '-id')[:10], 'main_post_hot_score_idx')
+
+    def test_post_time_window_uses_created_index(self):
+        date_limit = timezone.now() - timedelta(days=1)
+        self.assertUsesIndex(Post.objects.filter(created_at__gte=date_limit).values('id'), 'main_post_created_idx')
+
+    def test_my_posts_use_user_index(self):
+        queryset = Post.objects.filter(user=self.users[0]).order_by('-created_at')[:10]
+        self.assertUsesIndex(queryset, 'main_post_user_created_idx')
+
+    def test_root_comments_use_root_index(self):
+        queryset = Comment.objects.filter(post=self.posts[0], parent__isnull=True).order_by('-votes', 'created_at', 'id')[:50]
+        self.assertUsesIndex(queryset, 'main_comment_root_idx')
+
+    def test_subtree_uses_path_index(self):
+        root = Comment.objects.filter(post=self.posts[0]).first()
+        self.assertUsesIndex(root.descendants(), 'main_comment_path_idx')
+
+    def test_my_comments_use_user_index(self):
+        queryset = Comment.objects.filter(user=self.users[0]).order_by('-created_at')[:10]
+        self.assertUsesIndex(queryset, 'main_comment_user_created_idx')
+
+    def test_vote_history_by_user_uses_user_timestamp_index(self):
+        ten_minutes_ago = timezone.now() - timedelta(minutes=10)
+        queryset = VoteTimestamp.objects.filter(user=self.users[0], timestamp__gte=ten_minutes_ago)
+        self.assertUsesIndex(queryset, 'main_votetimestamp_user_ts_idx')
+
+    def test_profile_email_lookup_uses_email_index(self):
+        queryset = User.objects.filter(email='user1@example.com').exclude(username='user2')
+        self.assertUsesIndex(queryset, 'base_auth_user_email_idx')
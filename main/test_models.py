@@ -1,3 +1,5 @@
+from importlib import import_module
+from django.apps import apps
 from django.test import TestCase
 from django.contrib.auth.models import User
 from .models import Post, PostVote, Comment, CommentVote, VoteTimestamp
@@ -97,6 +99,27 @@ class CommentModelTest(TestCase):
         )
         self.assertFalse(child_comment.is_root_comment())
 
+    def test_comment_without_path_has_no_descendants(self):
+        Comment.objects.filter(pk=self.comment.pk).update(path='')
+        self.comment.refresh_from_db()
+        Comment.objects.create(user=self.user, post=self.post, parent=self.comment, content='Reply')
+        self.assertEqual(list(self.comment.descendants()), [])
+
+class CommentPathBackfillTest(TestCase):
+    def test_backfill_builds_paths_at_any_depth(self):
+        user = User.objects.create_user(username='testuser', password='12345')
+        post = Post.objects.create(title='Test Post', content='Test post content', user=user)
+        parent = None
+        for _ in range(4):
+            parent = Comment.objects.create(user=user, post=post, parent=parent, content='Reply')
+        expected = dict(Comment.objects.values_list('id', 'path'))
+        Comment.objects.update(path='')
+
+        migration = import_module('main.migrations.0015_comment_path')
+        migration.backfill_comment_path(apps, None)
+        self.assertEqual(dict(Comment.objects.values_list('id', 'path')), expected)
+        self.assertEqual(parent.depth, 3)
+
 class CommentVoteModelTest(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(username='testuser', password='12345')
@@ -139,3 +162,44 @@ class VoteTimestampModelTest(TestCase):
         vote_timestamp = VoteTimestamp.objects.create(user=self.user)
         expected_str = f'{self.user.username} voted at {vote_timestamp.timestamp}'
         self.assertTrue(str(vote_timestamp).startswith(self.user.username))
+
+class PostCommentCountTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.post = Post.objects.create(title='Test Post', content='Test post content', user=self.user)
+
+    def test_default_comment_count(self):
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_comment_creation_increments_count(self):
+        Comment.objects.create(user=self.user, post=self.post, content='First')
+        Comment.objects.create(user=self.user, post=self.post, content='Second')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+
+    def test_comment_edit_does_not_change_count(self):
+        comment = Comment.objects.create(user=self.user, post=self.post, content='First')
+        comment.content = 'Edited'
+        comment.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+    def test_comment_deletion_decrements_count(self):
+        comment = Comment.objects.create(user=self.user, post=self.post, content='First')
+        Comment.objects.create(user=self.user, post=self.post, content='Second')
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+    def test_cascading_reply_deletion_decrements_count(self):
+        root = Comment.objects.create(user=self.user, post=self.post, content='Root')
+        Comment.objects.create(user=self.user, post=self.post, parent=root, content='Reply 1')
+        Comment.objects.create(user=self.user, post=self.post, parent=root, content='Reply 2')
+        root.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_post_deletion_with_comments(self):
+        Comment.objects.create(user=self.user, post=self.post, content='First')
+        self.post.delete()
+        self.assertFalse(Comment.objects.exists())
@@ -0,0 +1,187 @@
+from django.test import TestCase, Client, AsyncRequestFactory, RequestFactory
+from django.urls import reverse
+from django.conf import settings
+from django.core.cache import caches
+from django.contrib.auth.models import User, AnonymousUser
+from .models import Post, PostVote, Comment
+from .async_views import AsyncHomePage
+from .views import HomePage
+from .pagecache import CachedPage, LISTINGS, page_key
+from .votes import toggle_post_vote, toggle_comment_vote
+
+class PageCacheTest(TestCase):
+    def setUp(self):
+        caches[settings.THROTTLE_CACHE].clear()
+        caches[settings.PAGE_CACHE].clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.other = User.objects.create_user(username='other', password='testpass')
+        self.post = Post.objects.create(title='Test Post', content='Test Content', user=self.user)
+        PostVote.objects.create(user=self.user, post=self.post)
+        self.comment = Comment.objects.create(user=self.user, post=self.post, content='First comment')
+
+    def post_page(self, **params):
+        return self.client.get(reverse('post_detail', args=[self.post.id]), params)
+
+    def test_repeat_anonymous_request_is_served_from_cache(self):
+        self.assertEqual(self.client.get(reverse('homepage'))['X-Page-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('homepage'))
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertContains(response, 'Test Post')
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_pages_are_keyed_by_their_parameters(self):
+        self.client.get(reverse('homepage'))
+        self.assertEqual(self.client.get(reverse('homepage'), {'sort_by': 'new'})['X-Page-Cache'], 'MISS')
+        # Unknown parameters don't select a different page
+        self.assertEqual(self.client.get(reverse('homepage'), {'utm_source': 'x'})['X-Page-Cache'], 'HIT')
+
+    def test_logged_in_users_bypass_the_cache(self):
+        self.client.get(reverse('homepage'))
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('homepage'))
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertContains(response, 'Logout')
+
+    def test_pending_messages_bypass_the_cache(self):
+        self.post_page()
+        self.client.cookies['messages'] = 'pending'
+        self.assertNotIn('X-Page-Cache', self.post_page())
+
+    def test_anonymous_post_page_has_no_comment_form(self):
+        response = self.post_page()
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+        self.assertContains(response, 'to comment.')
+
+    def test_post_vote_invalidates_listing_and_post_page(self):
+        self.client.get(reverse('homepage'))
+        self.post_page()
+        toggle_post_vote(self.other, self.post.id)
+        for response in (self.client.get(reverse('homepage')), self.post_page()):
+            self.assertEqual(response['X-Page-Cache'], 'MISS')
+
+    def test_comment_vote_invalidates_only_post_page(self):
+        self.client.get(reverse('homepage'))
+        self.post_page()
+        toggle_comment_vote(self.other, self.comment.id)
+        self.assertEqual(self.client.get(reverse('homepage'))['X-Page-Cache'], 'HIT')
+        self.assertEqual(self.post_page()['X-Page-Cache'], 'MISS')
+
+    def test_new_comment_shows_on_post_page(self):
+        self.post_page()
+        Comment.objects.create(user=self.other, post=self.post, content='Second comment')
+        self.assertContains(self.post_page(), 'Second comment')
+
+    def test_new_and_deleted_posts_invalidate_listing(self):
+        self.client.get(reverse('homepage'))
+        new_post = Post.objects.create(title='Newer Post', content='Content', user=self.other)
+        self.assertContains(self.client.get(reverse('homepage')), 'Newer Post')
+        new_post.delete()
+        self.assertNotContains(self.client.get(reverse('homepage')), 'Newer Post')
+
+    def test_stale_page_is_served_while_another_request_regenerates(self):
+        self.client.get(reverse('homepage'))
+        Post.objects.create(title='Newer Post', content='Content', user=self.other)
+        request = RequestFactory().get(reverse('homepage'))
+        page = CachedPage(request, page_key(request, HomePage.cache_params), [LISTINGS])
+        caches[settings.PAGE_CACHE].add(page.lock_key, 1)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('homepage'))
+        self.assertEqual(response['X-Page-Cache'], 'STALE')
+        self.assertNotContains(response, 'Newer Post')
+
+        caches[settings.PAGE_CACHE].delete(page.lock_key)
+        response = self.client.get(reverse('homepage'))
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'Newer Post')
+        self.assertEqual(self.client.get(reverse('homepage'))['X-Page-Cache'], 'HIT')
+
+    def test_errors_are_not_cached(self):
+        path = reverse('post_detail', args=[self.post.id + 100])
+        self.assertEqual(self.client.get(path).status_code, 404)
+        self.assertIsNone(caches[settings.PAGE_CACHE].get(page_key(RequestFactory().get(path), ('cursor',))))
+
+    async def test_async_views_use_the_cache(self):
+        factory = AsyncRequestFactory()
+        responses = []
+        for _ in range(2):
+            request = factory.get('/')
+            request.user = AnonymousUser()
+            responses.append(await AsyncHomePage.as_view()(request))
+        self.assertEqual([response['X-Page-Cache'] for response in responses], ['MISS', 'HIT'])
+        self.assertContains(responses[1], 'Test Post')
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        caches[settings.THROTTLE_CACHE].clear()
+        caches[settings.PAGE_CACHE].clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.other = User.objects.create_user(username='other', password='testpass')
+        self.post = Post.objects.create(title='Test Post', content='Test Content', user=self.user)
+        PostVote.objects.create(user=self.user, post=self.post)
+
+    def post_page(self, **headers):
+        return self.client.get(reverse('post_detail', args=[self.post.id]), headers=headers)
+
+    def test_anonymous_revalidation_is_answered_from_the_cache(self):
+        response = self.post_page()
+        self.assertIn('no-cache', response['Cache-Control'])
+        with self.assertNumQueries(0):
+            response = self.post_page(if_none_match=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertIn('ETag', response)
+
+    def test_if_modified_since(self):
+        response = self.client.get(reverse('homepage'))
+        response = self.client.get(reverse('homepage'), headers={'if_modified_since': response['Last-Modified']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate_validators(self):
+        etag = self.post_page()['ETag']
+        listing_etag = self.client.get(reverse('homepage'))['ETag']
+        Comment.objects.create(user=self.other, post=self.post, content='New comment')
+        response = self.post_page(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'New comment')
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(reverse('homepage'), headers={'if_none_match': listing_etag}).status_code, 200)
+
+    def test_post_pages_have_their_own_versions(self):
+        etag = self.post_page()['ETag']
+        Post.objects.create(title='Other Post', content='Content', user=self.other)
+        self.assertEqual(self.post_page(if_none_match=etag).status_code, 304)
+
+    def test_logged_in_revalidation(self):
+        self.client.force_login(self.user)
+        response = self.post_page()
+        self.assertIn('private', response['Cache-Control'])
+        # session, user
+        with self.assertNumQueries(2):
+            response = self.post_page(if_none_match=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_validators_differ_per_reader(self):
+        anonymous_etag = self.post_page()['ETag']
+        self.client.force_login(self.user)
+        self.assertEqual(self.post_page(if_none_match=anonymous_etag).status_code, 200)
+
+    def test_pages_with_messages_have_no_validators(self):
+        self.client.force_login(self.other)
+        response = self.client.post(reverse('add_comment', args=[self.post.id]), {'content': 'Hello'}, follow=True)
+        self.assertContains(response, 'Your comment has been added successfully.')
+        self.assertNotIn('ETag', response)
+        self.assertIn('ETag', self.post_page())
+
+    async def test_async_revalidation(self):
+        factory = AsyncRequestFactory()
+        request = factory.get('/')
+        request.user = AnonymousUser()
+        etag = (await AsyncHomePage.as_view()(request))['ETag']
+        request = factory.get('/', headers={'if_none_match': etag})
+        request.user = AnonymousUser()
+        self.assertEqual((await AsyncHomePage.as_view()(request)).status_code, 304)
@@ -0,0 +1,92 @@
+import base64
+import json
+from datetime import timedelta
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth.models import User
+from django.utils import timezone
+from .models import Post
+from .pagination import CursorPaginator
+
+class CursorPaginatorTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        now = timezone.now()
+        # Pairs of posts share votes and created_at so ties are broken by id
+        self.posts = Post.objects.bulk_create([
+            Post(title=f'Post {i}', content='Content', user=self.user, votes=i // 2,
+                 created_at=now - timedelta(minutes=i // 2))
+            for i in range(23)
+        ])
+
+    def walk(self, ordering):
+        paginator = CursorPaginator(Post.objects.all(), ordering, 5)
+        page = paginator.get_page()
+        pages = [page]
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor)
+            pages.append(page)
+        return paginator, pages
+
+    def test_forward_pages_cover_every_row_once(self):
+        for ordering in (('-votes', '-id'), ('-created_at', '-id'), ('votes', 'id')):
+            _, pages = self.walk(ordering)
+            ids = [post.id for page in pages for post in page]
+            self.assertEqual(ids, list(Post.objects.order_by(*ordering).values_list('id', flat=True)))
+            self.assertEqual([page.number for page in pages], [1, 2, 3, 4, 5])
+
+    def test_backward_pages_mirror_forward_pages(self):
+        paginator, pages = self.walk(('-created_at', '-id'))
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = paginator.get_page(page.previous_cursor)
+            self.assertEqual(list(page), list(expected))
+            self.assertEqual(page.number, expected.number)
+        self.assertFalse(page.has_previous())
+        self.assertTrue(page.has_next())
+
+    def test_first_and_last_page_flags(self):
+        _, pages = self.walk(('-votes', '-id'))
+        self.assertFalse(pages[0].has_previous())
+        self.assertIsNone(pages[0].previous_cursor)
+        self.assertFalse(pages[-1].has_next())
+        self.assertIsNone(pages[-1].next_cursor)
+        self.assertEqual(len(pages[-1]), 3)
+
+    def test_num_pages(self):
+        _, pages = self.walk(('-votes', '-id'))
+        self.assertEqual(pages[0].num_pages, 5)
+
+    def test_invalid_cursor_returns_first_page(self):
+        paginator = CursorPaginator(Post.objects.all(), ('-votes', '-id'), 5)
+        for cursor in ('garbage', 'eyJuIjogMn0', '!!!'):
+            page = paginator.get_page(cursor)
+            self.assertEqual(page.number, 1)
+            self.assertEqual(len(page), 5)
+
+    def test_forged_cursor_returns_first_page(self):
+        paginator = CursorPaginator(Post.objects.all(), ('-votes', '-id'), 5)
+        forged = [
+            {'n': 2, 'b': False, 'k': [None, None]},
+            {'n': 2, 'b': False, 'k': [3, None]},
+            {'n': 2, 'b': False, 'k': 'ab'},
+            {'n': 10 ** 12, 'b': False, 'k': [3, 3]},
+            {'n': float('inf'), 'b': False, 'k': [3, 3]},
+        ]
+        for payload in forged:
+            with self.subTest(payload=payload):
+                cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+                self.assertIsNone(paginator.decode_cursor(cursor))
+                page = paginator.get_page(cursor)
+                self.assertEqual(page.number, 1)
+                self.assertEqual(len(page), 5)
+
+    def test_forged_cursor_on_listing(self):
+        cursor = base64.urlsafe_b64encode(json.dumps({'n': 2, 'b': False, 'k': [None, None]}).encode()).decode()
+        self.assertEqual(self.client.get(reverse('homepage'), {'cursor': cursor}).status_code, 200)
+
+    def test_page_is_one_query(self):
+        paginator = CursorPaginator(Post.objects.all(), ('-created_at', '-id'), 5)
+        cursor = paginator.get_page().next_cursor
+        with self.assertNumQueries(1):
+            list(paginator.get_page(cursor))
@@ -0,0 +1,73 @@
+import datetime
+from io import StringIO
+from unittest import skipUnless
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+from .models import VoteTimestamp
+from .partitions import add_months, month_start, partition_name, ensure_partitions, prune_vote_history
+
+class PartitionHelpersTest(TestCase):
+    def test_add_months(self):
+        self.assertEqual(add_months(datetime.date(2023, 11, 1), 1), datetime.date(2023, 12, 1))
+        self.assertEqual(add_months(datetime.date(2023, 12, 1), 1), datetime.date(2024, 1, 1))
+        self.assertEqual(add_months(datetime.date(2024, 1, 1), -1), datetime.date(2023, 12, 1))
+        self.assertEqual(add_months(datetime.date(2023, 6, 1), 14), datetime.date(2024, 8, 1))
+
+    def test_month_start_and_partition_name(self):
+        month = month_start(datetime.datetime(2023, 9, 27, 6, 40, tzinfo=datetime.timezone.utc))
+        self.assertEqual(month, datetime.date(2023, 9, 1))
+        self.assertEqual(partition_name(month), 'main_votetimestamp_p2023_09')
+
+class PruneVoteHistoryTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        now = timezone.now()
+        self.old = VoteTimestamp.objects.create(user=self.user)
+        self.recent = VoteTimestamp.objects.create(user=self.user)
+        VoteTimestamp.objects.filter(pk=self.old.pk).update(timestamp=now - datetime.timedelta(days=200))
+
+    def test_command_expires_old_history(self):
+        out = StringIO()
+        call_command('prune_vote_history', days=90, stdout=out)
+        self.assertEqual(list(VoteTimestamp.objects.values_list('id', flat=True)), [self.recent.id])
+        self.assertIn('Pruned vote history', out.getvalue())
+
+    def test_nothing_to_prune(self):
+        prune_vote_history(timezone.now() - datetime.timedelta(days=365))
+        self.assertEqual(VoteTimestamp.objects.count(), 2)
+
+@skipUnless(connection.vendor == 'postgresql', 'Declarative partitioning is Postgres only')
+class PostgresPartitionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='12345')
+
+    def partitions(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+                "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+                "WHERE parent.relname = 'main_votetimestamp'"
+            )
+            return {name for (name,) in cursor.fetchall()}
+
+    def test_table_is_partitioned_with_default(self):
+        self.assertIn('main_votetimestamp_default', self.partitions())
+        self.assertIn(partition_name(month_start(timezone.now())), self.partitions())
+
+    def test_expired_partitions_are_dropped(self):
+        old_month = datetime.date(2001, 1, 1)
+        with connection.cursor() as cursor:
+            ensure_partitions(old_month, add_months(old_month, 1), cursor)
+        vote = VoteTimestamp.objects.create(user=self.user)
+        VoteTimestamp.objects.filter(pk=vote.pk).update(timestamp=datetime.datetime(2001, 1, 15, tzinfo=datetime.timezone.utc))
+
+        dropped, deleted = prune_vote_history(datetime.datetime(2001, 2, 1, tzinfo=datetime.timezone.utc))
+        self.assertEqual(dropped, ['main_votetimestamp_p2001_01'])
+        self.assertEqual(deleted, 0)
+        self.assertNotIn('main_votetimestamp_p2001_01', self.partitions())
+        self.assertIn('main_votetimestamp_p2001_02', self.partitions())
+        self.assertFalse(VoteTimestamp.objects.filter(pk=vote.pk).exists())
@@ -0,0 +1,82 @@
+from io import StringIO
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from .models import Post, Comment
+from .forms import CommentForm, PostForm
+from .rendering import RENDER_VERSION, render_content
+
+class RenderContentTest(TestCase):
+    def test_escapes_and_breaks_lines(self):
+        html = render_content('<script>alert(1)</script>\nsecond line\n\nnew paragraph')
+        self.assertNotIn('<script>', html)
+        self.assertIn('&lt;script&gt;', html)
+        self.assertIn('<br>', html)
+        self.assertEqual(html.count('<p>'), 2)
+
+    def test_fenced_code_block(self):
+        html = render_content('Look:\n```python\nif a < b:\n    pass\n```\nDone')
+        self.assertIn('<pre><code class="language-python">if a &lt; b:\n    pass\n</code></pre>', html)
+        self.assertIn('<p>Look:</p>', html)
+        self.assertIn('<p>Done</p>', html)
+
+    def test_inline_code(self):
+        self.assertIn('<code>x &amp; y</code>', render_content('Use `x & y` here'))
+
+    @override_settings(CONTENT_FORMATTING=False)
+    def test_formatting_disabled(self):
+        self.assertNotIn('<code>', render_content('Use `code` here'))
+
+class RenderedContentStorageTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='12345')
+
+    def test_save_stores_html(self):
+        post = Post.objects.create(title='Title', content='<b>bold</b>', user=self.user)
+        post.refresh_from_db()
+        self.assertEqual(post.content_html_version, RENDER_VERSION)
+        self.assertEqual(post.content_html, '<p>&lt;b&gt;bold&lt;/b&gt;</p>')
+
+    def test_post_form_stores_html(self):
+        form = PostForm({'title': 'Title', 'content': 'Hello `world`', 'extra_info': ''})
+        self.assertTrue(form.is_valid())
+        post = form.save(commit=False)
+        post.user = self.user
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.content_html_version, RENDER_VERSION)
+        self.assertIn('<code>world</code>', post.content_html)
+
+    def test_comment_edit_rerenders(self):
+        post = Post.objects.create(title='Title', content='Body', user=self.user)
+        comment = Comment.objects.create(user=self.user, post=post, content='old')
+        form = CommentForm({'content': 'new <b>text</b>'}, instance=comment)
+        self.assertTrue(form.is_valid())
+        form.save()
+        comment.refresh_from_db()
+        self.assertIn('new &lt;b&gt;text&lt;/b&gt;', comment.content_html)
+
+    def test_unrendered_rows_fall_back(self):
+        post = Post.objects.create(title='Title', content='Legacy <i>post</i>', user=self.user)
+        Post.objects.filter(pk=post.pk).update(content_html='', content_html_version=0)
+        post.refresh_from_db()
+        self.assertIn('Legacy &lt;i&gt;post&lt;/i&gt;', post.rendered_content())
+
+    def test_detail_page_uses_stored_html(self):
+        post = Post.objects.create(title='Title', content='Raw', user=self.user)
+        Post.objects.filter(pk=post.pk).update(content_html='<p>Stored</p>')
+        response = self.client.get(reverse('post_detail', args=[post.id]))
+        self.assertContains(response, '<p>Stored</p>')
+
+    def test_rerender_command(self):
+        post = Post.objects.create(title='Title', content='Legacy', user=self.user)
+        Comment.objects.create(user=self.user, post=post, content='Old comment')
+        Post.objects.update(content_html='', content_html_version=0)
+        Comment.objects.update(content_html='', content_html_version=0)
+        out = StringIO()
+        call_command('rerender_content', stdout=out)
+        post.refresh_from_db()
+        self.assertEqual(post.content_html, '<p>Legacy</p>')
+        self.assertEqual(Comment.objects.filter(content_html_version=RENDER_VERSION).count(), 1)
+        self.assertIn('Rendered 1 post(s) and 1 comment(s)', out.getvalue())
@@ -0,0 +1,95 @@
+from unittest import skipUnless
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth.models import User
+from .models import Post, Comment
+from .search import search, attach_snippets, highlight, MATCH_START, MATCH_STOP
+from .views import SearchView
+from unittest import mock
+
+class SearchTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.title_match = Post.objects.create(title='Rust borrow checker', content='Lifetimes explained', user=self.user)
+        self.body_match = Post.objects.create(title='Python tips', content='Unlike the rust compiler, python is dynamic', user=self.user)
+        self.other = Post.objects.create(title='Cooking', content='Pasta recipes', user=self.user)
+        self.comment = Comment.objects.create(user=self.user, post=self.other, content='I prefer <b>rust</b> to pasta')
+
+    def test_matches_are_ranked(self):
+        results = list(search(Post, 'rust').order_by('-rank', '-id'))
+        self.assertEqual(results, [self.title_match, self.body_match])
+
+    def test_all_words_must_match(self):
+        self.assertEqual(list(search(Post, 'rust python')), [self.body_match])
+        self.assertEqual(list(search(Post, 'rust "')), list(search(Post, 'rust')))
+
+    def test_index_follows_saves_and_deletes(self):
+        self.other.content = 'Now about rust too'
+        self.other.save()
+        self.assertIn(self.other, search(Post, 'rust'))
+        self.comment.delete()
+        self.assertFalse(search(Comment, 'rust').exists())
+
+    def test_snippets_are_escaped_and_highlighted(self):
+        comments = attach_snippets(Comment, list(search(Comment, 'rust')), 'rust')
+        self.assertIn('<mark>rust</mark>', comments[0].snippet)
+        self.assertIn('&lt;b&gt;', comments[0].snippet)
+        self.assertEqual(highlight(f'<i>{MATCH_START}x{MATCH_STOP}'), '&lt;i&gt;<mark>x</mark>')
+
+    def test_search_page(self):
+        response = self.client.get(reverse('search'), {'q': 'rust'})
+        self.assertEqual(list(response.context['results']), [self.title_match, self.body_match])
+        self.assertContains(response, '<mark>')
+        response = self.client.get(reverse('search'), {'q': 'rust', 'type': 'comments'})
+        self.assertEqual(list(response.context['results']), [self.comment])
+
+    def test_search_page_keyset_pagination(self):
+        posts = [Post.objects.create(title=f'Rust post {i}', content='rust ' * i, user=self.user) for i in range(1, 6)]
+        seen = []
+        cursor = None
+        with mock.patch.object(SearchView, 'page_size', 3):
+            while True:
+                page = self.client.get(reverse('search'), {'q': 'rust', 'cursor': cursor or ''}).context['results']
+                seen.extend(page)
+                if not page.has_next():
+                    break
+                cursor = page.next_cursor
+        self.assertEqual(seen, list(search(Post, 'rust').order_by('-rank', '-id')))
+        self.assertEqual(set(seen), set(posts) | {self.title_match, self.body_match})
+
+    def test_empty_query(self):
+        response = self.client.get(reverse('search'), {'q': '  '})
+        self.assertIsNone(response.context['results'])
+
+class AdminSearchTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='adminpass', email='admin@example.com')
+        self.post = Post.objects.create(title='Rust borrow checker', content='Lifetimes', user=self.admin)
+        Post.objects.create(title='Cooking', content='Pasta', user=self.admin)
+        self.comment = Comment.objects.create(user=self.admin, post=self.post, content='Lifetimes are hard')
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def test_post_admin_uses_full_text_search(self):
+        response = self.client.get(reverse('admin:main_post_changelist'), {'q': 'lifetimes'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.post])
+
+    def test_comment_admin_searches_content_and_usernames(self):
+        response = self.client.get(reverse('admin:main_comment_changelist'), {'q': 'lifetimes'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.comment])
+        response = self.client.get(reverse('admin:main_comment_changelist'), {'q': 'admin'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.comment])
+
+    @skipUnless(connection.vendor == 'postgresql', 'The search_vector column only exists on Postgres')
+    def test_admin_search_subquery_matches_its_own_rows(self):
+        # The match has to use the subquery's alias, a bare main_post would
+        # correlate it with the outer row and skip the GIN index
+        for name, model in (('post', Post), ('comment', Comment)):
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get(reverse(f'admin:main_{name}_changelist'), {'q': 'lifetimes'})
+            sql = next(query['sql'] for query in ctx.captured_queries if 'search_vector' in query['sql'])
+            self.assertIn('U0.search_vector @@', sql)
+            self.assertNotIn(f'{model._meta.db_table}.search_vector', sql.replace('"', ''))
@@ -0,0 +1,190 @@
+from unittest import mock
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.conf import settings
+from django.core.cache import caches
+from django.contrib.auth.models import User
+from .models import Post, Comment, CommentThread, CommentVote
+from . import threads
+from .threads import build_thread_data, get_thread
+from .votes import toggle_comment_vote
+
+class CommentThreadSnapshotTest(TestCase):
+    def setUp(self):
+        caches[settings.THROTTLE_CACHE].clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.other = User.objects.create_user(username='other', password='testpass')
+        self.post = Post.objects.create(title='Test Post', content='Test Content', user=self.user)
+        self.root = Comment.objects.create(user=self.user, post=self.post, content='First root')
+        self.reply = Comment.objects.create(user=self.other, post=self.post, parent=self.root, content='Reply')
+        get_thread(self.post.id)
+
+    def stored(self):
+        return CommentThread.objects.get(post=self.post).data
+
+    def assertMatchesRebuild(self):
+        thread = CommentThread.objects.get(post=self.post)
+        data, votes = build_thread_data(self.post.id)
+        # Patched roots are appended, the order is in votes
+        self.assertEqual(sorted(thread.data['comments'], key=lambda root: root['id']),
+                         sorted(data['comments'], key=lambda root: root['id']))
+        self.assertEqual(thread.votes, votes)
+
+    def test_first_read_builds_snapshot(self):
+        roots = get_thread(self.post.id)
+        self.assertEqual([root.id for root in roots], [self.root.id])
+        self.assertEqual(roots[0].replies[0].user.username, 'other')
+        self.assertEqual(str(roots[0].rendered_content()), '<p>First root</p>')
+        self.assertMatchesRebuild()
+
+    def test_added_comments_are_patched_in(self):
+        second = Comment.objects.create(user=self.other, post=self.post, content='Second root', votes=5)
+        Comment.objects.create(user=self.user, post=self.post, parent=second, content='Second reply')
+        self.assertEqual([root['id'] for root in self.stored()['comments']], [self.root.id, second.id])
+        self.assertEqual([root.id for root in get_thread(self.post.id)], [second.id, self.root.id])
+        self.assertEqual(len(get_thread(self.post.id)[0].replies), 1)
+        self.assertMatchesRebuild()
+
+    def test_edits_are_patched_in(self):
+        self.reply.content = 'Edited <b>reply</b>'
+        self.reply.save()
+        self.assertEqual(self.stored()['comments'][0]['replies'][0]['content_html'], '<p>Edited &lt;b&gt;reply&lt;/b&gt;</p>')
+        self.assertMatchesRebuild()
+
+    def test_votes_reorder_roots_without_touching_the_comments(self):
+        second = Comment.objects.create(user=self.other, post=self.post, content='Second root')
+        data = self.stored()
+        toggle_comment_vote(self.user, second.id)
+        toggle_comment_vote(self.other, self.reply.id)
+        self.assertEqual(self.stored(), data)
+        with self.assertNumQueries(1):
+            roots = get_thread(self.post.id)
+        self.assertEqual([(root.id, root.votes) for root in roots], [(second.id, 2), (self.root.id, 1)])
+        self.assertEqual(roots[1].replies[0].votes, 2)
+        self.assertMatchesRebuild()
+
+    def test_limits(self):
+        for i in range(3):
+            Comment.objects.create(user=self.user, post=self.post, parent=self.root, content=f'Reply {i}')
+        Comment.objects.create(user=self.user, post=self.post, content='Second root')
+        roots = get_thread(self.post.id, limit=1, replies_limit=2)
+        self.assertEqual([root.id for root in roots], [self.root.id])
+        self.assertEqual(len(roots[0].replies), 2)
+
+    def test_reads_are_one_query(self):
+        with self.assertNumQueries(1):
+            get_thread(self.post.id)
+
+    def test_more_than_the_page_holds_is_read_from_the_comments(self):
+        for i in range(threads.REPLIES + 1):
+            Comment.objects.create(user=self.user, post=self.post, parent=self.root, content=f'Reply {i}')
+        self.assertEqual(len(get_thread(self.post.id)[0].replies), threads.REPLIES)
+        self.assertEqual(len(get_thread(self.post.id, replies_limit=threads.REPLIES + 2)[0].replies), threads.REPLIES + 2)
+        self.assertMatchesRebuild()
+
+    def test_first_read_without_a_row(self):
+        CommentThread.objects.all().delete()
+        self.assertEqual([root.id for root in get_thread(self.post.id)], [self.root.id])
+        self.assertMatchesRebuild()
+
+    def test_nested_replies_are_patched_in_path_order(self):
+        later = Comment.objects.create(user=self.user, post=self.post, parent=self.root, content='Later reply')
+        nested = Comment.objects.create(user=self.user, post=self.post, parent=self.reply, content='Nested')
+        replies = self.stored()['comments'][0]['replies']
+        self.assertEqual([reply['id'] for reply in replies], [self.reply.id, nested.id, later.id])
+        self.assertEqual(get_thread(self.post.id)[0].replies[1].depth, 2)
+        self.assertMatchesRebuild()
+
+    def test_deleting_a_reply_removes_its_subtree(self):
+        nested = Comment.objects.create(user=self.user, post=self.post, parent=self.reply, content='Nested')
+        Comment.objects.create(user=self.user, post=self.post, parent=nested, content='Deeper')
+        self.reply.delete()
+        self.assertEqual(self.stored()['comments'][0]['replies'], [])
+        self.assertMatchesRebuild()
+
+    def test_deleting_a_root_removes_its_replies(self):
+        self.root.delete()
+        self.assertEqual(self.stored()['comments'], [])
+        self.assertEqual(CommentThread.objects.get(post=self.post).votes, {'roots': [], 'replies': {}})
+
+    def test_build_racing_a_write_is_not_stored(self):
+        CommentThread.objects.filter(post=self.post).update(data=None, votes=None)
+        thread = CommentThread.objects.get(post=self.post)
+        Comment.objects.create(user=self.user, post=self.post, content='Concurrent')
+        # A build that read the thread before the write must not overwrite it
+        stored = CommentThread.objects.filter(post=self.post, version=thread.version).update(data={'stale': True})
+        self.assertEqual(stored, 0)
+
+    def test_post_page_reads_snapshot_after_adding_comment(self):
+        client = Client()
+        client.force_login(self.user)
+        client.post(reverse('add_comment', args=[self.post.id]), {'content': 'Added through the view'})
+        response = client.get(reverse('post_detail', args=[self.post.id]))
+        self.assertContains(response, 'Added through the view')
+        self.assertMatchesRebuild()
+
+class FullPageSnapshotTest(TestCase):
+    def setUp(self):
+        for name in ('ROOTS', 'REPLIES'):
+            patcher = mock.patch.object(threads, name, 2)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        caches[settings.THROTTLE_CACHE].clear()
+        self.users = [User.objects.create_user(username=f'user{i}', password='testpass') for i in range(3)]
+        self.post = Post.objects.create(title='Test Post', content='Test Content', user=self.users[0])
+        self.roots = [Comment.objects.create(user=self.users[0], post=self.post, content=f'Root {i}', votes=3 - i) for i in range(3)]
+        self.replies = [Comment.objects.create(user=self.users[0], post=self.post, parent=self.roots[0], content=f'Reply {i}') for i in range(3)]
+        get_thread(self.post.id)
+
+    def thread(self):
+        return CommentThread.objects.get(post=self.post)
+
+    def page(self):
+        return [(root.id, [reply.id for reply in root.replies]) for root in get_thread(self.post.id)]
+
+    def test_page_holds_only_the_first_roots_and_replies(self):
+        self.assertEqual([root['id'] for root in self.thread().data['comments']], [self.roots[0].id, self.roots[1].id])
+        self.assertEqual(self.page(), [(self.roots[0].id, [self.replies[0].id, self.replies[1].id]), (self.roots[1].id, [])])
+
+    def test_comments_below_the_page_are_left_out(self):
+        data = self.thread().data
+        Comment.objects.create(user=self.users[0], post=self.post, content='Low root', votes=0)
+        Comment.objects.create(user=self.users[0], post=self.post, parent=self.roots[0], content='Late reply')
+        Comment.objects.create(user=self.users[0], post=self.post, parent=self.roots[2], content='Reply off the page')
+        self.assertEqual(self.thread().data, data)
+
+    def test_a_new_top_root_pushes_the_last_one_off(self):
+        top = Comment.objects.create(user=self.users[0], post=self.post, content='Top root', votes=10)
+        self.assertEqual(self.page(), [(top.id, []), (self.roots[0].id, [self.replies[0].id, self.replies[1].id])])
+        self.assertEqual(self.thread().votes, build_thread_data(self.post.id)[1])
+
+    def test_a_root_climbing_onto_the_page_rebuilds_it(self):
+        for user in self.users[1:]:
+            toggle_comment_vote(user, self.roots[2].id)
+        self.assertIsNone(self.thread().data)
+        self.assertEqual([root_id for root_id, _ in self.page()], [self.roots[0].id, self.roots[2].id])
+
+    def test_votes_within_the_page_keep_it(self):
+        toggle_comment_vote(self.users[1], self.roots[1].id)
+        toggle_comment_vote(self.users[2], self.roots[1].id)
+        toggle_comment_vote(self.users[1], self.replies[0].id)
+        self.assertIsNotNone(self.thread().data)
+        roots = get_thread(self.post.id)
+        self.assertEqual([(root.id, root.votes) for root in roots], [(self.roots[1].id, 4), (self.roots[0].id, 3)])
+        self.assertEqual(roots[1].replies[0].votes, 2)
+
+    def test_the_last_root_dropping_rebuilds_the_page(self):
+        CommentVote.objects.create(user=self.users[1], comment=self.roots[1])
+        # Counted without the snapshot knowing, it only holds the page
+        Comment.objects.filter(pk=self.roots[2].pk).update(votes=2)
+        toggle_comment_vote(self.users[1], self.roots[1].id)
+        self.assertIsNone(self.thread().data)
+        self.assertEqual([root_id for root_id, _ in self.page()], [self.roots[0].id, self.roots[2].id])
+
+    def test_deleting_from_a_full_page_rebuilds_it(self):
+        self.replies[0].delete()
+        self.assertIsNone(self.thread().data)
+        self.assertEqual(self.page()[0][1], [self.replies[1].id, self.replies[2].id])
+        self.roots[1].delete()
+        self.assertIsNone(self.thread().data)
+        self.assertEqual([root_id for root_id, _ in self.page()], [self.roots[0].id, self.roots[2].id])
@@ -1,4 +1,4 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
 from .models import Post, PostVote, VoteTimestamp, Comment, CommentVote
@@ -9,6 +9,14 @@ from django.contrib.messages import get_messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.paginator import Paginator
 from django.db.models import Count
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from io import StringIO
+from unittest import mock
+from .views import PostDetailView
 
 class HomePageViewTest(TestCase):
     def setUp(self):
@@ -59,15 +67,28 @@ class HomePageViewTest(TestCase):
         self.assertIn(post1, response.context['posts'])
         self.assertNotIn(post2, response.context['posts'])
 
+    def test_home_page_trending_prefers_recent_posts(self):
+        old_post = Post.objects.create(title='Old Post', content='Old', user=self.user, votes=20)
+        new_post = Post.objects.create(title='New Post', content='New', user=self.user, votes=5)
+        Post.objects.filter(pk=old_post.pk).update(created_at=timezone.now() - timedelta(days=3))
+        call_command('recompute_hot_scores', stdout=StringIO())
+        response = self.client.get(self.url, {'sort_by': 'trending'})
+        self.assertEqual(list(response.context['posts']), [new_post, old_post])
+
     def test_home_page_pagination(self):
         for i in range(15):
             Post.objects.create(title=f'Post {i}', content=f'Content {i}', user=self.user, votes=i)
-        response = self.client.get(self.url, {'page': 2})
+        first_page = self.client.get(self.url).context['posts']
+        response = self.client.get(self.url, {'cursor': first_page.next_cursor})
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.context['posts']), 5)
+        self.assertEqual(response.context['posts'].number, 2)
+        self.assertContains(response, 'Page 2 of 2')
+        self.assertFalse(set(first_page) & set(response.context['posts']))
 
 class VotePostViewTest(TestCase):
     def setUp(self):
+        caches[settings.THROTTLE_CACHE].clear()
         self.client = Client()
         self.user = User.objects.create_user(username='testuser', password='testpass')
         self.post = Post.objects.create(title='Test Post', content='Test Content', user=self.user, votes=0)
@@ -80,7 +101,7 @@ class VotePostViewTest(TestCase):
     def test_exceed_vote_limit(self):
         self.client.force_login(self.user)
         for _ in range(11):
-            VoteTimestamp.objects.create(user=self.user, timestamp=timezone.now())
+            self.assertEqual(self.client.post(self.url).status_code, 200)
         response = self.client.post(self.url)
         self.assertEqual(response.status_code, 429)
 
@@ -123,17 +144,21 @@ class PostDetailViewTest(TestCase):
         self.client.force_login(self.user)
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, 200)
-        self.assertTrue('is_upvoted' in response.context)
         self.assertTrue('can_delete' in response.context)
         self.assertTrue('root_comments' in response.context)
         self.assertIsInstance(response.context['form'], CommentForm)
-        self.assertFalse(response.context['is_upvoted'])  # Assuming user hasn't voted yet
 
     def test_post_detail_view_for_unauthenticated_user(self):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, 200)
-        self.assertIn('is_upvoted', response.context)
-        self.assertFalse(response.context['is_upvoted'])
+        self.assertIn('root_comments', response.context)
+
+    def test_post_detail_is_the_same_for_every_reader(self):
+        PostVote.objects.create(user=self.user, post=self.post)
+        anonymous = self.client.get(self.url).content
+        self.client.force_login(self.user)
+        self.assertNotIn(b'fill="#FFA500"', self.client.get(self.url).content)
+        self.assertNotIn(b'fill="#FFA500"', anonymous)
 
 
     def test_comment_and_vote_display_for_authenticated_user(self):
@@ -142,8 +167,9 @@ class PostDetailViewTest(TestCase):
         CommentVote.objects.create(user=self.user, comment=comment)
         self.client.force_login(self.user)
         response = self.client.get(self.url)
-        self.assertIn(comment.id, response.context['upvoted_comment_ids'])
         self.assertIn(comment, response.context['root_comments'])
+        response = self.client.get(reverse('vote_state'), {'comments': str(comment.id)})
+        self.assertEqual(response.json(), {'posts': [], 'comments': [comment.id]})
 
     def test_post_deletion_permission_within_one_hour(self):
         # Assume post was created less than an hour ago
@@ -170,7 +196,8 @@ class MyPostsViewTest(TestCase):
 
     def test_pagination(self):
         self.client.force_login(self.user)
-        response = self.client.get(self.url, {'page': 2})
+        first_page = self.client.get(self.url).context['my_posts']
+        response = self.client.get(self.url, {'cursor': first_page.next_cursor})
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.context['my_posts']), 5)
 
@@ -180,7 +207,7 @@ class MyPostsViewTest(TestCase):
         self.assertTrue(response.status_code, 302)
         self.assertTrue('/login' in response.url)
 
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
 from .models import Post, Comment
@@ -205,7 +232,8 @@ class MyCommentsViewTest(TestCase):
 
     def test_pagination(self):
         self.client.force_login(self.user)
-        response = self.client.get(self.url, {'page': 2})
+        first_page = self.client.get(self.url).context['my_comments']
+        response = self.client.get(self.url, {'cursor': first_page.next_cursor})
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.context['my_comments']), 5)
 
@@ -217,6 +245,7 @@ class MyCommentsViewTest(TestCase):
 
 class VoteCommentViewTest(TestCase):
     def setUp(self):
+        caches[settings.THROTTLE_CACHE].clear()
         self.client = Client()
         self.user = User.objects.create_user(username='testuser', password='testpass')
         self.other_user = User.objects.create_user(username='otheruser', password='otherpass')
@@ -231,7 +260,7 @@ class VoteCommentViewTest(TestCase):
     def test_exceed_vote_limit(self):
         self.client.force_login(self.user)
         for _ in range(11):
-            VoteTimestamp.objects.create(user=self.user, timestamp=timezone.now())
+            self.assertEqual(self.client.post(self.url).status_code, 200)
         response = self.client.post(self.url)
         self.assertEqual(response.status_code, 429)
 
@@ -260,6 +289,7 @@ class VoteCommentViewTest(TestCase):
 
 class AddCommentViewTest(TestCase):
     def setUp(self):
+        caches[settings.THROTTLE_CACHE].clear()
         self.client = Client()
         self.user = User.objects.create_user(username='testuser', password='testpass')
         self.post = Post.objects.create(title='Test Post', content='Test Content', user=self.user)
@@ -313,11 +343,20 @@ class ReplyCommentViewTest(TestCase):
         self.assertIsInstance(response.context['form'], CommentForm)
         self.assertEqual(response.context['comment'], self.root_comment)
 
-    def test_attempt_reply_to_child_comment(self):
+    def test_reply_to_child_comment(self):
         self.client.force_login(self.user)
         response = self.client.get(self.child_comment_url)
-        self.assertNotEqual(response.status_code, 200)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['comment'], self.child_comment)
+
+    def test_reply_below_max_depth_is_rejected(self):
+        self.client.force_login(self.user)
+        with mock.patch('main.models.MAX_COMMENT_DEPTH', 2):
+            response = self.client.get(self.child_comment_url)
+            self.assertRedirects(response, reverse('post_detail', args=[self.post.id]))
+            response = self.client.post(reverse('add_comment', args=[self.post.id]) + f'?parent_id={self.child_comment.id}', {'content': 'Too deep'})
         self.assertRedirects(response, reverse('post_detail', args=[self.post.id]))
+        self.assertFalse(Comment.objects.filter(content='Too deep').exists())
 
     def test_reply_with_invalid_comment_id(self):
         self.client.force_login(self.user)
@@ -372,6 +411,7 @@ class EditCommentViewTest(TestCase):
 
 class CreatePostViewTest(TestCase):
     def setUp(self):
+        caches[settings.THROTTLE_CACHE].clear()
         self.client = Client()
         self.user = User.objects.create_user(username='testuser', password='testpassword')
         self.url = reverse('createpost')
@@ -445,3 +485,216 @@ class PostDeleteViewTest(TestCase):
         nonexistent_url = reverse('post_delete', args=[99999])
         response = self.client.post(nonexistent_url)
         self.assertEqual(response.status_code, 404)
+
+class VoteStateViewTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.other = User.objects.create_user(username='other', password='testpass')
+        self.post = Post.objects.create(title='Test Post', content='Test Content', user=self.user)
+        self.other_post = Post.objects.create(title='Other Post', content='Other Content', user=self.user)
+        self.comment = Comment.objects.create(user=self.user, post=self.post, content='Comment')
+        PostVote.objects.create(user=self.user, post=self.post)
+        PostVote.objects.create(user=self.other, post=self.other_post)
+        CommentVote.objects.create(user=self.user, comment=self.comment)
+        self.url = reverse('vote_state')
+
+    def test_returns_own_votes_only(self):
+        self.client.force_login(self.user)
+        response = self.client.get(self.url, {
+            'posts': f'{self.post.id},{self.other_post.id}', 'comments': f'{self.comment.id}',
+        })
+        self.assertEqual(response.json(), {'posts': [self.post.id], 'comments': [self.comment.id]})
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_anonymous_has_no_votes(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {'posts': str(self.post.id)})
+        self.assertEqual(response.json(), {'posts': [], 'comments': []})
+
+    def test_rejects_bad_ids(self):
+        for ids in ('1,x', '0', '-1', f'1,{2 ** 63}', '99999999999999999999999'):
+            self.assertEqual(self.client.get(self.url, {'posts': ids}).status_code, 400)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url, {'comments': str(2 ** 63)}).status_code, 400)
+
+    def test_pages_tell_the_scripts_who_is_reading(self):
+        # Anonymous pages skip the vote state request and don't post votes
+        marker = '<span id="user-authenticated" data-user-authenticated="%s"></span>'
+        for url in (reverse('homepage'), reverse('post_detail', args=[self.post.id])):
+            self.client.logout()
+            self.assertContains(self.client.get(url), marker % 'False', html=True)
+            self.client.force_login(self.user)
+            self.assertContains(self.client.get(url), marker % 'True', html=True)
+
+class CommentThreadTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.post = Post.objects.create(title='Test Post', content='Test Content', user=self.user)
+        self.url = reverse('post_detail', args=[self.post.id])
+
+    def test_root_comments_are_paginated_in_vote_order(self):
+        roots = [Comment.objects.create(user=self.user, post=self.post, content=f'Root {i}', votes=i) for i in range(5)]
+        with mock.patch.object(PostDetailView, 'comments_per_page', 2):
+            first = self.client.get(self.url).context['root_comments']
+            second = self.client.get(self.url, {'cursor': first.next_cursor}).context['root_comments']
+        self.assertEqual(list(first), [roots[4], roots[3]])
+        self.assertEqual(list(second), [roots[2], roots[1]])
+        self.assertTrue(second.has_next())
+
+    def test_first_paint_caps_replies(self):
+        root = Comment.objects.create(user=self.user, post=self.post, content='Root')
+        replies = [Comment.objects.create(user=self.user, post=self.post, parent=root, content=f'Reply {i}') for i in range(5)]
+        response = self.client.get(self.url)
+        shown = response.context['root_comments'][0]
+        self.assertEqual(shown.replies, replies[:3])
+        self.assertTrue(shown.has_more_replies)
+        self.assertContains(response, 'Show all replies')
+        self.assertNotContains(response, 'Reply 4')
+
+    def test_replies_endpoint(self):
+        root = Comment.objects.create(user=self.user, post=self.post, content='Root')
+        other_root = Comment.objects.create(user=self.user, post=self.post, content='Other root')
+        reply = Comment.objects.create(user=self.user, post=self.post, parent=root, content='Late reply')
+        CommentVote.objects.create(user=self.user, comment=reply)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('comment_replies', args=[self.post.id]), {'root': [root.id, other_root.id]})
+        replies = response.json()['replies']
+        self.assertIn('Late reply', replies[str(root.id)])
+        self.assertIn(f'data-comment-id="{reply.id}"', replies[str(root.id)])
+        self.assertEqual(replies[str(other_root.id)].strip(), '')
+
+    def test_nested_replies_in_display_order(self):
+        root = Comment.objects.create(user=self.user, post=self.post, content='Root')
+        first = Comment.objects.create(user=self.user, post=self.post, parent=root, content='First')
+        second = Comment.objects.create(user=self.user, post=self.post, parent=root, content='Second')
+        nested = Comment.objects.create(user=self.user, post=self.post, parent=first, content='Nested')
+        deeper = Comment.objects.create(user=self.user, post=self.post, parent=nested, content='Deeper')
+        other_root = Comment.objects.create(user=self.user, post=self.post, content='Other root')
+        Comment.objects.create(user=self.user, post=self.post, parent=other_root, content='Elsewhere')
+
+        with self.assertNumQueries(1):
+            subtree = list(root.descendants())
+        self.assertEqual(subtree, [first, nested, deeper, second])
+        self.assertEqual([comment.depth for comment in subtree], [1, 2, 3, 1])
+        self.assertEqual(list(first.descendants()), [nested, deeper])
+
+        response = self.client.get(reverse('comment_replies', args=[self.post.id]), {'root': root.id})
+        html = response.json()['replies'][str(root.id)]
+        self.assertLess(html.index('Nested'), html.index('Deeper'))
+        self.assertLess(html.index('Deeper'), html.index('Second'))
+        self.assertNotIn('Elsewhere', html)
+
+    def test_reply_to_nested_comment(self):
+        root = Comment.objects.create(user=self.user, post=self.post, content='Root')
+        reply = Comment.objects.create(user=self.user, post=self.post, parent=root, content='Reply')
+        self.client.force_login(self.user)
+        self.client.post(reverse('add_comment', args=[self.post.id]) + f'?parent_id={reply.id}', {'content': 'Nested reply'})
+        nested = Comment.objects.get(content='Nested reply')
+        self.assertEqual(nested.path, reply.path + f'{nested.id:010d}')
+        self.assertContains(self.client.get(self.url), 'Nested reply')
+
+    def test_replies_endpoint_ignores_other_posts(self):
+        other_post = Post.objects.create(title='Other', content='Other', user=self.user)
+        root = Comment.objects.create(user=self.user, post=other_post, content='Root')
+        response = self.client.get(reverse('comment_replies', args=[self.post.id]), {'root': root.id})
+        self.assertEqual(response.json(), {'replies': {}})
+
+    def test_replies_endpoint_rejects_bad_ids(self):
+        for root in ('abc', '0', '-1', str(2 ** 63), '99999999999999999999999'):
+            response = self.client.get(reverse('comment_replies', args=[self.post.id]), {'root': root})
+            self.assertEqual(response.status_code, 400)
+
+# Measures rendering, the anonymous page cache would answer repeat requests
+@override_settings(PAGE_CACHE=None)
+class QueryBudgetTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.users = [User.objects.create_user(username=f'user{i}', password='testpass') for i in range(12)]
+        self.user = self.users[0]
+        self.post = Post.objects.create(title='Busy Post', content='x' * 40000, user=self.user)
+        for i, user in enumerate(self.users):
+            Post.objects.create(title=f'Post {i}', content='x' * 40000, user=user)
+            root = Comment.objects.create(user=user, post=self.post, content=f'Comment {i}')
+            Comment.objects.create(user=self.users[-1 - i], post=self.post, parent=root, content=f'Reply {i}')
+            CommentVote.objects.create(user=self.user, comment=root)
+
+    def test_homepage_anonymous(self):
+        # posts, page count estimate
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('homepage'))
+        self.assertEqual(len(response.context['posts']), 10)
+
+    def test_homepage_authenticated(self):
+        self.client.force_login(self.user)
+        # session, user, posts, page count estimate
+        with self.assertNumQueries(4):
+            self.client.get(reverse('homepage'), {'sort_by': 'new'})
+
+    def test_homepage_does_not_load_post_content(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('homepage'))
+        self.assertFalse(any('"content"' in query['sql'] for query in ctx.captured_queries))
+
+    def test_post_detail_anonymous(self):
+        self.client.get(reverse('post_detail', args=[self.post.id]))  # builds the thread snapshot
+        # post with author, thread snapshot
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('post_detail', args=[self.post.id]))
+        self.assertEqual(len(response.context['root_comments']), 12)
+
+    def test_post_detail_authenticated(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('post_detail', args=[self.post.id]))  # builds the thread snapshot
+        # session, user, post, thread snapshot
+        with self.assertNumQueries(4):
+            self.client.get(reverse('post_detail', args=[self.post.id]))
+
+    def test_vote_state(self):
+        self.client.force_login(self.user)
+        comment_ids = ','.join(str(pk) for pk in Comment.objects.values_list('id', flat=True))
+        # session, user, both vote tables in one query
+        with self.assertNumQueries(3):
+            self.client.get(reverse('vote_state'), {'posts': str(self.post.id), 'comments': comment_ids})
+
+    def test_post_detail_later_page(self):
+        with mock.patch.object(PostDetailView, 'comments_per_page', 5):
+            cursor = self.client.get(reverse('post_detail', args=[self.post.id])).context['root_comments'].next_cursor
+            # post with author, root comments with authors, replies with authors
+            with self.assertNumQueries(3):
+                self.client.get(reverse('post_detail', args=[self.post.id]), {'cursor': cursor})
+
+    def test_my_posts(self):
+        self.client.force_login(self.user)
+        # session, user, posts, page count estimate
+        with self.assertNumQueries(4):
+            self.client.get(reverse('myposts'))
+
+    def test_my_comments(self):
+        self.client.force_login(self.user)
+        # session, user, comments with post titles, page count estimate
+        with self.assertNumQueries(4):
+            self.client.get(reverse('mycomments'))
+
+class CreationThrottleTest(TestCase):
+    def setUp(self):
+        caches[settings.THROTTLE_CACHE].clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.post = Post.objects.create(title='Test Post', content='Test Content', user=self.user)
+        self.client.force_login(self.user)
+
+    @override_settings(THROTTLE_RATES={'comment': {'rate': '2/m', 'key': 'user'}})
+    def test_comment_creation_is_throttled(self):
+        url = reverse('add_comment', args=[self.post.id])
+        for i in range(3):
+            self.client.post(url, {'content': f'Comment {i}'})
+        self.assertEqual(Comment.objects.count(), 2)
+
+    @override_settings(THROTTLE_RATES={'post': {'rate': '1/h', 'key': 'user'}})
+    def test_post_creation_is_throttled(self):
+        self.client.post(reverse('createpost'), {'title': 'First', 'content': 'Content'})
+        response = self.client.post(reverse('createpost'), {'title': 'Second', 'content': 'Content'})
+        self.assertRedirects(response, reverse('createpost'))
+        self.assertFalse(Post.objects.filter(title='Second').exists())
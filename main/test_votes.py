@@ -0,0 +1,140 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import skipIf
+from django.test import TestCase, TransactionTestCase
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.core.management import call_command
+from django.utils import timezone
+from .models import Post, PostVote, Comment, CommentVote
+from .votes import toggle_post_vote, toggle_comment_vote, UPVOTED, UNVOTED
+from .ranking import hot_score
+
+class ToggleVoteTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.voter = User.objects.create_user(username='voter', password='12345')
+        self.post = Post.objects.create(title='Test Post', content='x' * 40000, user=self.user)
+        self.comment = Comment.objects.create(user=self.user, post=self.post, content='A comment')
+
+    def test_post_vote_toggles(self):
+        self.assertEqual(toggle_post_vote(self.voter, self.post.id), UPVOTED)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.votes, 2)
+        self.assertTrue(PostVote.objects.filter(user=self.voter, post=self.post).exists())
+
+        self.assertEqual(toggle_post_vote(self.voter, self.post.id), UNVOTED)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.votes, 1)
+        self.assertFalse(PostVote.objects.filter(user=self.voter, post=self.post).exists())
+
+    def test_comment_vote_toggles(self):
+        self.assertEqual(toggle_comment_vote(self.voter, self.comment.id), UPVOTED)
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.votes, 2)
+
+        self.assertEqual(toggle_comment_vote(self.voter, self.comment.id), UNVOTED)
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.votes, 1)
+        self.assertFalse(CommentVote.objects.exists())
+
+    def test_missing_post_raises(self):
+        with self.assertRaises(Post.DoesNotExist):
+            toggle_post_vote(self.voter, 99999)
+        self.assertFalse(PostVote.objects.exists())
+
+    def test_missing_comment_raises(self):
+        with self.assertRaises(Comment.DoesNotExist):
+            toggle_comment_vote(self.voter, 99999)
+
+    def test_vote_does_not_rewrite_content(self):
+        with self.assertNumQueries(5) as ctx:
+            # SAVEPOINT, DELETE, UPDATE, INSERT, RELEASE SAVEPOINT
+            toggle_post_vote(self.voter, self.post.id)
+        update = next(q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE'))
+        self.assertNotIn('"content"', update)
+
+@skipIf(connection.vendor == 'sqlite', 'SQLite serialises writers and cannot run concurrent transactions')
+class ConcurrentVoteStressTest(TransactionTestCase):
+    voters = 20
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='12345')
+        self.users = [User.objects.create_user(username=f'voter{i}', password='12345') for i in range(self.voters)]
+        self.post = Post.objects.create(title='Hot Post', content='Hot content', user=self.author)
+        self.comment = Comment.objects.create(user=self.author, post=self.post, content='Hot comment')
+
+    def run_in_parallel(self, toggle, target_id, users):
+        barrier = threading.Barrier(len(users))
+        errors = []
+
+        def vote(user):
+            try:
+                barrier.wait()
+                toggle(user, target_id)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=vote, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_parallel_post_votes_stay_exact(self):
+        self.run_in_parallel(toggle_post_vote, self.post.id, self.users)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.votes, 1 + self.voters)
+
+        self.run_in_parallel(toggle_post_vote, self.post.id, self.users[::2])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.votes, 1 + self.voters // 2)
+        self.assertEqual(PostVote.objects.filter(post=self.post).count(), self.voters // 2)
+
+    def test_parallel_comment_votes_stay_exact(self):
+        self.run_in_parallel(toggle_comment_vote, self.comment.id, self.users)
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.votes, 1 + self.voters)
+
+    def test_parallel_double_clicks_from_one_user(self):
+        voter = self.users[0]
+        self.run_in_parallel(toggle_post_vote, self.post.id, [voter] * 10)
+        self.post.refresh_from_db()
+        votes = PostVote.objects.filter(post=self.post, user=voter).count()
+        self.assertEqual(self.post.votes, 1 + votes)
+
+class HotScoreTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.voter = User.objects.create_user(username='voter', password='12345')
+
+    def test_new_post_gets_hot_score(self):
+        post = Post.objects.create(title='Test Post', content='Content', user=self.user, votes=10)
+        self.assertAlmostEqual(post.hot_score, hot_score(10, post.created_at), places=3)
+
+    def test_newer_post_outranks_older_post_with_same_votes(self):
+        now = timezone.now()
+        self.assertGreater(hot_score(5, now), hot_score(5, now - timedelta(days=1)))
+        self.assertGreater(hot_score(5, now), hot_score(50, now - timedelta(days=2)))
+
+    def test_votes_refresh_hot_score(self):
+        post = Post.objects.create(title='Test Post', content='Content', user=self.user)
+        toggle_post_vote(self.voter, post.id)
+        post.refresh_from_db()
+        self.assertAlmostEqual(post.hot_score, hot_score(2, post.created_at), places=6)
+        toggle_post_vote(self.voter, post.id)
+        post.refresh_from_db()
+        self.assertAlmostEqual(post.hot_score, hot_score(1, post.created_at), places=6)
+
+    def test_recompute_command(self):
+        post = Post.objects.create(title='Test Post', content='Content', user=self.user, votes=3)
+        Post.objects.filter(pk=post.pk).update(votes=30, hot_score=0)
+        out = StringIO()
+        call_command('recompute_hot_scores', stdout=out)
+        post.refresh_from_db()
+        self.assertAlmostEqual(post.hot_score, hot_score(30, post.created_at), places=6)
+        self.assertIn('1 post(s)', out.getvalue())
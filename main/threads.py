@@ -0,0 +1,261 @@
+import bisect
+import datetime
+from collections import defaultdict
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber, Substr
+from .models import Comment, CommentThread, COMMENT_PATH_STEP, comment_path_end
+from .rendering import RENDER_VERSION
+
+# Per-post snapshots of the first page of comments. The post page is read
+# far more often than its comments change, so it reads one row instead of
+# querying the thread, and comment writes and votes patch the row.
+#
+# The page holds the first ROOTS roots by (-votes, created_at, id), each
+# with its first REPLIES replies to any depth in path order. That is one
+# more of each than the post page shows, which tells it whether there are
+# more.
+#
+# data = {'render_version': 1, 'comments': [root, ...]}, each root holding
+# its 'replies'. Comment dicts use the model's attribute names. Votes change
+# far more often than comments, so the counts and the root order are kept
+# apart in the small votes column, {'roots': [[id, votes, created_at], ...]
+# in page order, 'replies': {id: votes}}, and a vote rewrites only that.
+ROOTS = 51
+REPLIES = 4
+
+COMMENT_FIELDS = ('id', 'post', 'parent', 'path', 'content', 'content_html', 'content_html_version', 'votes', 'created_at', 'user__username')
+
+def get_replies(root_comments, limit=None):
+    # Every reply below the given roots to any depth in display order, one
+    # path range per root. With a limit only the first `limit` replies of
+    # each root are fetched, numbered per root in SQL.
+    ranges = Q()
+    for comment in root_comments:
+        ranges |= Q(path__gt=comment.path, path__lt=comment_path_end(comment.path))
+    if not ranges:
+        return Comment.objects.none()
+    post_ids = {comment.post_id for comment in root_comments}
+    replies = Comment.objects.filter(ranges, post_id__in=post_ids).select_related('user').only(*COMMENT_FIELDS)
+    if limit is not None:
+        replies = replies.annotate(
+            position=Window(RowNumber(), partition_by=Substr('path', 1, COMMENT_PATH_STEP), order_by=F('path').asc())
+        ).filter(position__lte=limit)
+    return replies.order_by('path')
+
+def _serialize(comment):
+    return {
+        'id': comment.id,
+        'parent_id': comment.parent_id,
+        'path': comment.path,
+        'user_id': comment.user_id,
+        'username': comment.user.username,
+        'created_at': comment.created_at.isoformat(),
+        'content_html': str(comment.rendered_content()),
+    }
+
+def _root_id(path):
+    return int(path[:COMMENT_PATH_STEP])
+
+def _entry(comment):
+    return [comment.id, comment.votes, comment.created_at.isoformat()]
+
+def _order(entry):
+    root_id, votes, created_at = entry
+    return -votes, datetime.datetime.fromisoformat(created_at), root_id
+
+def build_thread_data(post_id, roots_limit=None, replies_limit=None):
+    roots_limit = roots_limit or ROOTS
+    replies_limit = replies_limit or REPLIES
+    roots = list(
+        Comment.objects.filter(post_id=post_id, parent__isnull=True).select_related('user').only(*COMMENT_FIELDS)
+        .order_by('-votes', 'created_at', 'id')[:roots_limit]
+    )
+    replies = defaultdict(list)
+    for reply in get_replies(roots, replies_limit):
+        replies[_root_id(reply.path)].append(reply)
+    data = {'render_version': RENDER_VERSION, 'comments': []}
+    votes = {'roots': [], 'replies': {}}
+    for root in roots:
+        data['comments'].append(dict(_serialize(root), replies=[_serialize(reply) for reply in replies[root.id]]))
+        votes['roots'].append(_entry(root))
+        votes['replies'].update((str(reply.id), reply.votes) for reply in replies[root.id])
+    return data, votes
+
+def _deserialize(post_id, item, votes):
+    values = dict(item, post_id=post_id, votes=votes, content_html_version=RENDER_VERSION,
+                  created_at=datetime.datetime.fromisoformat(item['created_at']))
+    names = [field.attname for field in Comment._meta.concrete_fields if field.attname in values]
+    comment = Comment.from_db(Comment.objects.db, names, [values[name] for name in names])
+    comment.user = User.from_db(User.objects.db, ['id', 'username'], [item['user_id'], item['username']])
+    return comment
+
+def _load(post_id):
+    thread = CommentThread.objects.filter(post_id=post_id).values_list('data', 'votes', 'version').first()
+    data, votes, version = thread or (None, None, None)
+    if votes is not None and data['render_version'] == RENDER_VERSION:
+        return data, votes
+    data, votes = build_thread_data(post_id)
+    if version is None:
+        # Reads never wait on writers: a write that created the row while we
+        # were building wins and the next read builds again
+        CommentThread.objects.bulk_create([CommentThread(post_id=post_id, data=data, votes=votes)], ignore_conflicts=True)
+    else:
+        CommentThread.objects.filter(post_id=post_id, version=version).update(data=data, votes=votes)
+    return data, votes
+
+def get_thread(post_id, limit=None, replies_limit=None):
+    # Returns the post's first `limit` root comments by (-votes, created_at,
+    # id), each with its first `replies_limit` replies in .replies. Both
+    # default to what the snapshot holds.
+    limit = limit or ROOTS
+    replies_limit = replies_limit or REPLIES
+    if limit > ROOTS or replies_limit > REPLIES:
+        # More than the snapshot holds
+        data, votes = build_thread_data(post_id, limit, replies_limit)
+    else:
+        data, votes = _load(post_id)
+    items = {item['id']: item for item in data['comments']}
+    roots = []
+    for root_id, root_votes, _ in votes['roots'][:limit]:
+        root = _deserialize(post_id, items[root_id], root_votes)
+        root.replies = [
+            _deserialize(post_id, reply, votes['replies'][str(reply['id'])])
+            for reply in items[root_id]['replies'][:replies_limit]
+        ]
+        roots.append(root)
+    return roots
+
+def _patch(post_id, mutate, votes_only=False):
+    # mutate(data, votes) edits the stored page in place and returns False if
+    # the page after the change can't be told from it, the snapshot is then
+    # dropped and the next read builds it again. Votes only need the votes
+    # column, so the rendered comments are neither read nor written for them.
+    fields = ['version', 'votes'] if votes_only else ['version', 'votes', 'data']
+    with transaction.atomic():
+        thread, _ = CommentThread.objects.select_for_update().only(*fields).get_or_create(post_id=post_id)
+        thread.version += 1
+        if thread.votes is not None:
+            data = None if votes_only else thread.data
+            if (data is not None and data['render_version'] != RENDER_VERSION) or mutate(data, thread.votes) is False:
+                thread.data = thread.votes = None
+                fields.append('data')
+        thread.save(update_fields=set(fields) | {'updated_at'})
+
+def _find_root(comments, root_id):
+    for root in comments:
+        if root['id'] == root_id:
+            return root
+    return None
+
+def _find(comments, comment_id):
+    for root in comments:
+        if root['id'] == comment_id:
+            return root, comments
+        for reply in root['replies']:
+            if reply['id'] == comment_id:
+                return reply, root['replies']
+    return None, None
+
+def _remove_root(data, votes, root_id):
+    root = _find_root(data['comments'], root_id)
+    data['comments'].remove(root)
+    for reply in root['replies']:
+        del votes['replies'][str(reply['id'])]
+
+def _count(votes, comment):
+    # Moves the comment's count, and a root's place, to its current votes
+    if comment.parent_id is not None:
+        # Replies are in path order, only the shown count changes
+        if str(comment.id) in votes['replies']:
+            votes['replies'][str(comment.id)] = comment.votes
+        return True
+    roots = votes['roots']
+    full = len(roots) == ROOTS
+    entry = _entry(comment)
+    index = next((i for i, root in enumerate(roots) if root[0] == comment.id), None)
+    if index is None:
+        # Every root is on a page that isn't full. One below a full page only
+        # matters once it climbs onto it, and its comment isn't stored.
+        return full and _order(entry) > _order(roots[-1])
+    previous = roots.pop(index)
+    if full and _order(entry) > _order(previous) and (not roots or _order(entry) > _order(roots[-1])):
+        # Dropped to last on the page, a root below it may now come first
+        return False
+    bisect.insort(roots, entry, key=_order)
+    return True
+
+def comment_added(comment):
+    def mutate(data, votes):
+        # A read that built the page after the insert already has it
+        if _find(data['comments'], comment.id)[0] is not None:
+            return True
+        item = _serialize(comment)
+        if comment.parent_id is None:
+            entry = _entry(comment)
+            if bisect.bisect(votes['roots'], _order(entry), key=_order) >= ROOTS:
+                return True
+            bisect.insort(votes['roots'], entry, key=_order)
+            data['comments'].append(dict(item, replies=[]))
+            # A full page pushes its last root off
+            if len(votes['roots']) > ROOTS:
+                _remove_root(data, votes, votes['roots'].pop()[0])
+            return True
+        root = _find_root(data['comments'], _root_id(comment.path))
+        if root is None:
+            return True
+        replies = root['replies']
+        position = bisect.bisect([reply['path'] for reply in replies], comment.path)
+        if position >= REPLIES:
+            return True
+        replies.insert(position, item)
+        votes['replies'][str(comment.id)] = comment.votes
+        if len(replies) > REPLIES:
+            del votes['replies'][str(replies.pop()['id'])]
+        return True
+    _patch(comment.post_id, mutate)
+
+def comment_changed(comment):
+    def mutate(data, votes):
+        item, _ = _find(data['comments'], comment.id)
+        if item is not None:
+            if item['parent_id'] != comment.parent_id:
+                return False
+            item.update((key, value) for key, value in _serialize(comment).items() if key != 'created_at')
+        return _count(votes, comment)
+    _patch(comment.post_id, mutate)
+
+def comment_voted(comment_id):
+    # Call in the transaction that counted the vote. It holds the comment row,
+    # so the snapshot takes the counts in the order they were counted.
+    comment = Comment.objects.filter(pk=comment_id).only('id', 'post_id', 'parent_id', 'votes', 'created_at').first()
+    if comment is None:
+        return None
+    _patch(comment.post_id, lambda data, votes: _count(votes, comment), votes_only=True)
+    return comment.post_id
+
+def comment_removed(comment):
+    def mutate(data, votes):
+        if comment.parent_id is None:
+            if _find_root(data['comments'], comment.id) is None:
+                return True
+            full = len(votes['roots']) == ROOTS
+            votes['roots'] = [root for root in votes['roots'] if root[0] != comment.id]
+            _remove_root(data, votes, comment.id)
+            # The root that moves up onto a full page isn't stored
+            return not full
+        root = _find_root(data['comments'], _root_id(comment.path))
+        if root is None:
+            return True
+        # Deleting a reply deletes its own replies too
+        replies = root['replies']
+        root['replies'] = [reply for reply in replies if not reply['path'].startswith(comment.path)]
+        if len(root['replies']) == len(replies):
+            return True
+        for reply in replies:
+            if reply['path'].startswith(comment.path):
+                del votes['replies'][str(reply['id'])]
+        # The replies that move up into a full list aren't stored
+        return len(replies) < REPLIES
+    _patch(comment.post_id, mutate)
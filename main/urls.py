@@ -1,11 +1,18 @@
+from django.conf import settings
 from django.urls import path
-from .views import HomePage, VotePostView, PostDetailView, MyPostsView, VoteCommentView, MyCommentsView, AddCommentView, ReplyCommentView, EditCommentView, CreatePostView, PostDeleteView
+from .views import HomePage, VoteStateView, VotePostView, PostDetailView, CommentRepliesView, SearchView, MyPostsView, VoteCommentView, MyCommentsView, AddCommentView, ReplyCommentView, EditCommentView, CreatePostView, PostDeleteView
+
+if settings.ASYNC_VIEWS:
+    from .async_views import AsyncHomePage as HomePage, AsyncPostDetailView as PostDetailView, AsyncVotePostView as VotePostView, AsyncVoteCommentView as VoteCommentView
 
 urlpatterns = [
     path("", HomePage.as_view(), name="homepage"),
+    path('votes/state', VoteStateView.as_view(), name='vote_state'),
     path('votes/posts/<int:post_id>', VotePostView.as_view(), name='vote_post'),
     path('votes/comments/<int:comment_id>', VoteCommentView.as_view(), name='vote_comment'),
     path('posts/<int:post_id>/', PostDetailView.as_view(), name='post_detail'),
+    path('posts/<int:post_id>/replies', CommentRepliesView.as_view(), name='comment_replies'),
+    path('search/', SearchView.as_view(), name='search'),
     path('myposts/', MyPostsView.as_view(), name='myposts'),
     path('mycomments/', MyCommentsView.as_view(), name='mycomments'),
     path('comments/add/<int:post_id>', AddCommentView.as_view(), name='add_comment'),
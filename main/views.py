@@ -1,19 +1,35 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.template.loader import render_to_string
 from django.views import View
-from django.core.paginator import Paginator
-from .models import Post, PostVote, Comment, CommentVote, VoteTimestamp
+from .models import Post, PostVote, Comment, CommentVote, COMMENT_PATH_STEP
 from django.utils import timezone
 from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
 from django.contrib.auth.mixins import LoginRequiredMixin
 from collections import defaultdict
-from django.db.models import Count
+from django.db import transaction
+from django.db.models import Value
 from .forms import CommentForm, PostForm
+from .votes import toggle_post_vote, toggle_comment_vote
+from .pagination import CursorPage, CursorPaginator
+from .threads import COMMENT_FIELDS, get_replies, get_thread
+from . import search
+from .pagecache import LISTINGS, PageCacheMixin, post_version
 from django.contrib import messages
+from base.throttling import check_throttle
 from datetime import timedelta
 
-class HomePage(View):
-    def get(self, request):
-        page_number = request.GET.get('page', 1)
+# Listing pages never show the post body, so keep its 40k chars out of the row fetch
+POST_LISTING_FIELDS = ('id', 'title', 'votes', 'comment_count', 'hot_score', 'created_at', 'user__username')
+
+class HomePage(PageCacheMixin, View):
+    page_size = 10
+    cache_params = ('sort_by', 'time', 'cursor')
+
+    def get_cache_versions(self, **kwargs):
+        return [LISTINGS]
+
+    def get_paginator(self, request):
         sort_by = request.GET.get('sort_by', 'trending')
         if sort_by not in ['new', 'trending']:
             sort_by = 'trending'
@@ -21,15 +37,9 @@ class HomePage(View):
         if time not in ['1_day', '7_days', '30_days', 'all_time']:
             time = 'all_time'
 
-        try:
-            page_number = int(page_number)
-        except ValueError:
-            page_number = 1
-        
-        page_size = 10
-
         if sort_by == 'new':
-            posts = Post.objects.all().order_by('-created_at').annotate(comment_count=Count('comment'))
+            posts = Post.objects.all()
+            ordering = ('-created_at', '-id')
         else:
             if time == '1_day':
                 date_limit = timezone.now() - timezone.timedelta(days=1)
@@ -41,131 +51,210 @@ class HomePage(View):
                 date_limit = None
 
             if date_limit:
-                posts = Post.objects.filter(created_at__gte=date_limit).annotate(comment_count=Count('comment'))
+                posts = Post.objects.filter(created_at__gte=date_limit)
             else:
-                posts = Post.objects.all().annotate(comment_count=Count('comment'))
+                posts = Post.objects.all()
 
-            posts = posts.order_by('-votes')
+            ordering = ('-hot_score', '-id')
 
-        paginator = Paginator(posts, page_size)
-        posts = paginator.get_page(page_number)
+        posts = posts.select_related('user').only(*POST_LISTING_FIELDS)
+        return sort_by, time, CursorPaginator(posts, ordering, self.page_size)
 
-        if request.user.is_authenticated:
-            postvotes = PostVote.objects.filter(user=request.user, post__in=posts)
-            upvoted_post_ids = postvotes.values_list('post', flat=True)
-        else:
-            upvoted_post_ids = []
+    def get(self, request):
+        sort_by, time, paginator = self.get_paginator(request)
+        posts = paginator.get_page(request.GET.get('cursor'))
 
-        context = {'posts': posts, 'sort_by': sort_by, 'time' : time, 'upvoted_post_ids': upvoted_post_ids}
+        context = {'posts': posts, 'sort_by': sort_by, 'time' : time}
         return render(request, 'main/homepage.html', context)
 
+# Largest value of the bigint id columns, anything bigger would make the
+# database raise instead of simply matching nothing
+MAX_ID = 2 ** 63 - 1
+
+def parse_id(value):
+    id = int(value)
+    if not 1 <= id <= MAX_ID:
+        raise ValueError(f'Id out of range: {value}')
+    return id
+
+def parse_ids(value, limit):
+    ids = []
+    for part in (value or '').split(',')[:limit]:
+        if part.strip():
+            ids.append(parse_id(part))
+    return ids
+
+class VoteStateView(View):
+    # Pages render every vote button unfilled so one render fits every
+    # reader, the voting scripts then ask here which ones this user upvoted
+    max_ids = 200
+
+    def get(self, request):
+        try:
+            post_ids = parse_ids(request.GET.get('posts'), self.max_ids)
+            comment_ids = parse_ids(request.GET.get('comments'), self.max_ids)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid id'}, status=400)
+
+        state = {'posts': [], 'comments': []}
+        if request.user.is_authenticated and (post_ids or comment_ids):
+            # Both vote tables in one round trip, each side uses its (user, target) unique index
+            postvotes = (
+                PostVote.objects.filter(user=request.user, post_id__in=post_ids)
+                .annotate(kind=Value('posts')).values_list('post_id', 'kind')
+            )
+            commentvotes = (
+                CommentVote.objects.filter(user=request.user, comment_id__in=comment_ids)
+                .annotate(kind=Value('comments')).values_list('comment_id', 'kind')
+            )
+            for target_id, kind in postvotes.union(commentvotes, all=True):
+                state[kind].append(target_id)
+
+        response = JsonResponse(state)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
 class VotePostView(View):
     def post(self, request, post_id):
         if not request.user.is_authenticated:
             return JsonResponse({'error': 'You must be logged in to upvote.'}, status=401)
         
-        # Check if the user has voted more than 10 times in the last 10 minutes
-        ten_minutes_ago = timezone.now() - timedelta(minutes=10)
-        recent_votes = VoteTimestamp.objects.filter(user=request.user, timestamp__gte=ten_minutes_ago).count()
-
-        if recent_votes > 10:
+        if not check_throttle(request, 'vote'):
             return JsonResponse({'error': 'You have exceeded the vote limit.'}, status=429)
 
         try:
-            post = Post.objects.get(pk=post_id)
-        except Exception as e:
+            status = toggle_post_vote(request.user, post_id)
+        except Post.DoesNotExist:
             return JsonResponse({'error': 'Invalid post id'}, status=400)
 
-        user = request.user
-
-        vote, created = PostVote.objects.get_or_create(user=user, post=post)
+        return JsonResponse({'status': status, 'post_id': post_id})
+
+def attach_replies(root_comments, replies, limit=None):
+    by_root = defaultdict(list)
+    for reply in replies:
+        by_root[int(reply.path[:COMMENT_PATH_STEP])].append(reply)
+    for comment in root_comments:
+        comment.replies = by_root[comment.id][:limit]
+        comment.has_more_replies = limit is not None and len(by_root[comment.id]) > limit
+    return root_comments
+
+class PostDetailView(PageCacheMixin, View):
+    comments_per_page = 50
+    # Replies shown under each root on first paint, the rest load on demand
+    inline_replies = 3
+    cache_params = ('cursor',)
+
+    def get_cache_versions(self, post_id, **kwargs):
+        return [post_version(post_id)]
+
+    def get_comment_paginator(self, post_id):
+        root_comments = Comment.objects.filter(post_id=post_id, parent__isnull=True).select_related('user').only(*COMMENT_FIELDS)
+        return CursorPaginator(root_comments, ('-votes', 'created_at', 'id'), self.comments_per_page)
+
+    def get_first_page(self, post_id):
+        # The first page is by far the most read, serve it from the thread
+        # snapshot. Later pages come from the cursor query.
+        # One extra root and reply tell us whether there are more
+        roots = get_thread(post_id, self.comments_per_page + 1, self.inline_replies + 1)
+        root_comments = CursorPage(
+            self.get_comment_paginator(post_id), roots[:self.comments_per_page], 1,
+            has_next=len(roots) > self.comments_per_page, has_previous=False,
+        )
+        for comment in root_comments:
+            comment.has_more_replies = len(comment.replies) > self.inline_replies
+            comment.replies = comment.replies[:self.inline_replies]
+        return root_comments
+
+    def get_root_comments(self, post_id, cursor):
+        if not cursor:
+            return self.get_first_page(post_id)
+        root_comments = self.get_comment_paginator(post_id).get_page(cursor)
+        # One extra reply per root tells us whether to offer "more replies"
+        replies = get_replies(root_comments, self.inline_replies + 1)
+        return attach_replies(root_comments, replies, self.inline_replies)
+
+    def get_context(self, request, post, root_comments):
+        can_delete = request.user == post.user and timezone.now() - post.created_at < timedelta(hours=1)
+        return {
+            'post': post,
+            'root_comments': root_comments,
+            'comment_count' : post.comment_count,
+            'form' : CommentForm(),
+            'can_delete': can_delete
+        }
 
-        VoteTimestamp.objects.create(user=request.user)
+    def get(self, request, post_id):
+        # The raw content is only needed for posts not rendered at save time yet
+        post = get_object_or_404(Post.objects.select_related('user').defer('content'), id=post_id)
+        root_comments = self.get_root_comments(post.id, request.GET.get('cursor'))
 
-        if created:
-            post.votes += 1
-            post.save()
-            return JsonResponse({'status': 'upvoted', 'post_id': post_id})
+        context = self.get_context(request, post, root_comments)
+        return render(request, 'main/post_detail.html', context)
 
-        else:
-            vote.delete()
-            post.votes -= 1
-            post.save()
-            return JsonResponse({'status': 'unvoted', 'post_id': post_id})
+class CommentRepliesView(View):
+    max_roots = 50
 
-class PostDetailView(View):
     def get(self, request, post_id):
-        post = get_object_or_404(Post, id=post_id)
-        comment_count = Comment.objects.filter(post=post).count()
-
-        comments = Comment.objects.filter(post=post).order_by('-votes', 'created_at')
-
-        root_comments = []
-        child_comments = defaultdict(list)
-        for comment in comments:
-            if comment.is_root_comment():
-                root_comments.append(comment)
-            else:
-                child_comments[comment.parent_id].append(comment)
+        try:
+            root_ids = [parse_id(root_id) for root_id in request.GET.getlist('root')][:self.max_roots]
+        except ValueError:
+            return JsonResponse({'error': 'Invalid comment id'}, status=400)
 
-        # Sort root comments by votes
-        root_comments.sort(key=lambda x: x.votes, reverse=True)
+        root_comments = list(Comment.objects.filter(post_id=post_id, parent__isnull=True, id__in=root_ids).only('id', 'post_id', 'path'))
+        attach_replies(root_comments, get_replies(root_comments))
 
-        for comment in root_comments:
-            comment.replies = sorted(child_comments[comment.id], key=lambda x: x.created_at)
+        replies = {
+            comment.id: render_to_string('main/comment_replies.html', {'comment': comment}, request=request)
+            for comment in root_comments
+        }
+        return JsonResponse({'replies': replies})
 
-        if request.user.is_authenticated:
-            postvote = PostVote.objects.filter(user=request.user, post=post)
-            is_upvoted = postvote.exists()
+class SearchView(View):
+    page_size = 10
 
-            commentvotes = CommentVote.objects.filter(user=request.user, comment__in=comments)
-            upvoted_comment_ids = commentvotes.values_list('comment', flat=True)
+    def get_results(self, query, kind, cursor):
+        if kind == 'posts':
+            model = Post
+            matches = search.search(Post, query).select_related('user').only(*POST_LISTING_FIELDS)
         else:
-            is_upvoted = False
-            upvoted_comment_ids = []
-        
-        can_delete = request.user == post.user and timezone.now() - post.created_at < timedelta(hours=1)
+            model = Comment
+            matches = (
+                search.search(Comment, query).select_related('user', 'post')
+                .only('id', 'votes', 'created_at', 'user__username', 'post__title')
+            )
+        results = CursorPaginator(matches, ('-rank', '-id'), self.page_size).get_page(cursor)
+        search.attach_snippets(model, results.object_list, query)
+        return results
 
-        context = {
-            'post': post,
-            'is_upvoted': is_upvoted,
-            'root_comments': root_comments,
-            'upvoted_comment_ids' : upvoted_comment_ids,
-            'comment_count' : comment_count,
-            'form' : CommentForm(),
-            'can_delete': can_delete
-        }
+    def get(self, request):
+        query = search.clean_query(request.GET.get('q'))
+        kind = request.GET.get('type', 'posts')
+        if kind not in ['posts', 'comments']:
+            kind = 'posts'
 
-        return render(request, 'main/post_detail.html', context)
+        results = self.get_results(query, kind, request.GET.get('cursor')) if query else None
+        return render(request, 'main/search.html', {'query': query, 'type': kind, 'results': results})
 
 class MyPostsView(LoginRequiredMixin, View):
-    def get(self, request, *args, **kwargs):
-        page_number = request.GET.get('page', 1)
-        try:
-            page_number = int(page_number)
-        except ValueError:
-            page_number = 1
+    def get_paginator(self, user):
+        my_posts_list = Post.objects.filter(user=user).select_related('user').only(*POST_LISTING_FIELDS)
+        return CursorPaginator(my_posts_list, ('-created_at', '-id'), 10)
 
-        my_posts_list = Post.objects.filter(user=request.user).annotate(comment_count=Count('comment')).order_by('-created_at')
-        
-        paginator = Paginator(my_posts_list, 10)
-        my_posts = paginator.get_page(page_number)
+    def get(self, request, *args, **kwargs):
+        my_posts = self.get_paginator(request.user).get_page(request.GET.get('cursor'))
 
         return render(request, 'main/myposts.html', {'my_posts': my_posts})
 
 class MyCommentsView(LoginRequiredMixin, View):
-    def get(self, request, *args, **kwargs):
-        page_number = request.GET.get('page', 1)
-        try:
-            page_number = int(page_number)
-        except ValueError:
-            page_number = 1
-
-        my_comments_list = Comment.objects.filter(user=request.user).select_related('post').order_by('-created_at')
-
+    def get_paginator(self, user):
+        my_comments_list = (
+            Comment.objects.filter(user=user).select_related('user', 'post')
+            .only('id', 'content', 'votes', 'created_at', 'user__username', 'post__title')
+        )
+        return CursorPaginator(my_comments_list, ('-created_at', '-id'), 10)
 
-        paginator = Paginator(my_comments_list, 10)
-        my_comments = paginator.get_page(page_number)
+    def get(self, request, *args, **kwargs):
+        my_comments = self.get_paginator(request.user).get_page(request.GET.get('cursor'))
 
         return render(request, 'main/mycomments.html', {'my_comments': my_comments})
 
@@ -174,37 +263,22 @@ class VoteCommentView(View):
         if not request.user.is_authenticated:
             return JsonResponse({'error': 'You must be logged in to upvote.'}, status=401)
 
-        # Check if the user has voted more than 10 times in the last 10 minutes
-        ten_minutes_ago = timezone.now() - timedelta(minutes=10)
-        recent_votes = VoteTimestamp.objects.filter(user=request.user, timestamp__gte=ten_minutes_ago).count()
-
-        if recent_votes > 10:
+        if not check_throttle(request, 'vote'):
             return JsonResponse({'error': 'You have exceeded the vote limit.'}, status=429)
 
         try:
-            comment = Comment.objects.get(pk=comment_id)
+            status = toggle_comment_vote(request.user, comment_id)
         except Comment.DoesNotExist:
             return JsonResponse({'error': 'Invalid comment id'}, status=400)
-        
-        user = request.user
-
-        vote, created = CommentVote.objects.get_or_create(user=user, comment=comment)
 
-        VoteTimestamp.objects.create(user=request.user)
-
-        if created:
-            comment.votes += 1
-            comment.save()
-            return JsonResponse({'status': 'upvoted', 'comment_id': comment_id})
-
-        else:
-            vote.delete()
-            comment.votes -= 1
-            comment.save()
-            return JsonResponse({'status': 'unvoted', 'comment_id': comment_id})
+        return JsonResponse({'status': status, 'comment_id': comment_id})
 
 class AddCommentView(LoginRequiredMixin, View):
     def post(self, request, post_id):
+        if not check_throttle(request, 'comment'):
+            messages.error(request, "You are commenting too quickly. Please wait a few minutes and try again.")
+            return redirect('post_detail', post_id=post_id)
+
         form = CommentForm(request.POST)
         parent_id = request.GET.get('parent_id', None)
 
@@ -217,10 +291,14 @@ class AddCommentView(LoginRequiredMixin, View):
                 if parent_comment.post.id != comment.post.id:
                     messages.error(request, "Parent comment does not belong to the current post.")
                     return redirect('post_detail', post_id=post_id)
+                if not parent_comment.can_have_replies():
+                    messages.error(request, "This thread is too deep to reply to.")
+                    return redirect('post_detail', post_id=post_id)
                 
                 comment.parent = parent_comment
-            comment.save()
-            CommentVote.objects.create(user=request.user, comment=comment)
+            with transaction.atomic():
+                comment.save()
+                CommentVote.objects.create(user=request.user, comment=comment)
             messages.success(request, "Your comment has been added successfully.")
             return redirect('post_detail', post_id=post_id)
         
@@ -231,11 +309,11 @@ class ReplyCommentView(LoginRequiredMixin, View):
     def get(self, request, comment_id):
         initial_text = request.GET.get('initial_text', '')
         comment = get_object_or_404(Comment, id=comment_id)
-        if comment.is_root_comment():
+        if comment.can_have_replies():
             form = CommentForm(initial={'content': initial_text})
             return render(request, 'main/reply_comment.html', {'form': form, 'comment': comment})
         else:
-            messages.error(request, 'You can only reply to root comments.')
+            messages.error(request, 'This thread is too deep to reply to.')
             return redirect('post_detail', post_id=comment.post.id)
 
 class EditCommentView(LoginRequiredMixin, View):
@@ -266,12 +344,17 @@ class CreatePostView(LoginRequiredMixin, View):
         return render(request, 'main/create_post.html', {'form': form})
 
     def post(self, request):
+        if not check_throttle(request, 'post'):
+            messages.error(request, 'You are posting too quickly. Please try again later.')
+            return redirect('createpost')
+
         form = PostForm(request.POST)
         if form.is_valid():
             post = form.save(commit=False)
             post.user = request.user
-            post.save()
-            PostVote.objects.create(user=request.user, post=post)
+            with transaction.atomic():
+                post.save()
+                PostVote.objects.create(user=request.user, post=post)
             messages.success(request, "Your post has been created successfully.")
             return redirect('post_detail', post_id=post.id)
         else:
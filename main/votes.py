@@ -0,0 +1,50 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .models import Post, PostVote, Comment, CommentVote
+from .ranking import hot_score_after_vote
+from .pagecache import post_changed
+from . import threads
+from shareaichat import metrics
+
+UPVOTED = 'upvoted'
+UNVOTED = 'unvoted'
+
+def _post_counter_updates(delta):
+    return {'votes': F('votes') + delta, 'hot_score': hot_score_after_vote(delta)}
+
+def _comment_counter_updates(delta):
+    return {'votes': F('votes') + delta}
+
+def _toggle_vote(target_model, vote_model, target_field, counter_updates, user, target_id):
+    vote_lookup = {'user': user, f'{target_field}_id': target_id}
+    try:
+        with transaction.atomic():
+            # Deleting first means an existing vote costs one DELETE and one UPDATE, no read
+            deleted, _ = vote_model.objects.filter(**vote_lookup).delete()
+            if deleted:
+                target_model.objects.filter(pk=target_id).update(**counter_updates(-1))
+                return UNVOTED
+
+            if not target_model.objects.filter(pk=target_id).update(**counter_updates(1)):
+                raise target_model.DoesNotExist
+            vote_model.objects.create(**vote_lookup)
+            return UPVOTED
+    except IntegrityError:
+        # A concurrent request from the same user inserted the vote first, the
+        # whole transaction including our counter increment has been rolled back
+        return UPVOTED
+
+def toggle_post_vote(user, post_id):
+    status = _toggle_vote(Post, PostVote, 'post', _post_counter_updates, user, post_id)
+    post_changed(post_id)
+    metrics.inc('votes_total', {'target': 'post', 'status': status})
+    return status
+
+def toggle_comment_vote(user, comment_id):
+    with transaction.atomic():
+        status = _toggle_vote(Comment, CommentVote, 'comment', _comment_counter_updates, user, comment_id)
+        post_id = threads.comment_voted(comment_id)
+    if post_id is not None:
+        post_changed(post_id, listings=False)
+    metrics.inc('votes_total', {'target': 'comment', 'status': status})
+    return status
@@ -10,7 +10,10 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
+from shareaichat import metrics
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'shareaichat.settings')
 
 application = get_asgi_application()
+# Only serving processes write metrics files
+metrics.start()
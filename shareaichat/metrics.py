@@ -0,0 +1,209 @@
+import atexit
+import fcntl
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import defaultdict
+from django.conf import settings
+
+# Counters and histograms in the Prometheus text format. Gunicorn runs
+# several worker processes, so each one adds to its own in-memory registry
+# and writes it out to a file of its own in METRICS_DIR at most every
+# METRICS_FLUSH_INTERVAL seconds. The endpoint adds all the files up, files
+# of workers that have exited included, so totals never go backwards.
+#
+# Only serving processes write files: the ASGI and WSGI entry points call
+# start(). Tests and management commands keep their numbers in memory. A
+# starting worker adds the files of exited workers into one retired file,
+# so the directory doesn't grow with every restart.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+METRICS = {
+    'http_request_duration_seconds': ('histogram', 'Request latency by view.', LATENCY_BUCKETS),
+    'db_queries_per_request': ('histogram', 'Database queries per request by view.', QUERY_COUNT_BUCKETS),
+    'db_time_seconds': ('histogram', 'Time spent in SQL per request by view.', LATENCY_BUCKETS),
+    'cache_requests_total': ('counter', 'Cache lookups by cache and result.', None),
+    'votes_total': ('counter', 'Vote toggles by target and outcome.', None),
+    'throttle_rejections_total': ('counter', 'Requests rejected by a rate limit, by scope.', None),
+}
+
+RETIRED = 'retired.json'
+WORKER_FILE_RE = re.compile(r'^(\d+)-[0-9a-f]{32}\.json$')
+
+def _key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Readers only ever see a complete file
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
+class Registry:
+    def __init__(self, directory=None, enabled=False):
+        self.directory = directory
+        self.filename = f'{os.getpid()}-{uuid.uuid4().hex}.json'
+        # Whether this process writes its numbers to the directory
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.flushed_at = time.monotonic()
+
+    def inc(self, name, labels=None, value=1):
+        with self.lock:
+            self.counters[(name, _key(labels))] += value
+        self.maybe_flush()
+
+    def observe(self, name, value, labels=None):
+        buckets = METRICS[name][2]
+        with self.lock:
+            histogram = self.histograms.setdefault((name, _key(labels)), [[0] * (len(buckets) + 1), 0.0])
+            # Per bucket counts, made cumulative when exposed
+            histogram[0][bisect_left(buckets, value)] += 1
+            histogram[1] += value
+        self.maybe_flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[name, dict(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, dict(labels), counts[:], total] for (name, labels), (counts, total) in self.histograms.items()],
+            }
+
+    def path(self):
+        return os.path.join(self.directory or settings.METRICS_DIR, self.filename)
+
+    def maybe_flush(self):
+        if self.enabled and time.monotonic() - self.flushed_at >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        self.flushed_at = time.monotonic()
+        _write(self.path(), self.snapshot())
+
+registry = Registry()
+
+def start():
+    # Called once per serving process, after Django is set up
+    registry.filename = f'{os.getpid()}-{uuid.uuid4().hex}.json'
+    registry.enabled = True
+    retire_exited_workers()
+    atexit.register(lambda: registry.flush() if registry.counters or registry.histograms else None)
+
+def inc(name, labels=None, value=1):
+    registry.inc(name, labels, value)
+
+def observe(name, value, labels=None):
+    registry.observe(name, value, labels)
+
+def _lock(directory, operation):
+    # Retiring files takes it exclusively, reading them takes it shared, so
+    # a reader never sees an exited worker both in its file and retired
+    os.makedirs(directory, exist_ok=True)
+    lock = open(os.path.join(directory, '.lock'), 'a')
+    fcntl.flock(lock, operation)
+    return lock
+
+def _merge(counters, histograms, data):
+    for name, labels, value in data['counters']:
+        counters[(name, _key(labels))] += value
+    for name, labels, counts, total in data['histograms']:
+        key = (name, _key(labels))
+        if key not in histograms:
+            histograms[key] = [[0] * len(counts), 0.0]
+        histograms[key][0] = [a + b for a, b in zip(histograms[key][0], counts)]
+        histograms[key][1] += total
+
+def _read(directory, filenames, counters, histograms):
+    for filename in filenames:
+        try:
+            with open(os.path.join(directory, filename)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        _merge(counters, histograms, data)
+
+def collect(directory=None, snapshots=()):
+    directory = directory or settings.METRICS_DIR
+    counters = defaultdict(float)
+    histograms = {}
+    with _lock(directory, fcntl.LOCK_SH):
+        filenames = [name for name in os.listdir(directory) if name.endswith('.json')]
+        _read(directory, filenames, counters, histograms)
+    for data in snapshots:
+        _merge(counters, histograms, data)
+    return counters, histograms
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def retire_exited_workers(directory=None):
+    directory = directory or settings.METRICS_DIR
+    with _lock(directory, fcntl.LOCK_EX):
+        exited = []
+        for name in os.listdir(directory):
+            match = WORKER_FILE_RE.match(name)
+            if match and not _is_running(int(match.group(1))):
+                exited.append(name)
+        if not exited:
+            return 0
+        counters = defaultdict(float)
+        histograms = {}
+        _read(directory, [RETIRED] + exited, counters, histograms)
+        _write(os.path.join(directory, RETIRED), {
+            'counters': [[name, dict(labels), value] for (name, labels), value in counters.items()],
+            'histograms': [[name, dict(labels), counts, total] for (name, labels), (counts, total) in histograms.items()],
+        })
+        for name in exited:
+            os.remove(os.path.join(directory, name))
+    return len(exited)
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def exposition():
+    if registry.enabled:
+        registry.flush()
+        counters, histograms = collect()
+    else:
+        # Outside a serving process this process's numbers are only in memory
+        counters, histograms = collect(snapshots=[registry.snapshot()])
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_labels(labels)} {value:g}')
+            continue
+        for (metric, labels), (counts, total) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ['+Inf'], counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels, le=bound)} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {total:g}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,88 @@
+import logging
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from . import metrics, performance
+
+logger = logging.getLogger('shareaichat.performance')
+
+class PerformanceMiddleware:
+    # Reports each request's query count, SQL, template and view time in a
+    # Server-Timing header, which browser dev tools show next to the request.
+    # Requests over REQUEST_TIME_BUDGET_MS or REQUEST_QUERY_BUDGET are logged
+    # with their slowest queries and the queries that ran more than once.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        # Connections opened before the middleware was loaded
+        for connection in connections.all(initialized_only=True):
+            performance.install_query_recorder(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token = performance.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            performance.end_request(token)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        stats, token = performance.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            performance.end_request(token)
+        return self.finish(request, response, stats)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = performance.current()
+        if stats is not None:
+            stats.view_start = time.perf_counter()
+
+    def finish(self, request, response, stats):
+        if stats.view_start is not None:
+            stats.view_time = time.perf_counter() - stats.view_start
+        total_time = stats.total_time
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = server_timing(stats, total_time)
+        if total_time * 1000 > settings.REQUEST_TIME_BUDGET_MS or len(stats.queries) > settings.REQUEST_QUERY_BUDGET:
+            log_slow_request(request, response, stats, total_time)
+        record_metrics(request, response, stats, total_time)
+        return response
+
+def record_metrics(request, response, stats, total_time):
+    # Labelled by URL name rather than path, so ids don't multiply the series
+    match = request.resolver_match
+    labels = {'view': match.view_name if match else 'unmatched', 'method': request.method}
+    metrics.observe('http_request_duration_seconds', total_time, labels)
+    metrics.observe('db_queries_per_request', len(stats.queries), labels)
+    metrics.observe('db_time_seconds', stats.sql_time, labels)
+    if 'X-Page-Cache' in response:
+        metrics.inc('cache_requests_total', {'cache': 'page', 'result': response['X-Page-Cache'].lower()})
+
+def server_timing(stats, total_time):
+    return ', '.join([
+        f'db;dur={stats.sql_time * 1000:.1f};desc="{len(stats.queries)} queries"',
+        f'tpl;dur={stats.template_time * 1000:.1f};desc="templates"',
+        f'view;dur={stats.view_time * 1000:.1f};desc="view"',
+        f'total;dur={total_time * 1000:.1f}',
+    ])
+
+def log_slow_request(request, response, stats, total_time):
+    lines = [
+        f'{request.method} {request.path} {response.status_code} took {total_time * 1000:.0f}ms: '
+        f'{len(stats.queries)} queries in {stats.sql_time * 1000:.0f}ms, '
+        f'templates {stats.template_time * 1000:.0f}ms, view {stats.view_time * 1000:.0f}ms'
+    ]
+    for duration, sql in stats.slowest_queries(settings.REQUEST_LOG_SLOWEST_QUERIES):
+        lines.append(f'  slow {duration * 1000:.1f}ms: {sql[:500]}')
+    for sql, count in stats.duplicate_queries():
+        lines.append(f'  repeated {count}x: {sql[:500]}')
+    logger.warning('\n'.join(lines))
@@ -0,0 +1,104 @@
+import contextvars
+import re
+import time
+from collections import Counter
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates
+
+# Where a request's time goes, collected for PerformanceMiddleware. The stats
+# live in a context variable, which sync_to_async copies into the threads that
+# run the ORM for async views, so every query of the request is counted.
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+IN_LIST_RE = re.compile(r'\bIN \((?:%s, )*%s\)')
+SAVEPOINT_RE = re.compile(r'"s\d+_x\d+"')
+WHITESPACE_RE = re.compile(r'\s+')
+
+def fingerprint(sql):
+    # Parameters are passed separately, so queries that differ only in their
+    # values (or the length of an IN list) share a fingerprint. Savepoint
+    # names are unique per atomic block and get collapsed too.
+    sql = SAVEPOINT_RE.sub('"savepoint"', IN_LIST_RE.sub('IN (...)', sql))
+    return WHITESPACE_RE.sub(' ', sql).strip()
+
+class RequestStats:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = []
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.view_start = None
+        self.view_time = 0.0
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.start
+
+    def record_query(self, sql, duration):
+        self.queries.append((duration, sql))
+        self.sql_time += duration
+
+    def slowest_queries(self, count):
+        return sorted(self.queries, key=lambda query: query[0], reverse=True)[:count]
+
+    def duplicate_queries(self):
+        counts = Counter(fingerprint(sql) for _, sql in self.queries)
+        return [(sql, count) for sql, count in counts.most_common() if count > 1]
+
+def start_request():
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+def end_request(token):
+    _current.reset(token)
+
+def current():
+    return _current.get()
+
+def record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.record_query(sql, time.perf_counter() - start)
+
+def install_query_recorder(connection):
+    # Connection wrappers outlive their database connections, with pooling a
+    # thread's wrapper connects again for every request
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+@receiver(connection_created)
+def connection_created_receiver(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+class TimedTemplate:
+    def __init__(self, template):
+        self._template = template
+
+    def __getattr__(self, name):
+        return getattr(self._template, name)
+
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return self._template.render(context, request)
+        start = time.perf_counter()
+        try:
+            return self._template.render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - start
+
+class TimedDjangoTemplates(DjangoTemplates):
+    # The Django template backend, counting render time for the request
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
@@ -0,0 +1,83 @@
+from collections import Counter
+from importlib import import_module
+from django.db import connection
+from django.urls import URLPattern, URLResolver, reverse
+from .performance import fingerprint
+
+# Test helpers that catch N+1 queries across the whole site: run every
+# route on a small and a larger dataset and compare the queries. A view
+# whose query count grows with the data gets a report of which query
+# fingerprints ran more often, which points at the template or loop to fix.
+
+def routes(*urlconfs):
+    # (name, pattern) for every named route of the urlconf modules
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                yield from walk(pattern.url_patterns)
+            elif isinstance(pattern, URLPattern) and pattern.name:
+                yield pattern.name, pattern
+
+    for urlconf in urlconfs:
+        yield from walk(import_module(urlconf).urlpatterns)
+
+def route_method(pattern):
+    # Pages are read with GET, endpoints that only take POST are posted to
+    view_class = getattr(pattern.callback, 'view_class', None)
+    if view_class is not None and not hasattr(view_class, 'get'):
+        return 'POST'
+    return 'GET'
+
+def route_path(name, pattern, values):
+    kwargs = {key: values[key] for key in pattern.pattern.converters}
+    return reverse(name, kwargs=kwargs)
+
+class QueryLog:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def fingerprints(self):
+        return Counter(fingerprint(sql) for sql in self.queries)
+
+def capture(client, method, path, data=None):
+    # The SQL before parameters are filled in, so fingerprints group queries
+    # that only differ in their values
+    log = QueryLog()
+    with connection.execute_wrapper(log):
+        response = getattr(client, method.lower())(path, data or {})
+    return response, log
+
+def growing_queries(small, large):
+    # Fingerprints that run several times and more often on the larger data.
+    # A query that runs once only with more data, such as the page count
+    # once a listing has a second page, is still O(1).
+    before, after = small.fingerprints(), large.fingerprints()
+    return [sql for sql, count in after.items() if count > 1 and count > before.get(sql, 0)]
+
+def fingerprint_diff(small, large):
+    # Fingerprints that ran more often on the larger data, most repeated first
+    before, after = small.fingerprints(), large.fingerprints()
+    lines = []
+    for sql, count in after.most_common():
+        if count != before.get(sql, 0):
+            lines.append(f'  {before.get(sql, 0):>4} -> {count:<4} {sql}')
+    for sql, count in before.items():
+        if sql not in after:
+            lines.append(f'  {count:>4} -> 0    {sql}')
+    return '\n'.join(lines)
+
+class QueryBudgetMixin:
+    def assertConstantQueries(self, label, small, large):
+        if not growing_queries(small, large):
+            return
+        self.fail(
+            f'{label} ran {len(small)} queries on the small dataset and {len(large)} on the large one:\n'
+            f'{fingerprint_diff(small, large)}'
+        )
@@ -0,0 +1,14 @@
+import tempfile
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+class TestRunner(DiscoverRunner):
+    # Tests never see the metrics files of workers serving on this machine
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.metrics_dir = tempfile.TemporaryDirectory()
+        settings.METRICS_DIR = self.metrics_dir.name
+
+    def teardown_test_environment(self, **kwargs):
+        self.metrics_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
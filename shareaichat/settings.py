@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 from base.helpers import get_secret
 import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -35,6 +36,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover every other middleware
+    'shareaichat.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -48,7 +51,8 @@ ROOT_URLCONF = 'shareaichat.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that reports render time, see shareaichat/performance.py
+        'BACKEND': 'shareaichat.performance.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -64,6 +68,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'shareaichat.wsgi.application'
 
+# Route the homepage, post detail and vote endpoints to the native async views
+# in main/async_views.py. Compare both with `manage.py benchmark_views`.
+ASYNC_VIEWS = get_secret('SHAREAICHAT_ASYNC_VIEWS') == 'True'
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -113,14 +121,27 @@ LOGIN_REDIRECT_URL = 'homepage'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Connections come from a per-worker pool, see base/db_pool/base.py. Each of
+# the 4 Uvicorn workers holds up to max_size connections, keep the total
+# under Postgres' max_connections (100 by default).
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "base.db_pool",
         "NAME": get_secret('SHAREAICHAT_POSTGRES_DB'),
         "USER": get_secret('SHAREAICHAT_POSTGRES_USER'),
         "PASSWORD": get_secret('SHAREAICHAT_POSTGRES_PASSWORD'),
         "HOST": "db",
         "PORT": "5432",
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "pool": {
+                "min_size": int(get_secret('SHAREAICHAT_DB_POOL_MIN_SIZE') or 2),
+                "max_size": int(get_secret('SHAREAICHAT_DB_POOL_MAX_SIZE') or 10),
+                # Seconds a request waits for a free connection before failing
+                "timeout": 10,
+                "max_idle": 300,
+            },
+        },
     }
 }
 
@@ -136,7 +157,98 @@ EMAIL_HOST_USER = get_secret('SHAREAICHAT_EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = get_secret('SHAREAICHAT_EMAIL_HOST_PASSWORD')
 TURNSTILE_SECRET_KEY = get_secret('SHAREAICHAT_TURNSTILE_SECRET_KEY')
 
+# Captcha verification, see base/turnstile.py
+TURNSTILE_VERIFIER = 'base.turnstile.TurnstileVerifier'
+TURNSTILE_VERIFY_URL = 'https://challenges.cloudflare.com/turnstile/v0/siteverify'
+TURNSTILE_TIMEOUT = (3.05, 5)  # connect, read in seconds
+TURNSTILE_POOL_SIZE = 10
+TURNSTILE_CACHE = 'shared'
+TURNSTILE_CACHE_TIMEOUT = 300  # Used tokens are remembered while Cloudflare would accept them
+
 if get_secret('SHAREAICHAT_ENV') == 'prod':
     SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 else:
-    SECURE_PROXY_SSL_HEADER = None
\ No newline at end of file
+    SECURE_PROXY_SSL_HEADER = None
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Without Redis every worker process keeps its own in-memory cache, which is
+# fine for development but lets each of the gunicorn workers count separately.
+
+REDIS_URL = get_secret('SHAREAICHAT_REDIS_URL')
+
+if REDIS_URL:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+else:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shared',
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': SHARED_CACHE,
+}
+
+# Render ``` fenced code blocks and `inline code` in posts and comments,
+# see main/rendering.py. Run rerender_content after changing this.
+CONTENT_FORMATTING = True
+
+# Rate limiting, see base/throttling.py
+# 'key' is 'user' (falls back to the IP for anonymous requests) or 'ip'.
+# Set a rate to None to disable that throttle.
+
+THROTTLE_CACHE = 'shared'
+# Caddy sits in front of the app in production and appends the client's
+# address to X-Forwarded-For. THROTTLE_PROXY_COUNT is the number of proxies
+# that append to it, the client is that many entries from the right.
+THROTTLE_TRUST_X_FORWARDED_FOR = get_secret('SHAREAICHAT_ENV') == 'prod'
+THROTTLE_PROXY_COUNT = 1
+THROTTLE_RATES = {
+    'vote': {'rate': '11/10m', 'key': 'user'},
+    'comment': {'rate': '10/10m', 'key': 'user'},
+    'post': {'rate': '5/h', 'key': 'user'},
+    'login': {'rate': '10/10m', 'key': 'ip'},
+    'signup': {'rate': '5/h', 'key': 'ip'},
+}
+
+# Anonymous homepage and post pages, see main/pagecache.py. Pages are
+# regenerated when their data changes or after PAGE_CACHE_TIMEOUT seconds,
+# until PAGE_CACHE_STALE_TIMEOUT a stale copy is served while that happens.
+# None turns the page cache off.
+PAGE_CACHE = 'shared'
+PAGE_CACHE_TIMEOUT = 60
+PAGE_CACHE_STALE_TIMEOUT = 600
+PAGE_CACHE_LOCK_TIMEOUT = 30
+
+# See shareaichat/middleware.py. Requests over either budget are logged to
+# shareaichat.performance with their slowest and repeated queries.
+SERVER_TIMING = True
+REQUEST_TIME_BUDGET_MS = 500
+REQUEST_QUERY_BUDGET = 30
+REQUEST_LOG_SLOWEST_QUERIES = 5
+
+# Prometheus metrics, see shareaichat/metrics.py. Every serving worker
+# writes its numbers to METRICS_DIR, /metrics/ adds them up for staff users
+# and for scrapers sending "Authorization: Bearer <METRICS_TOKEN>". Tests
+# get a temporary METRICS_DIR from the test runner.
+METRICS_DIR = os.path.join(tempfile.gettempdir(), 'shareaichat-metrics')
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = get_secret('SHAREAICHAT_METRICS_TOKEN')
+TEST_RUNNER = 'shareaichat.runner.TestRunner'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'shareaichat.performance': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
\ No newline at end of file
@@ -0,0 +1,129 @@
+import os
+import tempfile
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.conf import settings
+from django.core.cache import caches
+from django.contrib.auth.models import User
+from main.models import Post
+from main.votes import toggle_post_vote
+from . import metrics
+
+class MetricsTestMixin:
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings_override = override_settings(METRICS_DIR=self.directory, METRICS_FLUSH_INTERVAL=3600)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # A fresh registry for this process, as if the worker just started
+        registry_patch = mock.patch.object(metrics, 'registry', metrics.Registry(enabled=True))
+        registry_patch.start()
+        self.addCleanup(registry_patch.stop)
+
+class RegistryTest(MetricsTestMixin, TestCase):
+    def test_workers_are_added_up(self):
+        workers = [metrics.Registry(enabled=True), metrics.Registry(enabled=True)]
+        for i, worker in enumerate(workers):
+            worker.inc('votes_total', {'target': 'post', 'status': 'upvoted'}, i + 1)
+            worker.observe('http_request_duration_seconds', 0.02 * (i + 1), {'view': 'homepage', 'method': 'GET'})
+            worker.flush()
+
+        counters, histograms = metrics.collect()
+        self.assertEqual(counters[('votes_total', (('status', 'upvoted'), ('target', 'post')))], 3)
+        counts, total = histograms[('http_request_duration_seconds', (('method', 'GET'), ('view', 'homepage')))]
+        self.assertEqual(sum(counts), 2)
+        self.assertAlmostEqual(total, 0.06)
+
+    def test_exited_workers_still_count(self):
+        worker = metrics.Registry()
+        worker.inc('throttle_rejections_total', {'scope': 'vote'})
+        worker.flush()
+        del worker
+        self.assertIn('throttle_rejections_total{scope="vote"} 1', metrics.exposition())
+
+    def test_exited_workers_are_retired(self):
+        for pid, value in [(os.getpid(), 1), (999999999, 2), (999999998, 4)]:
+            worker = metrics.Registry(enabled=True)
+            worker.filename = f'{pid}-{"0" * 32}.json'
+            worker.inc('votes_total', {'target': 'post', 'status': 'upvoted'}, value)
+            worker.observe('db_time_seconds', 0.01, {'view': 'homepage', 'method': 'GET'})
+            worker.flush()
+        self.assertEqual(metrics.retire_exited_workers(), 2)
+        self.assertEqual(metrics.retire_exited_workers(), 0)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['.lock', f'{os.getpid()}-{"0" * 32}.json', 'retired.json'])
+        counters, histograms = metrics.collect()
+        self.assertEqual(counters[('votes_total', (('status', 'upvoted'), ('target', 'post')))], 7)
+        self.assertEqual(sum(histograms[('db_time_seconds', (('method', 'GET'), ('view', 'homepage')))][0]), 3)
+
+    def test_processes_that_do_not_serve_write_nothing(self):
+        registry = metrics.Registry()
+        with mock.patch.object(metrics, 'registry', registry), override_settings(METRICS_FLUSH_INTERVAL=0):
+            metrics.inc('throttle_rejections_total', {'scope': 'vote'})
+            text = metrics.exposition()
+        self.assertIn('throttle_rejections_total{scope="vote"} 1', text)
+        self.assertEqual([name for name in os.listdir(self.directory) if name.endswith('.json')], [])
+
+    def test_start(self):
+        registry = metrics.Registry()
+        with mock.patch.object(metrics, 'registry', registry), mock.patch('atexit.register') as register:
+            metrics.start()
+        self.assertTrue(registry.enabled)
+        self.assertTrue(registry.filename.startswith(f'{os.getpid()}-'))
+        register.assert_called_once()
+
+    def test_exposition_format(self):
+        metrics.observe('db_queries_per_request', 2, {'view': 'post_detail', 'method': 'GET'})
+        metrics.observe('db_queries_per_request', 40, {'view': 'post_detail', 'method': 'GET'})
+        text = metrics.exposition()
+        self.assertIn('# TYPE db_queries_per_request histogram', text)
+        self.assertIn('db_queries_per_request_bucket{method="GET",view="post_detail",le="1"} 0', text)
+        self.assertIn('db_queries_per_request_bucket{method="GET",view="post_detail",le="2"} 1', text)
+        self.assertIn('db_queries_per_request_bucket{method="GET",view="post_detail",le="+Inf"} 2', text)
+        self.assertIn('db_queries_per_request_count{method="GET",view="post_detail"} 2', text)
+        self.assertIn('db_queries_per_request_sum{method="GET",view="post_detail"} 42', text)
+
+    def test_label_values_are_escaped(self):
+        metrics.inc('throttle_rejections_total', {'scope': 'a"b\\c'})
+        self.assertIn('throttle_rejections_total{scope="a\\"b\\\\c"} 1', metrics.exposition())
+
+class MetricsViewTest(MetricsTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        caches[settings.THROTTLE_CACHE].clear()
+        caches[settings.PAGE_CACHE].clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.staff = User.objects.create_user(username='admin', password='testpass', is_staff=True)
+
+    def test_requires_staff_or_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 302)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 302)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_scraper_token(self):
+        self.assertEqual(self.client.get(reverse('metrics'), headers={'authorization': 'Bearer wrong'}).status_code, 302)
+        response = self.client.get(reverse('metrics'), headers={'authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+    def test_requests_votes_and_rejections_are_counted(self):
+        post = Post.objects.create(title='Test Post', content='Test Content', user=self.user)
+        self.client.get(reverse('homepage'))
+        self.client.get(reverse('homepage'))
+        toggle_post_vote(self.user, post.id)
+        self.client.force_login(self.user)
+        with override_settings(THROTTLE_RATES={**settings.THROTTLE_RATES, 'vote': {'rate': '0/m', 'key': 'user'}}):
+            self.client.post(reverse('vote_post', args=[post.id]))
+
+        self.client.force_login(self.staff)
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('http_request_duration_seconds_count{method="GET",view="homepage"} 2', text)
+        self.assertIn('db_queries_per_request_count{method="GET",view="homepage"} 2', text)
+        self.assertIn('cache_requests_total{cache="page",result="miss"} 1', text)
+        self.assertIn('cache_requests_total{cache="page",result="hit"} 1', text)
+        self.assertIn('votes_total{status="upvoted",target="post"} 1', text)
+        self.assertIn('throttle_rejections_total{scope="vote"} 1', text)
@@ -0,0 +1,79 @@
+import re
+from django.test import TestCase, RequestFactory, override_settings
+from django.http import HttpResponse
+from django.urls import reverse
+from django.conf import settings
+from django.core.cache import caches
+from django.contrib.auth.models import User
+from main.models import Post, Comment
+from .middleware import PerformanceMiddleware
+from .performance import RequestStats, fingerprint
+
+class FingerprintTest(TestCase):
+    def test_in_lists_and_whitespace_are_normalized(self):
+        self.assertEqual(
+            fingerprint('SELECT *  FROM t\n WHERE id IN (%s, %s, %s)'),
+            fingerprint('SELECT * FROM t WHERE id IN (%s)'),
+        )
+        self.assertNotEqual(fingerprint('SELECT * FROM t WHERE id = %s'), fingerprint('SELECT * FROM u WHERE id = %s'))
+
+    def test_savepoint_names_are_normalized(self):
+        self.assertEqual(fingerprint('SAVEPOINT "s1396844577_x13"'), fingerprint('SAVEPOINT "s1396844577_x101"'))
+
+    def test_duplicate_queries(self):
+        stats = RequestStats()
+        for sql in ['SELECT a FROM t WHERE id = %s'] * 3 + ['SELECT b FROM t']:
+            stats.record_query(sql, 0.001)
+        self.assertEqual(stats.duplicate_queries(), [('SELECT a FROM t WHERE id = %s', 3)])
+
+@override_settings(PAGE_CACHE=None)
+class PerformanceMiddlewareTest(TestCase):
+    def setUp(self):
+        caches[settings.THROTTLE_CACHE].clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.post = Post.objects.create(title='Test Post', content='Test Content', user=self.user)
+
+    def timings(self, response):
+        return dict(re.findall(r'(\w+);dur=([\d.]+)', response['Server-Timing']))
+
+    def test_server_timing_header(self):
+        self.client.get(reverse('post_detail', args=[self.post.id]))  # builds the thread snapshot
+        response = self.client.get(reverse('post_detail', args=[self.post.id]))
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+        timings = self.timings(response)
+        self.assertEqual(set(timings), {'db', 'tpl', 'view', 'total'})
+        self.assertGreater(float(timings['tpl']), 0)
+        self.assertGreaterEqual(float(timings['total']), float(timings['view']))
+
+    @override_settings(SERVER_TIMING=False)
+    def test_header_can_be_turned_off(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('homepage')))
+
+    def test_fast_requests_are_not_logged(self):
+        with self.assertNoLogs('shareaichat.performance'):
+            self.client.get(reverse('homepage'))
+
+    @override_settings(REQUEST_QUERY_BUDGET=1)
+    def test_requests_over_budget_are_logged_with_repeated_queries(self):
+        posts = [Post.objects.create(title=f'Post {i}', content='Content', user=self.user) for i in range(3)]
+
+        def n_plus_one(request):
+            titles = [Post.objects.get(id=post.id).title for post in posts]
+            return HttpResponse(', '.join(titles))
+
+        with self.assertLogs('shareaichat.performance', 'WARNING') as logs:
+            response = PerformanceMiddleware(n_plus_one)(RequestFactory().get('/n-plus-one'))
+        self.assertIn('desc="3 queries"', response['Server-Timing'])
+        message = logs.output[0]
+        self.assertIn('GET /n-plus-one 200', message)
+        self.assertIn('3 queries', message)
+        self.assertIn('repeated 3x: SELECT', message)
+        self.assertEqual(message.count('slow '), 3)
+
+    async def test_async_requests(self):
+        async def view(request):
+            return HttpResponse(str(await Post.objects.acount()))
+
+        middleware = PerformanceMiddleware(view)
+        response = await middleware(RequestFactory().get('/'))
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
@@ -0,0 +1,92 @@
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.db.models import Count
+from django.test import Client, TestCase, override_settings
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from main.models import Post, PostVote, Comment
+from main.seeding import Seeder
+from .querybudget import QueryBudgetMixin, QueryLog, capture, fingerprint_diff, growing_queries, route_method, route_path, routes
+
+URLCONFS = ('main.urls', 'base.urls')
+# Django 4.2 still logs out on GET, with a deprecation warning
+METHODS = {'logout': 'POST'}
+DATA = {
+    'search': {'q': 'model'},
+    'add_comment': {'content': 'A comment from the query budget test.'},
+}
+# The small dataset leaves every first page part empty (listings show 10
+# rows), the large one fills them, so a query per row shows up as growth
+SMALL = {'users': 2, 'posts': 6, 'comments': 20, 'post_votes': 4, 'comment_votes': 8, 'content_size': 2000}
+LARGE = {'users': 3, 'posts': 150, 'comments': 1500, 'post_votes': 200, 'comment_votes': 600, 'content_size': 2000}
+
+@override_settings(PAGE_CACHE=None, THROTTLE_RATES={})
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    def seed(self, prefix, sizes):
+        # The busiest post of this dataset and its most active author as the
+        # logged in reader, who comments on the post but hasn't voted on it
+        Seeder(prefix=prefix, **sizes).run()
+        users = User.objects.filter(username__startswith=f'{prefix}_')
+        user = users.annotate(posts=Count('post')).order_by('-posts', 'id').first()
+        post = Post.objects.filter(user__in=users).annotate(comments=Count('comment')).order_by('-comments', 'id').first()
+        PostVote.objects.filter(user=user, post=post).delete()
+        comment = Comment.objects.create(user=user, post=post, content='A comment to edit and reply to.')
+        return user, {
+            'post_id': post.id,
+            'comment_id': comment.id,
+            'uidb64': urlsafe_base64_encode(force_bytes(user.pk)),
+            'token': default_token_generator.make_token(user),
+        }
+
+    def request(self, name, pattern, user, values):
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        path = route_path(name, pattern, values)
+        method = METHODS.get(name, route_method(pattern))
+        if method == 'GET':
+            # Steady state: thread snapshots built, lazy rows created
+            client.get(path, DATA.get(name))
+        return capture(client, method, path, DATA.get(name))[1]
+
+    def measure(self, prefix, sizes):
+        user, values = self.seed(prefix, sizes)
+        return {
+            (name, viewer): self.request(name, pattern, user if viewer == 'logged in' else None, values)
+            for name, pattern in routes(*URLCONFS)
+            for viewer in ('anonymous', 'logged in')
+        }
+
+    def test_query_counts_do_not_grow_with_data(self):
+        small = self.measure('small', SMALL)
+        large = self.measure('large', LARGE)
+        for (name, viewer), queries in small.items():
+            with self.subTest(route=name, viewer=viewer):
+                self.assertConstantQueries(f'{name} ({viewer})', queries, large[(name, viewer)])
+
+    def test_walks_every_route(self):
+        names = [name for name, _ in routes(*URLCONFS)]
+        for name in ['homepage', 'post_detail', 'vote_post', 'add_comment', 'search', 'login', 'password_reset_confirm', 'metrics']:
+            self.assertIn(name, names)
+        self.assertNotIn('admin:index', names)
+
+    def test_post_only_routes(self):
+        methods = {name: route_method(pattern) for name, pattern in routes(*URLCONFS)}
+        self.assertEqual(methods['vote_post'], 'POST')
+        self.assertEqual(methods['add_comment'], 'POST')
+        self.assertEqual(methods['post_detail'], 'GET')
+
+    def test_fingerprint_diff(self):
+        small, large = QueryLog(), QueryLog()
+        small.queries = ['SELECT * FROM post', 'SELECT * FROM user WHERE id = %s']
+        large.queries = ['SELECT * FROM post'] + ['SELECT * FROM user WHERE id = %s'] * 3
+        self.assertEqual(fingerprint_diff(small, large), '     1 -> 3    SELECT * FROM user WHERE id = %s')
+        with self.assertRaisesMessage(AssertionError, 'homepage ran 2 queries on the small dataset and 4 on the large one'):
+            self.assertConstantQueries('homepage', small, large)
+
+    def test_single_extra_query_is_constant(self):
+        small, large = QueryLog(), QueryLog()
+        small.queries = ['SELECT * FROM post']
+        large.queries = ['SELECT * FROM post', 'SELECT COUNT(*) FROM post']
+        self.assertEqual(growing_queries(small, large), [])
+        self.assertConstantQueries('homepage', small, large)
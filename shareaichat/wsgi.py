@@ -10,7 +10,10 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/wsgi/
 import os
 
 from django.core.wsgi import get_wsgi_application
+from shareaichat import metrics
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'shareaichat.settings')
 
 application = get_wsgi_application()
+# Only serving processes write metrics files
+metrics.start()